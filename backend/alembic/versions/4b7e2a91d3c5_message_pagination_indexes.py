@@ -0,0 +1,31 @@
+"""message pagination indexes
+
+Revision ID: 4b7e2a91d3c5
+Revises: c9584e8420d0
+Create Date: 2026-10-18 10:12:31.402118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4b7e2a91d3c5'
+down_revision: Union[str, None] = 'c9584e8420d0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Built concurrently so large messages tables stay writable
+    with op.get_context().autocommit_block():
+        op.create_index('ix_messages_created_at_id', 'messages', ['created_at', 'id'], unique=False, postgresql_concurrently=True)
+        op.create_index('ix_messages_sender_id_created_at_id', 'messages', ['sender_id', 'created_at', 'id'], unique=False, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_messages_sender_id_created_at_id', table_name='messages', postgresql_concurrently=True)
+        op.drop_index('ix_messages_created_at_id', table_name='messages', postgresql_concurrently=True)
@@ -0,0 +1,26 @@
+"""session presence
+
+Revision ID: 5e0c3b7d9a12
+Revises: 8d2f6c1e7a04
+Create Date: 2026-10-18 16:02:41.518204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5e0c3b7d9a12'
+down_revision: Union[str, None] = '8d2f6c1e7a04'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('sessions', sa.Column('presence', sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('sessions', 'presence')
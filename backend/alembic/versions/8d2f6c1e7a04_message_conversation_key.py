@@ -0,0 +1,75 @@
+"""message conversation key
+
+Revision ID: 8d2f6c1e7a04
+Revises: 4b7e2a91d3c5
+Create Date: 2026-10-18 11:40:05.917352
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d2f6c1e7a04'
+down_revision: Union[str, None] = '4b7e2a91d3c5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BACKFILL_BATCH_SIZE = 10000
+
+# Must match models.message.conversation_key: ids ordered by code point
+# (COLLATE "C"), joined with ':'. Walks the primary key in ranges so each
+# batch is one index range scan rather than a rescan of rows already filled;
+# returns the last id of the batch, NULL past the end of the table.
+BACKFILL_SQL = sa.text("""
+    WITH batch AS (
+        SELECT id FROM messages
+        WHERE id > :last_id
+        ORDER BY id
+        LIMIT :batch_size
+    ), filled AS (
+        UPDATE messages
+        SET conversation_key = CASE
+            WHEN sender_id COLLATE "C" <= receiver_id COLLATE "C"
+            THEN sender_id || ':' || receiver_id
+            ELSE receiver_id || ':' || sender_id
+        END
+        FROM batch
+        WHERE messages.id = batch.id
+          AND conversation_key IS NULL
+          AND sender_id IS NOT NULL
+          AND receiver_id IS NOT NULL
+    )
+    SELECT max(id) FROM batch
+""")
+
+
+def upgrade() -> None:
+    op.add_column('messages', sa.Column('conversation_key', sa.String(), nullable=True))
+
+    # Backfill in short transactions so the table is never locked for long
+    with op.get_context().autocommit_block():
+        connection = op.get_bind()
+        last_id = 0
+        while True:
+            last_id = connection.execute(
+                BACKFILL_SQL, {"last_id": last_id, "batch_size": BACKFILL_BATCH_SIZE}
+            ).scalar()
+            if last_id is None:
+                break
+
+        op.create_index(
+            'ix_messages_conversation_key_created_at',
+            'messages',
+            ['conversation_key', sa.text('created_at DESC'), sa.text('id DESC')],
+            unique=False,
+            postgresql_concurrently=True
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_messages_conversation_key_created_at', table_name='messages', postgresql_concurrently=True)
+    op.drop_column('messages', 'conversation_key')
@@ -0,0 +1,2 @@
+# Standalone benchmarks, run from the backend directory:
+#   python -m benchmarks.<module>
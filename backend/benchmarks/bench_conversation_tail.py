@@ -0,0 +1,100 @@
+"""Conversation first-page cost with and without ConversationTailCache.
+
+    python -m benchmarks.bench_conversation_tail --conversations 200 --messages 100
+
+Compares the memory the cache accounts for (its ``bytes``) with what
+tracemalloc sees for --conversations full tails, then, against DB_* from
+the environment, times first pages of --limit items through
+MessageService.get_conversation from Postgres and from warm tails.
+Messages are written under bench-tail-* receivers and deleted afterwards.
+"""
+import argparse
+import asyncio
+import gc
+import random
+import time
+import tracemalloc
+from datetime import datetime, timedelta, UTC
+from sqlalchemy import delete
+from src.core.database import AsyncSessionLocal
+from src.models.message import Message
+from src.services.conversation_tail import ConversationTailCache
+from src.services.message import STATUS_RANKS, MessageService
+
+def make_message(n: int, receiver_id: str, created_at: datetime) -> dict:
+    return {
+        "id": n,
+        "content": f"Benchmark message {n} " + "x" * 60,
+        "sender_id": "bench-tail",
+        "receiver_id": receiver_id,
+        "message_type": "text",
+        "status": "sent",
+        "metadata": {},
+        "created_at": created_at.isoformat(),
+    }
+
+def measure_memory(conversations: int, size: int):
+    now = datetime.now(UTC)
+    batches = [
+        [make_message(c * size + n, f"bench-tail-{c}", now + timedelta(microseconds=n)) for n in range(size)]
+        for c in range(conversations)
+    ]
+
+    async def fill():
+        tails = ConversationTailCache(size, 1 << 40, 3600, STATUS_RANKS)
+        for batch in batches:
+            async def load(key, count, batch=batch):
+                return [dict(message) for message in reversed(batch)], True
+            await tails.first_page(f"bench-tail-{batch[0]['receiver_id']}", 1, load)
+        return tails
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    tails = asyncio.run(fill())
+    traced = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return tails.bytes, traced
+
+async def time_first_pages(service: MessageService, receivers, limit: int, reads: int) -> float:
+    sample = [random.choice(receivers) for _ in range(reads)]
+    start = time.perf_counter()
+    for receiver_id in sample:
+        await service.get_conversation("bench-tail", receiver_id, limit=limit)
+    return (time.perf_counter() - start) / reads
+
+async def bench_reads(args):
+    receivers = [f"bench-tail-{n}" for n in range(args.conversations)]
+    async with AsyncSessionLocal() as db:
+        writer = MessageService(db)
+        for receiver_id in receivers:
+            await writer.create_messages(
+                [{"content": f"Tail {n}", "receiver_id": receiver_id} for n in range(args.messages)],
+                "bench-tail"
+            )
+        try:
+            database = await time_first_pages(MessageService(db), receivers, args.limit, min(args.reads, 2000))
+            tails = ConversationTailCache(args.size, 1 << 30, 3600, STATUS_RANKS)
+            cached = MessageService(db, tails=tails)
+            for receiver_id in receivers:
+                await cached.get_conversation("bench-tail", receiver_id, limit=args.limit)
+            memory = await time_first_pages(cached, receivers, args.limit, args.reads)
+            print(f"first page of {args.limit}, {args.conversations} conversations x {args.messages} messages")
+            print(f"  database: {database * 1e6:>9.1f} us/page")
+            print(f"  tail:     {memory * 1e6:>9.1f} us/page")
+        finally:
+            await db.execute(delete(Message).where(Message.sender_id == "bench-tail"))
+            await db.commit()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--conversations", type=int, default=200)
+    parser.add_argument("--messages", type=int, default=100)
+    parser.add_argument("--size", type=int, default=50)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--reads", type=int, default=10000)
+    args = parser.parse_args()
+    accounted, traced = measure_memory(args.conversations, args.size)
+    entries = args.conversations * args.size
+    print(f"{entries} tail entries: accounted {accounted / entries:.0f} B/entry, traced {traced / entries:.0f} B/entry")
+    asyncio.run(bench_reads(args))
@@ -0,0 +1,81 @@
+"""Per-recipient json.dumps versus encode-once fan-out.
+
+    python -m benchmarks.bench_fanout_encoding --rounds 20
+
+For 1, 100 and 10k recipients this times:
+  * serialization alone: stdlib json.dumps per recipient vs codec.dumps once
+  * a full EventManager broadcast to that many connected (no-op) sockets
+"""
+import argparse
+import asyncio
+import json
+import time
+from src.core import codec
+from src.services.event_manager import EventManager
+
+MESSAGE = {
+    "type": "new_message",
+    "message": {
+        "id": 123456,
+        "content": "Hola! Tu pedido #4821 ya fue enviado y llega mañana entre 9 y 13hs." * 3,
+        "sender_id": "5491155550000",
+        "receiver_id": "5491166660000",
+        "message_type": "text",
+        "status": "sent",
+        "metadata": {"campaign": "shipping", "tags": ["order", "notify"], "retry": 0},
+        "created_at": "2026-10-18T12:00:00+00:00",
+    },
+}
+
+class NullWebSocket:
+    async def accept(self):
+        pass
+
+    async def send_text(self, data: str):
+        pass
+
+    async def close(self):
+        pass
+
+def bench_serialization(recipients: int, rounds: int):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for _ in range(recipients):
+            json.dumps(MESSAGE)
+    per_recipient = (time.perf_counter() - start) / rounds
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        codec.EncodedMessage(MESSAGE).text
+    encode_once = (time.perf_counter() - start) / rounds
+    return per_recipient, encode_once
+
+async def bench_broadcast(recipients: int, rounds: int) -> float:
+    manager = EventManager()
+    for i in range(recipients):
+        await manager.register_websocket(f"client-{i}", NullWebSocket())
+    try:
+        start = time.perf_counter()
+        for _ in range(rounds):
+            await manager.broadcast_message(MESSAGE)
+            await manager.flush_outbound()
+        return (time.perf_counter() - start) / rounds
+    finally:
+        await manager.close_all_connections()
+
+async def main(args):
+    print(f"codec backend: {codec.BACKEND}")
+    print(f"{'recipients':>10}  {'json x N':>12}  {'encode once':>12}  {'speedup':>8}  {'broadcast':>12}")
+    for recipients in (1, 100, 10_000):
+        rounds = max(1, args.rounds if recipients < 10_000 else args.rounds // 10)
+        per_recipient, encode_once = bench_serialization(recipients, rounds)
+        broadcast = await bench_broadcast(recipients, rounds)
+        print(
+            f"{recipients:>10}  {per_recipient * 1e6:>10.1f}us  {encode_once * 1e6:>10.1f}us"
+            f"  {per_recipient / encode_once:>7.1f}x  {broadcast * 1e3:>10.2f}ms"
+        )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rounds", type=int, default=20)
+    asyncio.run(main(parser.parse_args()))
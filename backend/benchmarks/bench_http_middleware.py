@@ -0,0 +1,104 @@
+"""Per-request overhead of the HTTP middleware stack, BaseHTTPMiddleware vs raw ASGI.
+
+    python -m benchmarks.bench_http_middleware --requests 20000
+
+Drives a trivial endpoint through the ASGI interface directly (no sockets),
+so the numbers are the middleware cost alone:
+  * bare: no middleware
+  * before: the previous BaseHTTPMiddleware versions of both classes
+  * after: the raw ASGI versions in src/core/middleware.py
+"""
+import argparse
+import asyncio
+import time
+import uuid
+from datetime import datetime, UTC
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import JSONResponse
+from starlette.middleware.base import BaseHTTPMiddleware
+from src.core.middleware import ErrorHandlerMiddleware, RequestLoggingMiddleware
+
+class BaseRequestLoggingMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request, call_next):
+        request_id = str(uuid.uuid4())
+        start_time = datetime.now(UTC)
+        response = await call_next(request)
+        response.headers["X-Request-ID"] = request_id
+        response.headers["X-Process-Time"] = str((datetime.now(UTC) - start_time).total_seconds())
+        return response
+
+class BaseErrorHandlerMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request, call_next):
+        try:
+            return await call_next(request)
+        except HTTPException as exc:
+            return JSONResponse(status_code=exc.status_code, content={"error": exc.detail})
+        except Exception:
+            return JSONResponse(status_code=500, content={"error": "Internal server error"})
+
+def build_app(error_middleware=None, logging_middleware=None) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    # Same order as src/main.py
+    if error_middleware:
+        app.add_middleware(error_middleware)
+    if logging_middleware:
+        app.add_middleware(logging_middleware)
+    return app
+
+SCOPE = {
+    "type": "http",
+    "asgi": {"version": "3.0"},
+    "http_version": "1.1",
+    "method": "GET",
+    "scheme": "http",
+    "path": "/ping",
+    "raw_path": b"/ping",
+    "root_path": "",
+    "query_string": b"",
+    "headers": [(b"host", b"bench")],
+    "client": ("127.0.0.1", 1234),
+    "server": ("127.0.0.1", 8000),
+}
+
+def make_receive():
+    """Body once, then block like a server whose client stays connected"""
+    sent = False
+
+    async def receive():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await asyncio.Event().wait()
+
+    return receive
+
+async def send(message):
+    pass
+
+async def bench(app, requests: int) -> float:
+    for _ in range(200):
+        await app(dict(SCOPE), make_receive(), send)
+    start = time.perf_counter_ns()
+    for _ in range(requests):
+        await app(dict(SCOPE), make_receive(), send)
+    return (time.perf_counter_ns() - start) / requests / 1000
+
+async def main(args):
+    bare = await bench(build_app(), args.requests)
+    before = await bench(build_app(BaseErrorHandlerMiddleware, BaseRequestLoggingMiddleware), args.requests)
+    after = await bench(build_app(ErrorHandlerMiddleware, RequestLoggingMiddleware), args.requests)
+    print(f"{'stack':>8}  {'us/request':>11}  {'overhead':>10}")
+    print(f"{'bare':>8}  {bare:>11.1f}  {'-':>10}")
+    print(f"{'before':>8}  {before:>11.1f}  {before - bare:>8.1f}us")
+    print(f"{'after':>8}  {after:>11.1f}  {after - bare:>8.1f}us")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=20000)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,75 @@
+"""LocalQueue publish/consume throughput for small messages on one core.
+
+    python -m benchmarks.bench_local_queue --messages 500000 --size 64
+
+Times publish() awaited per message and publish_many in batches, both with
+the default batched msync (QUEUE_FSYNC_EVERY_MESSAGES / _INTERVAL_MS), then
+a subscriber draining the log and committing its offset once per read
+batch. Segments live in a temporary directory that is removed afterwards.
+"""
+import argparse
+import asyncio
+import tempfile
+import time
+from src.core.config import Settings
+from src.core.local_queue import LocalQueue
+
+def make_message(n: int, size: int) -> dict:
+    return {"id": n, "type": "status", "content": "x" * size}
+
+async def bench_publish(queue: LocalQueue, name: str, messages: int, size: int) -> float:
+    start = time.perf_counter()
+    for n in range(messages):
+        await queue.publish(name, make_message(n, size))
+    return messages / (time.perf_counter() - start)
+
+async def bench_publish_many(queue: LocalQueue, name: str, messages: int, size: int, batch: int) -> float:
+    start = time.perf_counter()
+    for offset in range(0, messages, batch):
+        await queue.publish_many(name, [make_message(n, size) for n in range(offset, min(offset + batch, messages))])
+    return messages / (time.perf_counter() - start)
+
+async def bench_consume(queue: LocalQueue, name: str, messages: int) -> float:
+    received = 0
+    done = asyncio.Event()
+
+    def callback(message):
+        nonlocal received
+        received += 1
+        if received == messages:
+            done.set()
+
+    start = time.perf_counter()
+    await queue.subscribe(name, callback, subscriber="bench")
+    await done.wait()
+    return messages / (time.perf_counter() - start)
+
+async def main(args):
+    with tempfile.TemporaryDirectory() as directory:
+        settings = Settings(
+            QUEUE_LOCAL_DIR=directory,
+            QUEUE_BATCH_SIZE=args.batch,
+            QUEUE_FSYNC_EVERY_MESSAGES=args.fsync_every,
+            QUEUE_FSYNC_INTERVAL_MS=args.fsync_ms,
+        )
+        queue = LocalQueue(settings)
+        await queue.connect()
+        try:
+            published = await bench_publish(queue, "single", args.messages, args.size)
+            many = await bench_publish_many(queue, "batched", args.messages, args.size, args.batch)
+            consumed = await bench_consume(queue, "batched", args.messages)
+            print(f"payload ~{args.size} B, {args.messages} messages, fsync every {args.fsync_every} msgs / {args.fsync_ms} ms")
+            print(f"  publish, one await per message: {published:>10,.0f} msg/s")
+            print(f"  publish_many ({args.batch}/call):       {many:>10,.0f} msg/s")
+            print(f"  consume + commit:               {consumed:>10,.0f} msg/s")
+        finally:
+            await queue.disconnect()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=500000)
+    parser.add_argument("--size", type=int, default=64)
+    parser.add_argument("--batch", type=int, default=500)
+    parser.add_argument("--fsync-every", type=int, default=1000)
+    parser.add_argument("--fsync-ms", type=float, default=50.0)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,63 @@
+"""GET-by-id cost with and without the message cache, against DB_* from the environment.
+
+    python -m benchmarks.bench_message_cache --messages 1000 --reads 20000
+    python -m benchmarks.bench_message_cache --redis redis://localhost:6379/0
+
+Inserts --messages rows (receiver bench-cache), then reads random ids
+--reads times through MessageService.get_message_json: uncached (one
+SELECT and a serialization per read), then through LocalMessageCache and,
+with --redis, RedisMessageCache once every id is warm. The rows are
+deleted afterwards.
+"""
+import argparse
+import asyncio
+import random
+import time
+import uuid
+from sqlalchemy import delete
+from src.core.database import AsyncSessionLocal
+from src.models.message import Message
+from src.services.message import STATUS_RANKS, MessageService
+from src.services.message_cache import LocalMessageCache, RedisMessageCache
+
+async def time_reads(service: MessageService, ids, reads: int) -> float:
+    sample = [random.choice(ids) for _ in range(reads)]
+    start = time.perf_counter()
+    for message_id in sample:
+        await service.get_message_json(message_id)
+    return (time.perf_counter() - start) / reads
+
+async def main(args):
+    async with AsyncSessionLocal() as db:
+        created = await MessageService(db).create_messages(
+            [{"content": f"Cached {n}", "receiver_id": "bench-cache"} for n in range(args.messages)],
+            "bench-cache"
+        )
+        ids = [message.id for message in created]
+        try:
+            results = [("database", await time_reads(MessageService(db), ids, min(args.reads, 2000)))]
+            caches = [("local", LocalMessageCache(args.messages, 600, STATUS_RANKS))]
+            if args.redis:
+                caches.append(("redis", RedisMessageCache(args.redis, 600, STATUS_RANKS, prefix=f"bench-{uuid.uuid4().hex}")))
+            for name, cache in caches:
+                service = MessageService(db, cache=cache)
+                for message_id in ids:
+                    await service.get_message_json(message_id)
+                results.append((name, await time_reads(service, ids, args.reads)))
+                if isinstance(cache, RedisMessageCache):
+                    keys = await cache.connection.keys(f"{cache.prefix}:*")
+                    await cache.connection.delete(*keys)
+                await cache.close()
+            print(f"{args.messages} messages, random reads by id")
+            for name, seconds in results:
+                print(f"  {name:<9} {seconds * 1e6:>9.1f} us/read")
+        finally:
+            await db.execute(delete(Message).where(Message.id.in_(ids)))
+            await db.commit()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=1000)
+    parser.add_argument("--reads", type=int, default=20000)
+    parser.add_argument("--redis", default="")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,76 @@
+"""Compare connect-per-message sends with the pooled MiddlewareClient.
+
+    python -m benchmarks.bench_middleware_client --messages 5000 --concurrency 200
+"""
+import argparse
+import asyncio
+import json
+import time
+import websockets
+from src.core.config import Settings
+from src.services.middleware_client import MiddlewareClient
+from .fake_middleware import serve_fake_middleware
+
+def _payload(i: int) -> dict:
+    return {
+        "content": f"benchmark message {i}",
+        "to": "15550000000@s.whatsapp.net",
+        "type": "text",
+        "metadata": {"id": str(i), "sender_id": "bench", "original_type": "text"},
+    }
+
+async def _run_bounded(count: int, concurrency: int, send_one):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def worker(i):
+        async with semaphore:
+            await send_one(i)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(count)))
+    return time.perf_counter() - start
+
+async def bench_connect_per_message(url: str, count: int, concurrency: int) -> float:
+    async def send_one(i):
+        async with websockets.connect(url) as websocket:
+            await websocket.send(json.dumps(_payload(i)))
+            await websocket.recv()
+
+    return await _run_bounded(count, concurrency, send_one)
+
+async def bench_pooled(url: str, count: int, concurrency: int, pool_size: int) -> float:
+    client = MiddlewareClient(Settings(
+        MIDDLEWARE_WS_URL=url,
+        MIDDLEWARE_POOL_SIZE=pool_size,
+        MIDDLEWARE_MAX_IN_FLIGHT=concurrency,
+    ))
+    await client.start()
+    try:
+        async def send_one(i):
+            await client.send(str(i), _payload(i))
+
+        return await _run_bounded(count, concurrency, send_one)
+    finally:
+        await client.close()
+
+async def main(args):
+    server, url = await serve_fake_middleware(ack_delay=args.ack_delay)
+    try:
+        baseline = await bench_connect_per_message(url, args.messages, args.concurrency)
+        pooled = await bench_pooled(url, args.messages, args.concurrency, args.pool_size)
+    finally:
+        server.close()
+        await server.wait_closed()
+
+    print(f"messages={args.messages} concurrency={args.concurrency} pool_size={args.pool_size}")
+    print(f"connect-per-message: {baseline:.3f}s  {args.messages / baseline:,.0f} msg/s")
+    print(f"pooled client:       {pooled:.3f}s  {args.messages / pooled:,.0f} msg/s")
+    print(f"speedup:             {baseline / pooled:.1f}x")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--pool-size", type=int, default=2)
+    parser.add_argument("--ack-delay", type=float, default=0.0)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,67 @@
+"""PresenceRegistry memory footprint and hot-path cost.
+
+    python -m benchmarks.bench_presence --clients 100000
+
+Measures bytes per tracked session with tracemalloc (entry object, dict
+slot, dirty-set slot and the session id string), then times touch() for
+one frame per client and an away sweep over every entry.
+Pass --db to also time the bulk upsert of every session against DB_*
+from the environment (rows are written under client-* ids).
+"""
+import argparse
+import asyncio
+import gc
+import time
+import tracemalloc
+from src.services.presence import PresenceRegistry, upsert_sessions
+
+def measure_memory(clients: int, shards: int) -> float:
+    client_ids = [f"client-{n:08d}" for n in range(clients)]
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    presence = PresenceRegistry(None, upsert_sessions, shards=shards)
+    for client_id in client_ids:
+        presence.connect(client_id, client_id)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    # The id strings exist anyway (they come from the socket); count them too
+    id_bytes = sum(len(client_id) + 49 for client_id in client_ids)
+    return (after - before + id_bytes) / clients
+
+async def bench(args):
+    presence = PresenceRegistry(None, upsert_sessions, shards=args.shards)
+    client_ids = [f"client-{n:08d}" for n in range(args.clients)]
+    for client_id in client_ids:
+        presence.connect(client_id, client_id)
+
+    start = time.perf_counter()
+    for client_id in client_ids:
+        presence.touch(client_id, client_id)
+    touch = (time.perf_counter() - start) / args.clients
+
+    start = time.perf_counter()
+    presence.sweep(time.time() + presence.away_after + 1)
+    sweep = time.perf_counter() - start
+    shard_sweep = sweep / len(presence.shards)
+
+    if args.db:
+        from src.core.database import AsyncSessionLocal
+        presence._session_factory = AsyncSessionLocal
+        start = time.perf_counter()
+        await presence.flush()
+        flush = time.perf_counter() - start
+        print(f"  flush (one upsert):  {flush * 1000:>10.1f} ms for {args.clients} sessions")
+    print(f"  touch per frame:     {touch * 1e9:>10.0f} ns")
+    print(f"  away sweep:          {sweep * 1000:>10.1f} ms over {args.clients} sessions ({shard_sweep * 1000:.1f} ms per shard)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--clients", type=int, default=100000)
+    parser.add_argument("--shards", type=int, default=64)
+    parser.add_argument("--db", action="store_true")
+    args = parser.parse_args()
+    per_entry = measure_memory(args.clients, args.shards)
+    print(f"{args.clients} sessions, {args.shards} shards")
+    print(f"  memory per session:  {per_entry:>10.0f} B ({per_entry * args.clients / 2**20:.1f} MiB total)")
+    asyncio.run(bench(args))
@@ -0,0 +1,100 @@
+"""RabbitMQQueue publish/consume throughput against a local broker.
+
+    docker run -d -p 5672:5672 rabbitmq:3
+    python -m benchmarks.bench_rabbitmq_queue --messages 100000 --size 1024
+    python -m benchmarks.bench_rabbitmq_queue --messages 100000 --size 2048
+
+Compares awaiting one publisher confirm per message with RabbitMQQueue's
+batched confirms (concurrent publish() callers and publish_many), then
+times a subscriber draining the queue with --prefetch unacked deliveries
+in flight and one ack per message after the callback.
+"""
+import argparse
+import asyncio
+import time
+import uuid
+import aio_pika
+from src.core import codec
+from src.core.config import Settings
+from src.core.queue import RabbitMQQueue
+
+def make_message(n: int, size: int) -> dict:
+    return {"id": n, "type": "new_message", "content": "x" * size}
+
+async def bench_naive_publish(queue: RabbitMQQueue, name: str, messages: int, size: int) -> float:
+    await queue.channel.declare_queue(name, durable=True)
+    start = time.perf_counter()
+    for n in range(messages):
+        await queue.channel.default_exchange.publish(
+            aio_pika.Message(codec.dumps_bytes(make_message(n, size)), delivery_mode=aio_pika.DeliveryMode.PERSISTENT),
+            routing_key=name
+        )
+    return messages / (time.perf_counter() - start)
+
+async def bench_batched_publish(queue: RabbitMQQueue, name: str, messages: int, size: int, concurrency: int) -> float:
+    start = time.perf_counter()
+    for offset in range(0, messages, concurrency):
+        await asyncio.gather(*(
+            queue.publish(name, make_message(n, size))
+            for n in range(offset, min(offset + concurrency, messages))
+        ))
+    return messages / (time.perf_counter() - start)
+
+async def bench_publish_many(queue: RabbitMQQueue, name: str, messages: int, size: int, batch: int) -> float:
+    start = time.perf_counter()
+    for offset in range(0, messages, batch):
+        await queue.publish_many(name, [make_message(n, size) for n in range(offset, min(offset + batch, messages))])
+    return messages / (time.perf_counter() - start)
+
+async def bench_consume(queue: RabbitMQQueue, name: str, messages: int) -> float:
+    received = 0
+    done = asyncio.Event()
+
+    def callback(message):
+        nonlocal received
+        received += 1
+        if received == messages:
+            done.set()
+
+    start = time.perf_counter()
+    await queue.subscribe(name, callback)
+    await done.wait()
+    return messages / (time.perf_counter() - start)
+
+async def main(args):
+    settings = Settings(
+        QUEUE_HOST=args.host,
+        QUEUE_PORT=args.port,
+        QUEUE_PREFETCH_COUNT=args.prefetch,
+        QUEUE_PUBLISH_BATCH_SIZE=args.batch,
+    )
+    queue = RabbitMQQueue(settings)
+    await queue.connect()
+    naive_name = f"bench-naive-{uuid.uuid4().hex}"
+    name = f"bench-{uuid.uuid4().hex}"
+    try:
+        naive_messages = min(args.messages, 5000)
+        naive = await bench_naive_publish(queue, naive_name, naive_messages, args.size)
+        batched = await bench_batched_publish(queue, name, args.messages, args.size, args.concurrency)
+        many = await bench_publish_many(queue, naive_name, args.messages, args.size, args.batch)
+        consumed = await bench_consume(queue, name, args.messages)
+        print(f"payload {args.size} B, {args.messages} messages, prefetch {args.prefetch}")
+        print(f"  publish, one confirm per await: {naive:>10,.0f} msg/s ({naive_messages} messages)")
+        print(f"  publish, concurrent callers:    {batched:>10,.0f} msg/s")
+        print(f"  publish_many:                   {many:>10,.0f} msg/s")
+        print(f"  consume + ack:                  {consumed:>10,.0f} msg/s")
+    finally:
+        await queue.channel.queue_delete(naive_name)
+        await queue.channel.queue_delete(name)
+        await queue.disconnect()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=5672)
+    parser.add_argument("--messages", type=int, default=100000)
+    parser.add_argument("--size", type=int, default=1024)
+    parser.add_argument("--batch", type=int, default=500)
+    parser.add_argument("--prefetch", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=1000)
+    asyncio.run(main(parser.parse_args()))
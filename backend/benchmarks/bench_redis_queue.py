@@ -0,0 +1,92 @@
+"""RedisQueue publish/consume throughput against a local redis-server.
+
+    redis-server --save "" --appendonly no &
+    python -m benchmarks.bench_redis_queue --messages 100000 --size 1024
+
+Compares one awaited XADD per message with RedisQueue's pipelined
+publishes (concurrent publish() callers and publish_many), then times a
+consumer-group subscriber draining the stream (XREADGROUP batches of
+--batch entries, one XACK per batch).
+"""
+import argparse
+import asyncio
+import time
+import uuid
+from src.core import codec
+from src.core.config import Settings
+from src.core.queue import RedisQueue
+
+def make_message(n: int, size: int) -> dict:
+    return {"id": n, "type": "new_message", "content": "x" * size}
+
+async def bench_naive_publish(queue: RedisQueue, stream: str, messages: int, size: int) -> float:
+    start = time.perf_counter()
+    for n in range(messages):
+        await queue.connection.xadd(stream, {b"data": codec.dumps_bytes(make_message(n, size))})
+    return messages / (time.perf_counter() - start)
+
+async def bench_batched_publish(queue: RedisQueue, stream: str, messages: int, size: int, concurrency: int) -> float:
+    start = time.perf_counter()
+    for offset in range(0, messages, concurrency):
+        await asyncio.gather(*(
+            queue.publish(stream, make_message(n, size))
+            for n in range(offset, min(offset + concurrency, messages))
+        ))
+    return messages / (time.perf_counter() - start)
+
+async def bench_publish_many(queue: RedisQueue, stream: str, messages: int, size: int, batch: int) -> float:
+    start = time.perf_counter()
+    for offset in range(0, messages, batch):
+        await queue.publish_many(stream, [make_message(n, size) for n in range(offset, min(offset + batch, messages))])
+    return messages / (time.perf_counter() - start)
+
+async def bench_consume(queue: RedisQueue, stream: str, messages: int) -> float:
+    received = 0
+    done = asyncio.Event()
+
+    def callback(message):
+        nonlocal received
+        received += 1
+        if received == messages:
+            done.set()
+
+    start = time.perf_counter()
+    await queue.subscribe(stream, callback)
+    await done.wait()
+    return messages / (time.perf_counter() - start)
+
+async def main(args):
+    settings = Settings(
+        QUEUE_HOST=args.host,
+        QUEUE_PORT=args.port,
+        QUEUE_BATCH_SIZE=args.batch,
+        QUEUE_CONSUMER_NAME=f"bench-{uuid.uuid4().hex[:8]}",
+    )
+    queue = RedisQueue(settings)
+    await queue.connect()
+    naive_stream = f"bench-naive-{uuid.uuid4().hex}"
+    stream = f"bench-{uuid.uuid4().hex}"
+    try:
+        naive_messages = min(args.messages, 20000)
+        naive = await bench_naive_publish(queue, naive_stream, naive_messages, args.size)
+        batched = await bench_batched_publish(queue, stream, args.messages, args.size, args.concurrency)
+        many = await bench_publish_many(queue, naive_stream, args.messages, args.size, args.batch)
+        consumed = await bench_consume(queue, stream, args.messages)
+        print(f"payload {args.size} B, {args.messages} messages, read batch {args.batch}")
+        print(f"  publish, one XADD per await: {naive:>10,.0f} msg/s ({naive_messages} messages)")
+        print(f"  publish, concurrent callers: {batched:>10,.0f} msg/s")
+        print(f"  publish_many:                {many:>10,.0f} msg/s")
+        print(f"  consume + ack:               {consumed:>10,.0f} msg/s")
+    finally:
+        await queue.connection.delete(naive_stream, stream)
+        await queue.disconnect()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=6379)
+    parser.add_argument("--messages", type=int, default=100000)
+    parser.add_argument("--size", type=int, default=1024)
+    parser.add_argument("--batch", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=1000)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,23 @@
+import asyncio
+import json
+import websockets
+
+async def _handle(websocket, path=None, ack_delay: float = 0.0):
+    async for frame in websocket:
+        data = json.loads(frame)
+        message_id = (data.get("metadata") or {}).get("id")
+        if ack_delay:
+            await asyncio.sleep(ack_delay)
+        if message_id is not None:
+            await websocket.send(json.dumps({"type": "ack", "id": message_id, "status": "sent"}))
+
+async def serve_fake_middleware(host: str = "127.0.0.1", port: int = 0, ack_delay: float = 0.0):
+    """Start a fake middleware that acks every frame by its metadata id.
+
+    Returns the running server and its ws:// URL.
+    """
+    server = await websockets.serve(
+        lambda ws, path=None: _handle(ws, path, ack_delay), host, port
+    )
+    bound_port = next(iter(server.sockets)).getsockname()[1]
+    return server, f"ws://{host}:{bound_port}/ws"
@@ -6,9 +6,13 @@ from jose import JWTError, jwt
 from passlib.context import CryptContext
 from pydantic import BaseModel
 from .config import get_settings
+from .token_cache import VerifiedTokenCache
 
 settings = get_settings()
 
+# Verified claims, so a reused token or API key skips the HMAC check
+token_cache = VerifiedTokenCache(settings.AUTH_CACHE_SIZE, settings.AUTH_CACHE_TTL)
+
 # Password hashing
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
@@ -29,6 +33,14 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
+def decode_token(token: str) -> dict:
+    """jwt.decode through the verified-token cache; raises JWTError like jwt.decode"""
+    payload = token_cache.get(token)
+    if payload is None:
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        token_cache.put(token, payload)
+    return payload
+
 def create_api_key() -> str:
     """Create a new API key"""
     return jwt.encode(
@@ -45,7 +57,7 @@ async def get_api_key(api_key: str = Depends(api_key_header)) -> str:
             detail="API key is missing"
         )
     try:
-        payload = jwt.decode(api_key, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        payload = decode_token(api_key)
         if payload.get("sub") != "api_key":
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -63,7 +75,7 @@ async def verify_api_key(api_key: str = Security(api_key_header)) -> str:
     if not api_key:
         return None
     try:
-        payload = jwt.decode(api_key, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        payload = decode_token(api_key)
         if payload.get("sub") != "api_key":
             return None
         return api_key
@@ -85,7 +97,7 @@ async def verify_token(token: str = Security(oauth2_scheme)) -> dict:
         if token.startswith('Bearer '):
             token = token.split(' ')[1]
             
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        payload = decode_token(token)
         if not payload.get("sub"):
             return None
         return payload
@@ -0,0 +1,82 @@
+import json
+from typing import Any, Optional
+from .config import get_settings
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:  # pragma: no cover - optional dependency
+    msgspec = None
+
+def _select_backend(preferred: str) -> str:
+    """Pick the JSON backend: JSON_CODEC if installed, else the fastest available"""
+    available = {"orjson": orjson is not None, "msgspec": msgspec is not None, "json": True}
+    if preferred != "auto":
+        if not available.get(preferred):
+            raise ValueError(f"JSON codec '{preferred}' is not installed")
+        return preferred
+    for name in ("orjson", "msgspec", "json"):
+        if available[name]:
+            return name
+
+BACKEND = _select_backend(get_settings().JSON_CODEC)
+
+if BACKEND == "msgspec":
+    _msgspec_encoder = msgspec.json.Encoder()
+    _msgspec_decoder = msgspec.json.Decoder()
+
+def dumps_bytes(obj: Any) -> bytes:
+    """Serialize to compact UTF-8 JSON"""
+    if BACKEND == "orjson":
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            pass  # e.g. ints beyond 64 bits; stdlib handles them
+    elif BACKEND == "msgspec":
+        try:
+            return _msgspec_encoder.encode(obj)
+        except (TypeError, msgspec.EncodeError):
+            pass
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False, default=str).encode()
+
+def dumps_compact(obj: Any) -> bytes:
+    """dumps_bytes for values held in memory long term.
+
+    orjson hands back its whole output buffer, so a 200-byte document can
+    pin over 1 KiB; copying it leaves an exactly sized object.
+    """
+    data = dumps_bytes(obj)
+    return memoryview(data).tobytes() if BACKEND == "orjson" else data
+
+def dumps(obj: Any) -> str:
+    return dumps_bytes(obj).decode()
+
+def loads(data) -> Any:
+    """Parse JSON text or bytes. Raises ValueError on malformed input."""
+    if BACKEND == "orjson":
+        return orjson.loads(data)
+    if BACKEND == "msgspec":
+        try:
+            return _msgspec_decoder.decode(data.encode() if isinstance(data, str) else data)
+        except msgspec.DecodeError as e:
+            raise ValueError(str(e)) from e
+    return json.loads(data)
+
+class EncodedMessage:
+    """A message that is serialized at most once, however many sockets it goes to"""
+
+    __slots__ = ("message", "_text")
+
+    def __init__(self, message: Any):
+        self.message = message
+        self._text: Optional[str] = None
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            self._text = dumps(self.message)
+        return self._text
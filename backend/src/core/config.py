@@ -1,6 +1,7 @@
 from pydantic import BaseSettings
 from functools import lru_cache
 import os
+import socket
 from typing import Optional
 
 class Settings(BaseSettings):
@@ -24,11 +25,98 @@ class Settings(BaseSettings):
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     ALGORITHM: str = "HS256"  # Add this line
     VALID_API_KEYS: list = ["test-api-key"]  # Add this line for testing
+    AUTH_CACHE_SIZE: int = 10000
+    AUTH_CACHE_TTL: int = 300
 
-    # Queue Settings (for future implementation)
+    # Message Settings
+    MESSAGE_BATCH_MAX_SIZE: int = 1000
+    MESSAGE_STATUS_BATCH_MAX_SIZE: int = 10000
+    MESSAGE_STATUS_BUFFER: bool = False
+    MESSAGE_STATUS_FLUSH_INTERVAL_MS: int = 1000
+    MESSAGE_GROUP_COMMIT: bool = False
+    MESSAGE_GROUP_COMMIT_WINDOW_MS: float = 2.0
+    MESSAGE_GROUP_COMMIT_MAX_ROWS: int = 256
+    # Read-through cache for GET /api/messages/{id}
+    MESSAGE_CACHE: str = "none"  # or "local", "redis" (shared by every worker)
+    MESSAGE_CACHE_SIZE: int = 100000  # local only
+    MESSAGE_CACHE_TTL: float = 60.0
+    MESSAGE_CACHE_REDIS_URL: str = os.getenv("MESSAGE_CACHE_REDIS_URL", "redis://localhost:6379/0")
+    # Newest messages of recently read conversations, for first pages
+    CONVERSATION_TAIL: bool = False
+    CONVERSATION_TAIL_SIZE: int = 50  # messages per conversation, at most MAX_PAGE_SIZE
+    CONVERSATION_TAIL_MEMORY_BYTES: int = 64 * 1024 * 1024  # across every conversation
+    CONVERSATION_TAIL_TTL: float = 30.0  # seconds before a tail is reloaded
+
+    # Logging Settings
+    LOG_CONFIG_PATH: str = os.getenv("LOG_CONFIG_PATH", "")
+
+    # Middleware Settings
+    MIDDLEWARE_WS_URL: str = os.getenv("MIDDLEWARE_WS_URL", "ws://localhost:8080/ws")
+    MIDDLEWARE_POOL_SIZE: int = 2
+    MIDDLEWARE_MAX_IN_FLIGHT: int = 256
+    MIDDLEWARE_ACK_TIMEOUT: float = 10.0
+    MIDDLEWARE_ACQUIRE_TIMEOUT: float = 5.0
+    MIDDLEWARE_RECONNECT_DELAY: float = 0.5
+    MIDDLEWARE_MAX_RECONNECT_DELAY: float = 10.0
+
+    # Webhook Delivery Settings
+    WEBHOOK_MAX_CONCURRENCY: int = 200
+    WEBHOOK_CONNECTIONS_PER_HOST: int = 20
+    WEBHOOK_CONNECT_TIMEOUT: float = 5.0
+    WEBHOOK_TOTAL_TIMEOUT: float = 15.0
+    WEBHOOK_DNS_CACHE_TTL: int = 300
+    WEBHOOK_BATCH_SIZE: int = 200
+    WEBHOOK_BATCH_INTERVAL_MS: int = 50
+    WEBHOOK_MAX_PENDING: int = 10000  # unbatched POSTs queued or in flight; more are dropped
+
+    # Event Dispatch Settings
+    EVENT_QUEUE_MAX_SIZE: int = 10000
+    EVENT_DISPATCH_WORKERS: int = 4
+    EVENT_DISPATCH_BATCH_SIZE: int = 64
+    EVENT_PUBLISH_TIMEOUT: float = 0.5
+
+    # Event Bus Settings (fan-out across uvicorn workers)
+    EVENT_BUS: str = "none"  # or "unix", "queue"
+    EVENT_BUS_DIR: str = os.getenv("EVENT_BUS_DIR", "/tmp/whatsapp_bot-bus")
+    EVENT_BUS_TOPIC: str = "events"
+    EVENT_BUS_MAX_LEN: int = 100000  # approximate stream trimming for EVENT_BUS=queue
+    EVENT_BUS_WORKER_ID: str = os.getenv("EVENT_BUS_WORKER_ID", "")  # default: hostname-pid
+    EVENT_BUS_SNAPSHOT_INTERVAL: float = 5.0  # seconds between full client lists; silent peers expire after 3
+
+    # Presence Settings
+    PRESENCE_SHARDS: int = 64
+    PRESENCE_FLUSH_INTERVAL: float = 5.0  # seconds between bulk upserts to sessions
+    PRESENCE_AWAY_AFTER: float = 60.0  # seconds without a frame before online turns away
+
+    # Serialization Settings
+    JSON_CODEC: str = "auto"  # or "orjson", "msgspec", "json"
+
+    # WebSocket Settings
+    WS_SEND_BUFFER_SIZE: int = 1000
+    WS_SLOW_CONSUMER_POLICY: str = "drop_oldest"  # or "drop_newest", "disconnect"
+
+    # Queue Settings
     QUEUE_HOST: Optional[str] = None
     QUEUE_PORT: Optional[int] = None
-    QUEUE_TYPE: str = "redis"  # or "rabbitmq"
+    QUEUE_TYPE: str = "redis"  # or "rabbitmq", "local"
+    QUEUE_USER: str = os.getenv("QUEUE_USER", "guest")  # RabbitMQ only
+    QUEUE_PASSWORD: Optional[str] = os.getenv("QUEUE_PASSWORD")
+    QUEUE_VHOST: str = "/"  # RabbitMQ only
+    QUEUE_CONSUMER_GROUP: str = "whatsapp_bot"
+    # Keep stable across restarts so a worker picks its own unacked entries back up
+    QUEUE_CONSUMER_NAME: str = os.getenv("QUEUE_CONSUMER_NAME", socket.gethostname())
+    QUEUE_BATCH_SIZE: int = 100
+    QUEUE_BLOCK_MS: int = 1000
+    QUEUE_CLAIM_IDLE_MS: int = 30000
+    QUEUE_MAX_LEN: Optional[int] = None  # approximate stream trimming
+    QUEUE_PUBLISH_BATCH_SIZE: int = 500
+    QUEUE_PUBLISH_BATCH_DELAY_MS: float = 1.0
+    QUEUE_PREFETCH_COUNT: int = 200  # RabbitMQ unacked deliveries per consumer
+    # Local durable queue (QUEUE_TYPE=local)
+    QUEUE_LOCAL_DIR: str = os.getenv("QUEUE_LOCAL_DIR", "data/queue")
+    QUEUE_SEGMENT_BYTES: int = 64 * 1024 * 1024
+    QUEUE_FSYNC_EVERY_MESSAGES: int = 1000
+    QUEUE_FSYNC_INTERVAL_MS: float = 50.0
 
     class Config:
         case_sensitive = True
@@ -1,6 +1,9 @@
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
 from typing import AsyncGenerator
+from time import perf_counter
 from .config import get_settings
+from .metrics import db_query_duration
 
 settings = get_settings()
 
@@ -16,6 +19,14 @@ engine = create_async_engine(
     max_overflow=10
 )
 
+@event.listens_for(engine.sync_engine, "before_cursor_execute")
+def _start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    context._query_start = perf_counter()
+
+@event.listens_for(engine.sync_engine, "after_cursor_execute")
+def _record_query_time(conn, cursor, statement, parameters, context, executemany):
+    db_query_duration.observe(perf_counter() - context._query_start)
+
 # Create async session maker
 AsyncSessionLocal = async_sessionmaker(
     engine,
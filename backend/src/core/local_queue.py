@@ -0,0 +1,315 @@
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+import asyncio
+import mmap
+import os
+import re
+import struct
+import zlib
+from . import codec
+from .config import Settings
+from .logging_config import get_logger
+from .queue import QueueBase, _run_callback
+
+logger = get_logger(__name__)
+
+# Record header: payload length, CRC32 of the payload. A zero length marks the
+# end of the written data in a segment.
+HEADER = struct.Struct("<II")
+_ZERO_HEADER = bytes(HEADER.size)
+_QUEUE_NAME = re.compile(r"^[A-Za-z0-9_.-]+$")
+
+class _Segment:
+    """One preallocated, memory-mapped segment file"""
+
+    __slots__ = ("index", "path", "fd", "mm")
+
+    def __init__(self, path: Path, index: int, size: int):
+        self.index = index
+        self.path = path
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        if os.fstat(self.fd).st_size < size:
+            os.ftruncate(self.fd, size)
+        self.mm = mmap.mmap(self.fd, size)
+
+    def close(self):
+        self.mm.close()
+        os.close(self.fd)
+
+class SegmentLog:
+    """Append-only log for one queue, split into fixed-size segment files.
+
+    Offsets are global byte positions: segment ``n`` covers
+    ``[n * segment_bytes, (n + 1) * segment_bytes)``. Writes go straight into
+    the mapped active segment; ``sync`` msyncs what was written since the
+    last sync and fsyncs subscriber offsets. Segments every subscriber has
+    consumed are deleted.
+    """
+
+    def __init__(self, directory: Path, segment_bytes: int):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.segments: Dict[int, _Segment] = {}  # mapped so far
+        self.indexes: Set[int] = set()  # on disk
+        self.offsets: Dict[str, int] = {}
+        self._offset_fds: Dict[str, int] = {}
+        self._syncing: Set[int] = set()
+        self.appended = asyncio.Event()
+        self.write_offset = 0
+        self.synced_offset = 0
+        self.unsynced = 0
+        self._recover()
+
+    def _segment_path(self, index: int) -> Path:
+        return self.directory / f"{index:012d}.seg"
+
+    def _segment(self, index: int) -> _Segment:
+        segment = self.segments.get(index)
+        if segment is None:
+            segment = self.segments[index] = _Segment(self._segment_path(index), index, self.segment_bytes)
+            self.indexes.add(index)
+        return segment
+
+    def _recover(self):
+        """Find the end of valid data and load committed subscriber offsets"""
+        indexes = sorted(int(path.stem) for path in self.directory.glob("*.seg"))
+        self.indexes.update(indexes)
+        last = indexes[-1] if indexes else 0
+        mm = self._segment(last).mm
+        position = 0
+        while position + HEADER.size <= self.segment_bytes:
+            length, crc = HEADER.unpack_from(mm, position)
+            end = position + HEADER.size + length
+            if length == 0 or end > self.segment_bytes or zlib.crc32(mm[position + HEADER.size:end]) != crc:
+                break
+            position = end
+        if position + HEADER.size <= self.segment_bytes:
+            # Drop a torn tail left by a crash mid-write
+            mm[position:position + HEADER.size] = _ZERO_HEADER
+        self.write_offset = self.synced_offset = last * self.segment_bytes + position
+        self.first_offset = (indexes[0] if indexes else 0) * self.segment_bytes
+
+        for path in self.directory.glob("*.offset"):
+            data = path.read_bytes()
+            if len(data) == 8:
+                self.offsets[path.stem] = struct.unpack("<Q", data)[0]
+
+    def append(self, payload: bytes):
+        record_size = HEADER.size + len(payload)
+        if record_size > self.segment_bytes:
+            raise ValueError(f"Message of {len(payload)} bytes does not fit a {self.segment_bytes}-byte segment")
+        index, position = divmod(self.write_offset, self.segment_bytes)
+        if position + record_size > self.segment_bytes:
+            # Roll over; the zeroed header at ``position`` tells readers to move on.
+            # The finished segment's tail is msynced by the next sync()
+            self.write_offset = (index + 1) * self.segment_bytes
+            index, position = index + 1, 0
+        mm = self._segment(index).mm
+        end = position + record_size
+        mm[position + HEADER.size:end] = payload
+        HEADER.pack_into(mm, position, len(payload), zlib.crc32(payload))
+        if end + HEADER.size <= self.segment_bytes:
+            mm[end:end + HEADER.size] = _ZERO_HEADER
+        self.write_offset = index * self.segment_bytes + end
+        self.unsynced += 1
+        self.appended.set()
+
+    def read(self, offset: int, max_count: int) -> List[Tuple[int, bytes]]:
+        """Up to ``max_count`` (next offset, payload) pairs starting at ``offset``"""
+        records = []
+        offset = max(offset, self.first_offset)
+        while offset < self.write_offset and len(records) < max_count:
+            index, position = divmod(offset, self.segment_bytes)
+            if position + HEADER.size > self.segment_bytes:
+                offset = (index + 1) * self.segment_bytes
+                continue
+            mm = self._segment(index).mm
+            length, _ = HEADER.unpack_from(mm, position)
+            if length == 0:
+                offset = (index + 1) * self.segment_bytes
+                continue
+            start = position + HEADER.size
+            offset += HEADER.size + length
+            records.append((offset, mm[start:start + length]))
+        return records
+
+    def subscriber_offset(self, name: str) -> int:
+        return max(self.offsets.get(name, self.first_offset), self.first_offset)
+
+    def register(self, name: str) -> int:
+        """Record a new subscriber's starting offset so truncation keeps its segments"""
+        offset = self.subscriber_offset(name)
+        if name not in self.offsets:
+            self.commit(name, offset)
+        return offset
+
+    def commit(self, name: str, offset: int):
+        fd = self._offset_fds.get(name)
+        if fd is None:
+            fd = self._offset_fds[name] = os.open(self.directory / f"{name}.offset", os.O_RDWR | os.O_CREAT, 0o644)
+        os.pwrite(fd, struct.pack("<Q", offset), 0)
+        self.offsets[name] = offset
+        self._truncate()
+
+    def _truncate(self):
+        """Delete segments that every known subscriber has read past"""
+        keep_from = min(min(self.offsets.values()), self.write_offset) // self.segment_bytes
+        if keep_from * self.segment_bytes <= self.first_offset:
+            return
+        for index in sorted(i for i in self.indexes if i < keep_from):
+            if index in self._syncing:
+                return
+            segment = self.segments.pop(index, None)
+            if segment is not None:
+                segment.close()
+            self._segment_path(index).unlink(missing_ok=True)
+            self.indexes.discard(index)
+            self.first_offset = (index + 1) * self.segment_bytes
+
+    async def sync(self):
+        """msync everything appended since the last sync, then fsync offsets"""
+        start, end = self.synced_offset, self.write_offset
+        self.unsynced = 0
+        while start < end:
+            index, position = divmod(start, self.segment_bytes)
+            segment_end = min(end - index * self.segment_bytes, self.segment_bytes)
+            aligned = position - position % mmap.PAGESIZE
+            if index in self.indexes:
+                segment = self._segment(index)
+                self._syncing.add(index)
+                try:
+                    await asyncio.to_thread(segment.mm.flush, aligned, segment_end - aligned)
+                finally:
+                    self._syncing.discard(index)
+            start = index * self.segment_bytes + segment_end
+        self.synced_offset = max(self.synced_offset, end)
+        fds = list(self._offset_fds.values())
+        if fds:
+            await asyncio.to_thread(lambda: [os.fsync(fd) for fd in fds])
+
+    def close(self):
+        for segment in self.segments.values():
+            segment.mm.flush()
+            segment.close()
+        self.segments.clear()
+        for fd in self._offset_fds.values():
+            os.fsync(fd)
+            os.close(fd)
+        self._offset_fds.clear()
+
+class LocalQueue(QueueBase):
+    """Durable single-node queue on memory-mapped append-only segment files.
+
+    Each queue is a directory of QUEUE_SEGMENT_BYTES segments under
+    QUEUE_LOCAL_DIR. Data is msynced every QUEUE_FSYNC_EVERY_MESSAGES
+    messages or QUEUE_FSYNC_INTERVAL_MS, whichever comes first, so a process
+    crash loses nothing and an OS crash at most that window. Every subscriber
+    name (QUEUE_CONSUMER_GROUP by default) keeps its own committed offset and
+    resumes from it after a restart; delivery is at-least-once.
+    """
+
+    def __init__(self, settings: Settings):
+        self.settings = settings
+        self.directory = Path(settings.QUEUE_LOCAL_DIR)
+        self.segment_bytes = settings.QUEUE_SEGMENT_BYTES
+        self.fsync_every = max(1, settings.QUEUE_FSYNC_EVERY_MESSAGES)
+        self.fsync_interval = settings.QUEUE_FSYNC_INTERVAL_MS / 1000
+        self.batch_size = settings.QUEUE_BATCH_SIZE
+        self.logs: Dict[str, SegmentLog] = {}
+        self._consumers: List[asyncio.Task] = []
+        self._sync_timer: Optional[asyncio.TimerHandle] = None
+        self._sync_task: Optional[asyncio.Task] = None
+
+    async def connect(self) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    async def disconnect(self) -> None:
+        for task in self._consumers:
+            task.cancel()
+        if self._consumers:
+            await asyncio.gather(*self._consumers, return_exceptions=True)
+        self._consumers.clear()
+        if self._sync_timer is not None:
+            self._sync_timer.cancel()
+            self._sync_timer = None
+        if self._sync_task is not None:
+            await asyncio.gather(self._sync_task, return_exceptions=True)
+        for log in self.logs.values():
+            log.close()
+        self.logs.clear()
+
+    def _log(self, queue: str) -> SegmentLog:
+        log = self.logs.get(queue)
+        if log is None:
+            if not _QUEUE_NAME.match(queue):
+                raise ValueError(f"Invalid queue name: {queue}")
+            log = self.logs[queue] = SegmentLog(self.directory / queue, self.segment_bytes)
+        return log
+
+    async def publish(self, queue: str, message: Any) -> None:
+        log = self._log(queue)
+        log.append(codec.dumps_bytes(message))
+        self._schedule_sync(log)
+
+    async def publish_many(self, queue: str, messages: List[Any]) -> None:
+        log = self._log(queue)
+        for message in messages:
+            log.append(codec.dumps_bytes(message))
+        self._schedule_sync(log)
+
+    def _schedule_sync(self, log: SegmentLog):
+        if log.unsynced >= self.fsync_every:
+            self._start_sync()
+        elif self._sync_timer is None:
+            self._sync_timer = asyncio.get_running_loop().call_later(self.fsync_interval, self._start_sync)
+
+    def _start_sync(self):
+        if self._sync_timer is not None:
+            self._sync_timer.cancel()
+            self._sync_timer = None
+        if self._sync_task is None or self._sync_task.done():
+            self._sync_task = asyncio.create_task(self._sync_all())
+
+    async def _sync_all(self):
+        try:
+            for log in list(self.logs.values()):
+                await log.sync()
+        except Exception as e:
+            logger.error(f"Local queue sync failed: {str(e)}")
+        # Anything appended while syncing goes out on the next interval
+        if any(log.unsynced for log in self.logs.values()) and self._sync_timer is None:
+            self._sync_timer = asyncio.get_running_loop().call_later(self.fsync_interval, self._start_sync)
+
+    async def subscribe(self, queue: str, callback: callable, subscriber: Optional[str] = None) -> None:
+        """Consume ``queue`` in the background from ``subscriber``'s committed offset"""
+        name = subscriber or self.settings.QUEUE_CONSUMER_GROUP
+        if not _QUEUE_NAME.match(name):
+            raise ValueError(f"Invalid subscriber name: {name}")
+        log = self._log(queue)
+        offset = log.register(name)
+        self._consumers.append(asyncio.create_task(self._consume(queue, log, name, offset, callback)))
+
+    async def _consume(self, queue: str, log: SegmentLog, name: str, offset: int, callback: callable):
+        while True:
+            records = log.read(offset, self.batch_size)
+            if not records:
+                log.appended.clear()
+                await log.appended.wait()
+                continue
+            committed = offset
+            for next_offset, payload in records:
+                try:
+                    await _run_callback(callback, codec.loads(payload))
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.error(f"Queue callback failed for {queue} at offset {committed}: {str(e)}")
+                    break
+                committed = next_offset
+            if committed != offset:
+                log.commit(name, committed)
+                offset = committed
+            if committed != records[-1][0]:
+                # Redeliver from the failed record after a pause
+                await asyncio.sleep(1)
@@ -0,0 +1,151 @@
+import logging
+import threading
+import time
+import weakref
+from typing import Dict, Optional, Tuple
+
+class _CallSite:
+    __slots__ = ("seen", "tokens", "refilled_at", "suppressed", "window_start")
+
+    def __init__(self, tokens: float, now: float):
+        self.seen = 0
+        self.tokens = tokens
+        self.refilled_at = now
+        self.suppressed = 0
+        self.window_start = now
+
+class SamplingFilter(logging.Filter):
+    """Per-call-site sampling and rate limiting for high-volume log lines.
+
+    Each ``logger.info(...)`` call site (logger name and line number) keeps
+    1 in ``sample_rate`` records, then spends a token from its own bucket
+    (``rate`` per second, up to ``burst``). Suppressed records are counted and
+    replaced by one summary line per ``summary_interval`` seconds, written
+    when the call site logs again or by ``emit_due`` (the logging listener
+    thread calls ``emit_due_all`` about once a second), whichever is first.
+    Records above ``max_level`` always pass.
+    """
+
+    _instances: "weakref.WeakSet[SamplingFilter]" = weakref.WeakSet()
+    _instances_lock = threading.Lock()
+
+    def __init__(
+        self,
+        sample_rate: int = 1,
+        rate: Optional[float] = None,
+        burst: Optional[float] = None,
+        summary_interval: float = 10.0,
+        max_level: int = logging.INFO
+    ):
+        super().__init__()
+        self.sample_rate = max(1, int(sample_rate))
+        self.rate = rate
+        self.burst = burst if burst is not None else (rate or 0)
+        self.summary_interval = summary_interval
+        self.max_level = logging._checkLevel(max_level)
+        self._sites: Dict[Tuple[str, int], _CallSite] = {}
+        self.suppressed = 0
+        # filter() runs on logging threads, emit_due() on the listener thread
+        self._lock = threading.RLock()
+        with SamplingFilter._instances_lock:
+            SamplingFilter._instances.add(self)
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > self.max_level or getattr(record, "sampling_summary", False):
+            return True
+
+        with self._lock:
+            return self._filter(record)
+
+    def _filter(self, record: logging.LogRecord) -> bool:
+        now = time.monotonic()
+        key = (record.name, record.lineno)
+        site = self._sites.get(key)
+        if site is None:
+            site = self._sites[key] = _CallSite(self.burst, now)
+
+        site.seen += 1
+        allowed = (site.seen - 1) % self.sample_rate == 0
+        if allowed and self.rate:
+            site.tokens = min(self.burst, site.tokens + (now - site.refilled_at) * self.rate)
+            site.refilled_at = now
+            if site.tokens >= 1:
+                site.tokens -= 1
+            else:
+                allowed = False
+
+        if not allowed:
+            site.suppressed += 1
+            self.suppressed += 1
+        if site.suppressed and now - site.window_start >= self.summary_interval:
+            self._emit_summary(record, site, now)
+        elif not site.suppressed:
+            site.window_start = now
+        return allowed
+
+    def _emit_summary(self, record: logging.LogRecord, site: _CallSite, now: float):
+        summary = logging.makeLogRecord({
+            "name": record.name,
+            "levelno": record.levelno,
+            "levelname": record.levelname,
+            "pathname": record.pathname,
+            "filename": record.filename,
+            "module": record.module,
+            "lineno": record.lineno,
+            "funcName": record.funcName,
+            "msg": f"Suppressed {site.suppressed:,} similar messages in last {now - site.window_start:.0f}s ({record.module}:{record.lineno})",
+            "sampling_summary": True,
+        })
+        site.suppressed = 0
+        site.window_start = now
+        logging.getLogger(record.name).handle(summary)
+
+    def _emit_pending(self, due_only: bool):
+        with self._lock:
+            now = time.monotonic()
+            for (name, lineno), site in list(self._sites.items()):
+                if not site.suppressed or (due_only and now - site.window_start < self.summary_interval):
+                    continue
+                record = logging.makeLogRecord({
+                    "name": name, "levelno": logging.INFO, "levelname": "INFO", "lineno": lineno,
+                    "module": name.rsplit(".", 1)[-1],
+                })
+                self._emit_summary(record, site, now)
+
+    def flush(self):
+        """Emit summaries for everything suppressed since the last one"""
+        self._emit_pending(due_only=False)
+
+    def emit_due(self):
+        """Emit summaries for call sites whose ``summary_interval`` has passed"""
+        self._emit_pending(due_only=True)
+
+    @classmethod
+    def _all(cls) -> "list[SamplingFilter]":
+        with cls._instances_lock:
+            return list(cls._instances)
+
+    @classmethod
+    def flush_all(cls):
+        for instance in cls._all():
+            instance.flush()
+
+    @classmethod
+    def emit_due_all(cls):
+        for instance in cls._all():
+            instance.emit_due()
+
+def apply_sampling(config: Dict[str, Dict]) -> Dict[str, SamplingFilter]:
+    """Attach a SamplingFilter to each logger named in ``config``
+
+    ``config`` maps logger names to SamplingFilter keyword arguments, e.g.
+    ``{"src.services.outbound": {"sample_rate": 100, "rate": 20}}``.
+    """
+    filters = {}
+    for name, options in (config or {}).items():
+        logger = logging.getLogger(name)
+        for existing in [f for f in logger.filters if isinstance(f, SamplingFilter)]:
+            logger.removeFilter(existing)
+        filters[name] = SamplingFilter(**(options or {}))
+        logger.addFilter(filters[name])
+    return filters
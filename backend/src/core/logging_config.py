@@ -1,33 +1,136 @@
+import atexit
 import logging.config
+import logging.handlers
+import queue
+import time
 import yaml
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Tuple
+from .log_sampling import SamplingFilter, apply_sampling
+from .metrics import registry
 
-def setup_logging(config_path: Path = None, default_level: int = logging.INFO) -> None:
-    """Setup logging configuration
+DEFAULT_QUEUE_SIZE = 10000
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Hands records to the background listener without ever blocking.
+
+    When the bounded queue is full the record is dropped and counted rather
+    than stalling the event loop on a slow disk.
+    """
+
+    def __init__(self, log_queue: queue.Queue, route: int):
+        super().__init__(log_queue)
+        self.route = route
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = super().prepare(record)
+        record.log_route = self.route
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+class RoutingQueueListener(logging.handlers.QueueListener):
+    """Writes each record to the handlers of the logger that emitted it.
+
+    Every ``summary_check_interval`` seconds, busy or idle, it also has the
+    sampling filters emit summaries that are due, so a burst that stopped
+    is still reported.
+    """
+
+    summary_check_interval = 1.0
+
+    def __init__(self, log_queue: queue.Queue, routes: List[Tuple[logging.Handler, ...]]):
+        super().__init__(log_queue)
+        self.routes = routes
+        self._next_summary_check = 0.0
+
+    def dequeue(self, block: bool):
+        while True:
+            now = time.monotonic()
+            if now >= self._next_summary_check:
+                self._next_summary_check = now + self.summary_check_interval
+                SamplingFilter.emit_due_all()
+            try:
+                return self.queue.get(block, timeout=self.summary_check_interval)
+            except queue.Empty:
+                if not block:
+                    raise
+
+    def handle(self, record: logging.LogRecord):
+        for handler in self.routes[record.log_route]:
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+    def enqueue_sentinel(self):
+        # Blocking put: the queue may be full, and this thread is draining it
+        self.queue.put(self._sentinel)
+
+    def stop(self):
+        super().stop()
+        for handlers in self.routes:
+            for handler in handlers:
+                handler.flush()
+
+_listener: Optional[RoutingQueueListener] = None
+_queue_handlers: List[DroppingQueueHandler] = []
+# (logger, queue handler) pairs so shutdown can put the real handlers back
+_attached: List[Tuple[logging.Logger, DroppingQueueHandler]] = []
+
+def setup_logging(config_path: Path = None, default_level: int = logging.INFO, queue_size: int = None) -> logging.Logger:
+    """Setup logging configuration, the single entry point for the app
+
+    Handlers come from ``config_path`` (YAML, dictConfig schema plus optional
+    ``queue: {max_size: N}`` and ``sampling: {logger: options}`` sections) or
+    the default configuration. Every handler is then moved behind one bounded
+    queue drained by a background thread, so logging calls never do file or
+    console I/O on the event loop. ``sampling`` attaches a SamplingFilter to
+    each named logger, see core/log_sampling.py.
 
     Args:
         config_path (Path): Path to the logging configuration file
         default_level (int): Default logging level if config file is not found
+        queue_size (int): Queue bound; overrides the config file's ``queue.max_size``
+
+    Returns:
+        logging.Logger: Root logger
     """
+    config = None
     if config_path and config_path.exists():
         with open(config_path, 'rt') as f:
             try:
                 config = yaml.safe_load(f.read())
-                logging.config.dictConfig(config)
             except Exception as e:
                 print(f'Error loading logging configuration: {e}')
-                setup_default_logging(default_level)
-    else:
-        setup_default_logging(default_level)
+    if config is None:
+        config = default_logging_config(default_level)
+
+    queue_config = config.pop('queue', None) or {}
+    sampling_config = config.pop('sampling', None) or {}
+    queue_size = queue_size or queue_config.get('max_size', DEFAULT_QUEUE_SIZE)
 
-def setup_default_logging(level: int = logging.INFO) -> None:
-    """Setup default logging configuration
+    shutdown_logging()
+    _create_log_directories(config)
+    try:
+        logging.config.dictConfig(config)
+    except Exception as e:
+        print(f'Error applying logging configuration: {e}')
+        logging.config.dictConfig(default_logging_config(default_level))
+    _install_queue(queue_size)
+    apply_sampling(sampling_config)
+    return logging.getLogger()
+
+def default_logging_config(level: int = logging.INFO) -> Dict[str, Any]:
+    """Default logging configuration
 
     Args:
         level (int): Logging level
     """
-    config = {
+    return {
         'version': 1,
         'disable_existing_loggers': False,
         'formatters': {
@@ -72,10 +175,86 @@ def setup_default_logging(level: int = logging.INFO) -> None:
                 'handlers': ['console', 'file', 'error_file'],
                 'level': level,
                 'propagate': True
+            },
+            'uvicorn': {
+                'handlers': ['console', 'file', 'error_file'],
+                'level': 'INFO',
+                'propagate': False
             }
+        },
+        # Per-message lines: sample 1 in N and/or rate-limit per call site
+        'sampling': {
+            'src.services.outbound': {'sample_rate': 100, 'rate': 20, 'summary_interval': 10},
+            'src.services.message': {'sample_rate': 10, 'rate': 20, 'summary_interval': 10},
+            'src.services.event_manager': {'rate': 20, 'burst': 100, 'summary_interval': 10}
         }
     }
-    logging.config.dictConfig(config)
+
+def _create_log_directories(config: Dict[str, Any]):
+    for handler in config.get('handlers', {}).values():
+        filename = handler.get('filename')
+        if filename:
+            Path(filename).parent.mkdir(parents=True, exist_ok=True)
+
+def _install_queue(queue_size: int):
+    """Swap every logger's handlers for a queue handler feeding one listener thread"""
+    global _listener
+    log_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+    routes: List[Tuple[logging.Handler, ...]] = []
+    route_ids: Dict[Tuple[int, ...], int] = {}
+
+    loggers = [logging.getLogger()] + [
+        logger for logger in logging.Logger.manager.loggerDict.values()
+        if isinstance(logger, logging.Logger)
+    ]
+    for logger in loggers:
+        handlers = tuple(h for h in logger.handlers if not isinstance(h, DroppingQueueHandler))
+        if not handlers:
+            continue
+        key = tuple(id(h) for h in handlers)
+        if key not in route_ids:
+            route_ids[key] = len(routes)
+            routes.append(handlers)
+            _queue_handlers.append(DroppingQueueHandler(log_queue, route_ids[key]))
+        for handler in handlers:
+            logger.removeHandler(handler)
+        logger.addHandler(_queue_handlers[route_ids[key]])
+        _attached.append((logger, _queue_handlers[route_ids[key]]))
+
+    _listener = RoutingQueueListener(log_queue, routes)
+    _listener.start()
+
+def shutdown_logging():
+    """Stop the listener thread after it writes everything still queued
+
+    The original handlers are reattached, so anything logged afterwards is
+    written directly instead of being lost.
+    """
+    global _listener
+    SamplingFilter.flush_all()
+    if _listener is not None:
+        _listener.stop()
+        for logger, queue_handler in _attached:
+            logger.removeHandler(queue_handler)
+            for handler in _listener.routes[queue_handler.route]:
+                logger.addHandler(handler)
+        _listener = None
+    _attached.clear()
+    _queue_handlers.clear()
+
+def logging_stats() -> Dict[str, int]:
+    """Queue depth and records dropped because the queue was full"""
+    log_queue = _listener.queue if _listener is not None else None
+    return {
+        'queued': log_queue.qsize() if log_queue is not None else 0,
+        'max_size': log_queue.maxsize if log_queue is not None else 0,
+        'dropped': sum(handler.dropped for handler in _queue_handlers),
+    }
+
+atexit.register(shutdown_logging)
+
+registry.gauge("log_records_dropped", "Log records dropped because the logging queue was full", lambda: logging_stats()['dropped'])
+registry.gauge("log_queue_depth", "Log records waiting for the logging thread", lambda: logging_stats()['queued'])
 
 def get_logger(name: str) -> logging.Logger:
     """Get a logger instance with the specified name
@@ -86,4 +265,4 @@ def get_logger(name: str) -> logging.Logger:
     Returns:
         logging.Logger: Logger instance
     """
-    return logging.getLogger(name)
\ No newline at end of file
+    return logging.getLogger(name)
@@ -1,43 +1,105 @@
-from fastapi import Request, HTTPException
+from fastapi import HTTPException
 from fastapi.responses import JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 from typing import Union, Dict, Any
 from .logging_config import get_logger
-from datetime import datetime, UTC
-import uuid
+from .metrics import http_request_duration
+from random import getrandbits
+from time import perf_counter_ns
 
 logger = get_logger(__name__)
 
-class RequestLoggingMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        request_id = str(uuid.uuid4())
-        start_time = datetime.now(UTC)
+# Version 4 and RFC 4122 variant bits
+_UUID4_MASK = ~((0xF000 << 64) | (0xC000 << 48)) & ((1 << 128) - 1)
+_UUID4_BITS = (0x4000 << 64) | (0x8000 << 48)
 
-        response = await call_next(request)
+def _request_id() -> str:
+    """UUID4-formatted request id without the os.urandom call per request"""
+    value = "%032x" % (getrandbits(128) & _UUID4_MASK | _UUID4_BITS)
+    return f"{value[:8]}-{value[8:12]}-{value[12:16]}-{value[16:20]}-{value[20:]}"
 
-        # Add custom headers
-        response.headers["X-Request-ID"] = request_id
-        response.headers["X-Process-Time"] = str((datetime.now(UTC) - start_time).total_seconds())
+# endpoint -> route template, so latency is labelled "/api/messages/{message_id}"
+_route_paths: Dict[Any, str] = {}
 
-        return response
+def _route_label(scope: Scope) -> str:
+    endpoint = scope.get("endpoint")
+    if endpoint is None:
+        return "unmatched"
+    path = _route_paths.get(endpoint)
+    if path is None:
+        router = scope.get("router")
+        path = next(
+            (route.path for route in getattr(router, "routes", ()) if getattr(route, "endpoint", None) is endpoint),
+            getattr(endpoint, "__name__", "unknown")
+        )
+        _route_paths[endpoint] = path
+    return path
+
+class RequestLoggingMiddleware:
+    """Adds X-Request-ID and X-Process-Time to every HTTP response and records its latency"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = _request_id()
+        start_time = perf_counter_ns()
+
+        async def send_with_headers(message: Message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                elapsed = (perf_counter_ns() - start_time) / 1e9
+                headers["X-Request-ID"] = request_id
+                headers["X-Process-Time"] = str(elapsed)
+                http_request_duration.observe(elapsed, scope["method"], _route_label(scope), str(message["status"]))
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
+
+class ErrorHandlerMiddleware:
+    """Maps exceptions escaping the app to JSON error responses"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        response_started = False
+
+        async def track_send(message: Message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
 
-class ErrorHandlerMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
         try:
-            response = await call_next(request)
-            return response
+            await self.app(scope, receive, track_send)
         except HTTPException as exc:
             logger.warning(f"HTTP Exception: {exc.detail}")
-            return JSONResponse(
+            if response_started:
+                raise
+            response = JSONResponse(
                 status_code=exc.status_code,
                 content={"error": exc.detail}
             )
+            await response(scope, receive, send)
         except Exception as exc:
             logger.error(f"Unhandled exception: {str(exc)}", exc_info=True)
-            return JSONResponse(
+            if response_started:
+                raise
+            response = JSONResponse(
                 status_code=500,
                 content={"error": "Internal server error"}
             )
+            await response(scope, receive, send)
 
 class APIKeyValidationError(HTTPException):
     def __init__(self, detail: str = "Invalid API Key"):
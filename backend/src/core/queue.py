@@ -1,6 +1,24 @@
 from abc import ABC, abstractmethod
-from typing import Any, Optional, Dict
+from typing import Any, Awaitable, Callable, Optional, Dict, List, Set, Tuple
+import asyncio
+import inspect
+import time
+from . import codec
 from .config import Settings
+from .logging_config import get_logger
+
+try:
+    import redis.asyncio as aioredis
+    from redis.exceptions import ResponseError as RedisResponseError
+except ImportError:  # pragma: no cover - optional dependency
+    aioredis = None
+
+try:
+    import aio_pika
+except ImportError:  # pragma: no cover - optional dependency
+    aio_pika = None
+
+logger = get_logger(__name__)
 
 class QueueBase(ABC):
     """Abstract base class for queue implementations"""
@@ -25,52 +43,325 @@ class QueueBase(ABC):
         """Subscribe to a queue and process messages with callback"""
         pass
 
+class PublishBatcher:
+    """Groups concurrent publishes into one broker round trip.
+
+    Messages published within ``max_delay`` seconds (or until ``max_batch``
+    are waiting) go out through a single ``send_batch`` call; each publisher
+    waits until its own message has been written.
+    """
+
+    def __init__(
+        self,
+        send_batch: Callable[[List[Tuple[str, bytes]]], Awaitable[Any]],
+        max_batch: int,
+        max_delay: float
+    ):
+        self._send_batch = send_batch
+        self.max_batch = max(1, max_batch)
+        self.max_delay = max_delay
+        self._pending: List[Tuple[str, bytes, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._flushes: Set[asyncio.Task] = set()
+
+    async def publish(self, queue: str, payload: bytes):
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((queue, payload, future))
+        if len(self._pending) >= self.max_batch:
+            self._start_flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.max_delay, self._start_flush)
+        await future
+
+    def _start_flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, []
+        task = asyncio.create_task(self._flush(batch))
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+
+    async def _flush(self, batch: List[Tuple[str, bytes, asyncio.Future]]):
+        try:
+            await self._send_batch([(queue, payload) for queue, payload, _ in batch])
+        except Exception as e:
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for _, _, future in batch:
+            if not future.done():
+                future.set_result(None)
+
+    async def close(self):
+        """Send whatever is pending and wait for in-flight batches"""
+        self._start_flush()
+        if self._flushes:
+            await asyncio.gather(*self._flushes, return_exceptions=True)
+
+async def _run_callback(callback: callable, message: Any):
+    result = callback(message)
+    if inspect.isawaitable(result):
+        await result
+
 class RedisQueue(QueueBase):
-    """Redis queue implementation (skeleton)"""
-    
-    def __init__(self, settings: Settings):
+    """Redis Streams queue: one stream per queue, one consumer group per app.
+
+    Publishes are pipelined XADDs (see PublishBatcher). Each subscription
+    reads with XREADGROUP in batches of QUEUE_BATCH_SIZE and XACKs an entry
+    only after its callback succeeds. On start a subscriber first re-reads
+    its own unacked entries (a restarted worker keeps its consumer name),
+    then claims entries other consumers left pending for QUEUE_CLAIM_IDLE_MS;
+    the claim is repeated at that interval, which also retries failures.
+
+    With ``ephemeral_group`` the group only sees entries added after it was
+    created and is destroyed on disconnect, for a subscriber that wants
+    everything from now on rather than a share of the backlog.
+    """
+
+    def __init__(self, settings: Settings, ephemeral_group: bool = False):
         self.settings = settings
         self.connection = None
+        self.group = settings.QUEUE_CONSUMER_GROUP
+        self.ephemeral_group = ephemeral_group
+        self.consumer = settings.QUEUE_CONSUMER_NAME
+        self.batch_size = settings.QUEUE_BATCH_SIZE
+        self.block_ms = settings.QUEUE_BLOCK_MS
+        self.claim_idle_ms = settings.QUEUE_CLAIM_IDLE_MS
+        self.max_len = settings.QUEUE_MAX_LEN
+        self._publisher = PublishBatcher(
+            self._send_batch,
+            max_batch=settings.QUEUE_PUBLISH_BATCH_SIZE,
+            max_delay=settings.QUEUE_PUBLISH_BATCH_DELAY_MS / 1000
+        )
+        self._consumers: List[asyncio.Task] = []
+        self._subscribed: Set[str] = set()
+        self._closing = False
 
     async def connect(self) -> None:
-        # TODO: Implement Redis connection
-        pass
+        if aioredis is None:
+            raise RuntimeError("QUEUE_TYPE=redis requires the 'redis' package")
+        self._closing = False
+        # The pool connects lazily, so startup does not depend on Redis being up yet
+        self.connection = aioredis.Redis(
+            host=self.settings.QUEUE_HOST or "localhost",
+            port=self.settings.QUEUE_PORT or 6379,
+            password=self.settings.QUEUE_PASSWORD
+        )
 
     async def disconnect(self) -> None:
-        # TODO: Implement Redis disconnection
-        pass
+        # redis-py can swallow a cancel that lands as a blocking read times out,
+        # so consumers also check _closing and the pool is closed regardless
+        self._closing = True
+        for task in self._consumers:
+            task.cancel()
+        if self._consumers:
+            await asyncio.wait(self._consumers, timeout=self.block_ms / 1000 + 1)
+        self._consumers.clear()
+        await self._publisher.close()
+        if self.connection is not None:
+            if self.ephemeral_group:
+                for queue in self._subscribed:
+                    await self.destroy_group(queue, self.group)
+            await self.connection.aclose()
+            self.connection = None
+        self._subscribed.clear()
 
     async def publish(self, queue: str, message: Any) -> None:
-        # TODO: Implement Redis publish
-        pass
+        await self._publisher.publish(queue, codec.dumps_bytes(message))
+
+    async def publish_many(self, queue: str, messages: List[Any]) -> None:
+        """Publish a list of messages in one pipeline"""
+        await self._send_batch([(queue, codec.dumps_bytes(message)) for message in messages])
+
+    async def _send_batch(self, entries: List[Tuple[str, bytes]]):
+        async with self.connection.pipeline(transaction=False) as pipe:
+            for queue, payload in entries:
+                pipe.xadd(queue, {b"data": payload}, maxlen=self.max_len, approximate=True)
+            await pipe.execute()
 
     async def subscribe(self, queue: str, callback: callable) -> None:
-        # TODO: Implement Redis subscribe
-        pass
+        """Start consuming ``queue`` in the background with ``callback``"""
+        await self._ensure_group(queue)
+        self._subscribed.add(queue)
+        self._consumers.append(asyncio.create_task(self._consume(queue, callback)))
+
+    async def _ensure_group(self, queue: str):
+        try:
+            await self.connection.xgroup_create(queue, self.group, id="$" if self.ephemeral_group else "0", mkstream=True)
+        except RedisResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    async def destroy_group(self, queue: str, group: str):
+        """Remove ``group`` and its pending entries from ``queue``; errors are logged"""
+        try:
+            await self.connection.xgroup_destroy(queue, group)
+        except Exception as e:
+            logger.error(f"Could not destroy consumer group {group} of {queue}: {str(e)}")
+
+    async def _consume(self, queue: str, callback: callable):
+        await self._read_own_pending(queue, callback)
+        await self._claim_stale(queue, callback)
+        last_claim = time.monotonic()
+        while not self._closing:
+            try:
+                response = await self.connection.xreadgroup(
+                    self.group, self.consumer, {queue: ">"}, count=self.batch_size, block=self.block_ms
+                )
+                for _, entries in response or []:
+                    await self._process(queue, entries, callback)
+                if time.monotonic() - last_claim >= self.claim_idle_ms / 1000:
+                    await self._claim_stale(queue, callback)
+                    last_claim = time.monotonic()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error consuming Redis stream {queue}: {str(e)}")
+                await asyncio.sleep(1)
+
+    async def _read_own_pending(self, queue: str, callback: callable):
+        """Entries delivered to this consumer before a restart but never acked"""
+        start = "0"
+        while True:
+            response = await self.connection.xreadgroup(
+                self.group, self.consumer, {queue: start}, count=self.batch_size
+            )
+            entries = response[0][1] if response else []
+            if not entries:
+                return
+            await self._process(queue, entries, callback)
+            start = entries[-1][0]
+
+    async def _claim_stale(self, queue: str, callback: callable):
+        """Take over entries left pending longer than QUEUE_CLAIM_IDLE_MS"""
+        start = "0-0"
+        while True:
+            response = await self.connection.xautoclaim(
+                queue, self.group, self.consumer, self.claim_idle_ms, start_id=start, count=self.batch_size
+            )
+            start, entries = response[0], response[1]
+            if entries:
+                await self._process(queue, entries, callback)
+            if start in (b"0-0", "0-0"):
+                return
+
+    async def _process(self, queue: str, entries: List[Tuple[bytes, Dict[bytes, bytes]]], callback: callable):
+        done = []
+        for entry_id, fields in entries:
+            if not fields:
+                # Trimmed or deleted while pending; nothing left to process
+                done.append(entry_id)
+                continue
+            try:
+                await _run_callback(callback, codec.loads(fields[b"data"]))
+                done.append(entry_id)
+            except Exception as e:
+                logger.error(f"Queue callback failed for {queue} entry {entry_id!r}: {str(e)}")
+        if done:
+            await self.connection.xack(queue, self.group, *done)
 
 class RabbitMQQueue(QueueBase):
-    """RabbitMQ queue implementation (skeleton)"""
-    
+    """RabbitMQ queue: one durable queue per name, persistent messages.
+
+    One robust connection is shared by everything. Publishes go through a
+    single confirm-mode channel: concurrent publish() calls are grouped by
+    PublishBatcher, written back to back and confirmed together, so a batch
+    costs one confirm wait rather than one per message. Each subscription
+    gets its own channel with QUEUE_PREFETCH_COUNT unacked deliveries in
+    flight, processes them in order and acks each one only after its
+    callback succeeds; a failed message is requeued after a pause.
+    """
+
     def __init__(self, settings: Settings):
         self.settings = settings
         self.connection = None
         self.channel = None
+        self.prefetch_count = settings.QUEUE_PREFETCH_COUNT
+        self._publisher = PublishBatcher(
+            self._send_batch,
+            max_batch=settings.QUEUE_PUBLISH_BATCH_SIZE,
+            max_delay=settings.QUEUE_PUBLISH_BATCH_DELAY_MS / 1000
+        )
+        self._declared: Set[str] = set()
+        self._consumers: List[asyncio.Task] = []
 
     async def connect(self) -> None:
-        # TODO: Implement RabbitMQ connection
-        pass
+        if aio_pika is None:
+            raise RuntimeError("QUEUE_TYPE=rabbitmq requires the 'aio-pika' package")
+        # Robust connection: channels, queues and consumers are restored after a reconnect
+        self.connection = await aio_pika.connect_robust(
+            host=self.settings.QUEUE_HOST or "localhost",
+            port=self.settings.QUEUE_PORT or 5672,
+            login=self.settings.QUEUE_USER,
+            password=self.settings.QUEUE_PASSWORD or "guest",
+            virtualhost=self.settings.QUEUE_VHOST
+        )
+        self.channel = await self.connection.channel(publisher_confirms=True)
 
     async def disconnect(self) -> None:
-        # TODO: Implement RabbitMQ disconnection
-        pass
+        for task in self._consumers:
+            task.cancel()
+        if self._consumers:
+            await asyncio.gather(*self._consumers, return_exceptions=True)
+        self._consumers.clear()
+        await self._publisher.close()
+        if self.connection is not None:
+            await self.connection.close()
+            self.connection = None
+            self.channel = None
+        self._declared.clear()
+
+    async def _declare(self, queue: str):
+        if queue not in self._declared:
+            await self.channel.declare_queue(queue, durable=True)
+            self._declared.add(queue)
 
     async def publish(self, queue: str, message: Any) -> None:
-        # TODO: Implement RabbitMQ publish
-        pass
+        await self._publisher.publish(queue, codec.dumps_bytes(message))
+
+    async def publish_many(self, queue: str, messages: List[Any]) -> None:
+        """Publish a list of messages and wait for their confirms together"""
+        await self._send_batch([(queue, codec.dumps_bytes(message)) for message in messages])
+
+    async def _send_batch(self, entries: List[Tuple[str, bytes]]):
+        for queue in {queue for queue, _ in entries}:
+            await self._declare(queue)
+        exchange = self.channel.default_exchange
+        # Every frame is written before the first confirm is awaited; the
+        # broker acks them with multiple=True as it persists them
+        await asyncio.gather(*(
+            exchange.publish(
+                aio_pika.Message(payload, delivery_mode=aio_pika.DeliveryMode.PERSISTENT),
+                routing_key=queue
+            )
+            for queue, payload in entries
+        ))
 
     async def subscribe(self, queue: str, callback: callable) -> None:
-        # TODO: Implement RabbitMQ subscribe
-        pass
+        """Start consuming ``queue`` in the background with ``callback``"""
+        channel = await self.connection.channel(publisher_confirms=False)
+        await channel.set_qos(prefetch_count=self.prefetch_count)
+        declared = await channel.declare_queue(queue, durable=True)
+        self._consumers.append(asyncio.create_task(self._consume(queue, channel, declared, callback)))
+
+    async def _consume(self, queue: str, channel, declared, callback: callable):
+        try:
+            async with declared.iterator() as messages:
+                async for message in messages:
+                    try:
+                        await _run_callback(callback, codec.loads(message.body))
+                    except Exception as e:
+                        logger.error(f"Queue callback failed for {queue} delivery {message.delivery_tag}: {str(e)}")
+                        await asyncio.sleep(1)
+                        await message.nack(requeue=True)
+                        continue
+                    await message.ack()
+        finally:
+            await channel.close()
 
 def get_queue_client(settings: Settings) -> QueueBase:
     """Factory function to get appropriate queue client based on settings"""
@@ -78,5 +369,8 @@ def get_queue_client(settings: Settings) -> QueueBase:
         return RedisQueue(settings)
     elif settings.QUEUE_TYPE.lower() == 'rabbitmq':
         return RabbitMQQueue(settings)
+    elif settings.QUEUE_TYPE.lower() == 'local':
+        from .local_queue import LocalQueue
+        return LocalQueue(settings)
     else:
         raise ValueError(f"Unsupported queue type: {settings.QUEUE_TYPE}")
\ No newline at end of file
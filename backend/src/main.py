@@ -1,17 +1,26 @@
 from fastapi import FastAPI, WebSocket, HTTPException, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from typing import Dict
-import json
+from fastapi.responses import PlainTextResponse
+from typing import Dict, Optional
 from pathlib import Path
 
-from .core.auth import get_api_key, verify_token
+from .core import codec
+from .core.auth import get_api_key, token_cache, verify_token
 from .core.config import Settings, get_settings
-from .core.logging_config import setup_logging
+from .core.logging_config import setup_logging, shutdown_logging, get_logger
+from .core.metrics import registry
 from .core.middleware import ErrorHandlerMiddleware, RequestLoggingMiddleware, APIKeyValidationError
 from .core.queue import get_queue_client
+from .services.event_bus import create_event_bus
 from .services.event_manager import event_manager
+from .services.middleware_client import middleware_client
+from .services.message import conversation_tails, message_cache, message_writer, status_buffer
+from .services.presence import presence
 from .routers import messages  # Add this import
 from .routers import auth
+from .routers import sessions
+
+logger = get_logger(__name__)
 
 app = FastAPI(title="Messaging Bot Backend")
 
@@ -30,22 +39,26 @@ app.add_middleware(RequestLoggingMiddleware)
 # Remove global dependency and let each endpoint handle its own auth
 app.include_router(messages.router)
 app.include_router(auth.router)
+app.include_router(sessions.router)
 
 @app.get("/api/health")
 async def health_check():
     return {"status": "healthy"}
 
 @app.websocket("/ws/{client_id}")
-async def websocket_endpoint(websocket: WebSocket, client_id: str):
+async def websocket_endpoint(websocket: WebSocket, client_id: str, user_id: Optional[str] = None):
+    user_id = user_id or client_id
     try:
-        await event_manager.register_websocket(client_id, websocket)
-        
+        await event_manager.register_websocket(client_id, websocket, user_id=user_id)
+        presence.connect(client_id, user_id)
+
         while True:
             try:
                 data = await websocket.receive_text()
-                message = json.loads(data)
+                presence.touch(client_id, user_id)
+                message = codec.loads(data)
                 await event_manager.handle_client_message(client_id, message)
-            except json.JSONDecodeError:
+            except ValueError:
                 logger.error(f"Invalid JSON received from client {client_id}")
                 continue
             except Exception as e:
@@ -54,16 +67,57 @@ async def websocket_endpoint(websocket: WebSocket, client_id: str):
     except Exception as e:
         logger.error(f"WebSocket error for client {client_id}: {str(e)}")
     finally:
-        await event_manager.cleanup_connection(client_id)
+        # A reconnect with the same client_id may already have replaced this socket
+        current = event_manager.active_connections.get(client_id)
+        if current is None or current is websocket:
+            await event_manager.cleanup_connection(client_id)
+            presence.disconnect(client_id, user_id)
 
 @app.post("/webhook/register/{client_id}", dependencies=[Depends(get_api_key)])
-async def register_webhook(client_id: str, webhook_url: str):
+async def register_webhook(
+    client_id: str,
+    webhook_url: str,
+    batched: bool = False,
+    batch_size: Optional[int] = None,
+    batch_interval_ms: Optional[int] = None
+):
     try:
-        event_manager.register_webhook(client_id, webhook_url)
+        await event_manager.register_webhook(
+            client_id,
+            webhook_url,
+            batched=batched,
+            batch_size=batch_size,
+            batch_interval_ms=batch_interval_ms
+        )
         return {"status": "success", "message": f"Webhook registered for client {client_id}"}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+@app.get("/api/connections/stats", dependencies=[Depends(get_api_key)])
+async def connection_stats():
+    return event_manager.connection_stats()
+
+@app.get("/api/bus/stats", dependencies=[Depends(get_api_key)])
+async def bus_stats():
+    return event_manager.bus_stats()
+
+@app.get("/api/auth/stats", dependencies=[Depends(get_api_key)])
+async def auth_stats():
+    return token_cache.stats()
+
+@app.get("/api/messages/cache/stats", dependencies=[Depends(get_api_key)])
+async def message_cache_stats():
+    return message_cache.stats() if message_cache is not None else {"backend": "none"}
+
+@app.get("/api/conversations/tail/stats", dependencies=[Depends(get_api_key)])
+async def conversation_tail_stats():
+    return conversation_tails.stats() if conversation_tails is not None else {}
+
+@app.get("/api/metrics", dependencies=[Depends(get_api_key)])
+async def metrics():
+    """Prometheus text exposition of the in-process metrics registry"""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
 # Initialize queue client
 queue_client = None
 
@@ -72,19 +126,33 @@ queue_client = None
 async def startup_event():
     global queue_client
     settings = get_settings()
+    setup_logging(Path(settings.LOG_CONFIG_PATH) if settings.LOG_CONFIG_PATH else None)
     queue_client = get_queue_client(settings)
     await queue_client.connect()
+    await middleware_client.start()
     event_manager.start_background_tasks()
+    presence.start()
+    bus = create_event_bus(settings)
+    if bus is not None:
+        await event_manager.attach_bus(bus)
 
 # Cleanup when the application shuts down
 @app.on_event("shutdown")
 async def shutdown_event():
     try:
+        await message_writer.close()
+        await status_buffer.close()
         await event_manager.close_all_connections()
+        await presence.close()
+        if message_cache is not None:
+            await message_cache.close()
+        await middleware_client.close()
         if queue_client:
             await queue_client.disconnect()
     except Exception as e:
         logger.error(f"Error during shutdown: {str(e)}")
+    finally:
+        shutdown_logging()
 
 if __name__ == "__main__":
     import uvicorn
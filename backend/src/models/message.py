@@ -1,11 +1,22 @@
 from datetime import datetime, UTC  # Add UTC import
 from typing import Optional
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.types import TypeDecorator
 from sqlalchemy.dialects.postgresql import TIMESTAMP
 from .base import Base
 
+def conversation_key(user1_id: str, user2_id: str) -> str:
+    """Order-independent key for the conversation between two users"""
+    first, second = sorted((user1_id, user2_id))
+    return f"{first}:{second}"
+
+def _default_conversation_key(context) -> Optional[str]:
+    params = context.get_current_parameters()
+    if params.get("sender_id") is None or params.get("receiver_id") is None:
+        return None
+    return conversation_key(params["sender_id"], params["receiver_id"])
+
 class TimestampWithTimeZone(TypeDecorator):
     impl = TIMESTAMP(timezone=True)
     cache_ok = True
@@ -17,11 +28,25 @@ class Message(Base):
     content = Column(String)
     sender_id = Column(String, index=True)
     receiver_id = Column(String, index=True)
+    # Filled on insert so either participant's history is one index range scan
+    conversation_key = Column(String, default=_default_conversation_key)
     message_type = Column(String)
     status = Column(String, default="sent")
     created_at = Column(TIMESTAMP(timezone=True), default=lambda: datetime.now(UTC))
     updated_at = Column(TIMESTAMP(timezone=True), default=lambda: datetime.now(UTC), onupdate=lambda: datetime.now(UTC))
 
+    __table_args__ = (
+        # Keyset pagination on (created_at, id), see services/pagination.py
+        Index("ix_messages_created_at_id", "created_at", "id"),
+        Index("ix_messages_sender_id_created_at_id", "sender_id", "created_at", "id"),
+        Index(
+            "ix_messages_conversation_key_created_at",
+            "conversation_key",
+            created_at.desc(),
+            id.desc(),
+        ),
+    )
+
     def to_dict(self):
         return {
             "id": self.id,
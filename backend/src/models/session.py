@@ -8,6 +8,7 @@ class Session(Base):
     id = Column(String, primary_key=True)
     user_id = Column(String, index=True)
     connection_status = Column(Boolean, default=True)
+    presence = Column(String, default="online")  # online, away or offline
     last_activity = Column(DateTime, default=lambda: datetime.now(UTC))
     created_at = Column(DateTime, default=lambda: datetime.now(UTC))
     updated_at = Column(DateTime, default=lambda: datetime.now(UTC), onupdate=lambda: datetime.now(UTC))
\ No newline at end of file
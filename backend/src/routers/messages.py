@@ -1,15 +1,27 @@
-from fastapi import APIRouter, Depends, HTTPException, Security, status  # Add Security
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, Security, status  # Add Security
 from typing import List, Dict, Optional
 from ..core.auth import verify_token, verify_api_key
-from ..services.message import MessageService, MessageResponse
+from ..services.message import MessageService, MessageResponse, InvalidStatusError
+from ..services.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, InvalidCursorError, Page
+from ..services.event_manager import event_manager, EventQueueFullError
+from ..models.message import conversation_key
 from pydantic import BaseModel
 from sqlalchemy.ext.asyncio import AsyncSession
+from ..core.config import get_settings
 from ..core.database import get_db
 from ..core.logging_config import get_logger  # Add this import
 
 logger = get_logger(__name__)  # Add this line
 router = APIRouter(prefix="/api")
 
+def _paginated(response: Response, page: Page) -> List[MessageResponse]:
+    """Return the page items, exposing the opaque cursors as headers"""
+    if page.next_cursor:
+        response.headers["X-Next-Cursor"] = page.next_cursor
+    if page.prev_cursor:
+        response.headers["X-Prev-Cursor"] = page.prev_cursor
+    return page.items
+
 # Request/Response models
 class MessageCreate(BaseModel):
     content: str
@@ -17,6 +29,34 @@ class MessageCreate(BaseModel):
     message_type: str = "text"
     metadata: Optional[Dict] = None
 
+class MessageBatchCreate(BaseModel):
+    messages: List[MessageCreate]
+
+class MessageBatchResponse(BaseModel):
+    ids: List[int]
+    count: int
+
+class MessageStatusUpdate(BaseModel):
+    id: int
+    status: str
+
+class MessageStatusBatch(BaseModel):
+    updates: List[MessageStatusUpdate]
+
+async def _notify_receivers(messages: List[MessageResponse], sender_id: str):
+    """Notify only each receiver's sockets and the conversation's subscribers"""
+    for created_message in messages:
+        try:
+            await event_manager.publish(
+                {"type": "new_message", "message": created_message.dict()},
+                recipients=[created_message.receiver_id],
+                conversation=conversation_key(sender_id, created_message.receiver_id)
+            )
+        except EventQueueFullError as e:
+            # The messages are stored and queued for WhatsApp; only the realtime push is shed
+            logger.warning(f"Realtime notifications dropped starting at message {created_message.id}: {str(e)}")
+            break
+
 from fastapi import (
     APIRouter, 
     Depends, 
@@ -52,6 +92,8 @@ async def create_message(
             service.send_to_middleware,
             created_message
         )
+
+        await _notify_receivers([created_message], sender_id)
         
         return created_message
     except Exception as e:
@@ -61,6 +103,46 @@ async def create_message(
             detail=f"Error creating message: {str(e)}"
         )
 
+@router.post("/messages/batch", response_model=MessageBatchResponse)
+async def create_messages(
+    batch: MessageBatchCreate,
+    db: AsyncSession = Depends(get_db),
+    api_key: str = Security(verify_api_key),
+    token_data: Optional[dict] = Security(verify_token),
+    background_tasks: BackgroundTasks = None
+):
+    """Create up to MESSAGE_BATCH_MAX_SIZE messages with one multi-row insert"""
+    max_size = get_settings().MESSAGE_BATCH_MAX_SIZE
+    if len(batch.messages) > max_size:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Batch exceeds {max_size} messages"
+        )
+    try:
+        service = MessageService(db)
+        sender_id = token_data["sub"] if token_data else "api_client"
+
+        created_messages = await service.create_messages(
+            [message.dict() for message in batch.messages],
+            sender_id=sender_id
+        )
+
+        # Send to middleware
+        background_tasks.add_task(
+            service.send_many_to_middleware,
+            created_messages
+        )
+        await _notify_receivers(created_messages, sender_id)
+
+        ids = [message.id for message in created_messages]
+        return MessageBatchResponse(ids=ids, count=len(ids))
+    except Exception as e:
+        logger.error(f"Error creating message batch: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error creating message batch: {str(e)}"
+        )
+
 @router.get("/messages/{message_id}", response_model=MessageResponse)
 async def get_message(
     message_id: int,
@@ -68,19 +150,29 @@ async def get_message(
     token_data = Depends(verify_token)
 ):
     service = MessageService(db)
-    message = await service.get_message(message_id)
-    if not message:
+    body = await service.get_message_json(message_id)
+    if body is None:
         raise HTTPException(status_code=404, detail="Message not found")
-    return message  # Retorna el mensaje, no la sesión
+    # Already serialized (and possibly cached), so skip response_model encoding
+    return Response(content=body, media_type="application/json")
 
 @router.get("/conversations/{other_user_id}", response_model=List[MessageResponse])
 async def get_conversation(
     other_user_id: str,
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    before: Optional[str] = None,
+    after: Optional[str] = None,
     db: AsyncSession = Depends(get_db),
     token_data: dict = Depends(verify_token)
 ):
+    """Newest-first page of the conversation; older pages via ``before=X-Next-Cursor``"""
     service = MessageService(db)
-    return await service.get_conversation(token_data["sub"], other_user_id)
+    try:
+        page = await service.get_conversation(token_data["sub"], other_user_id, limit, before, after)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return _paginated(response, page)
 
 @router.put("/messages/{message_id}/status")
 async def update_message_status(
@@ -90,7 +182,10 @@ async def update_message_status(
     token_data: dict = Depends(verify_token)
 ):
     service = MessageService(db)
-    success = await service.update_message_status(message_id, status)
+    try:
+        success = await service.update_message_status(message_id, status)
+    except InvalidStatusError as e:
+        raise HTTPException(status_code=422, detail=str(e))
     if not success:
         raise HTTPException(status_code=404, detail="Message not found")
     return {"status": "updated"}
@@ -104,11 +199,41 @@ async def verify_auth(
     """Verify either API key or token authentication"""
     return api_key or token
 
-@router.get("/messages")
+@router.put("/messages/status")
+async def update_message_statuses(
+    batch: MessageStatusBatch,
+    db: AsyncSession = Depends(get_db),
+    auth: Union[str, dict] = Depends(verify_auth)
+):
+    """Apply delivery/read receipts in bulk. Transitions are forward-only."""
+    max_size = get_settings().MESSAGE_STATUS_BATCH_MAX_SIZE
+    if len(batch.updates) > max_size:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Batch exceeds {max_size} status updates"
+        )
+    service = MessageService(db)
+    try:
+        updated_ids = await service.update_message_statuses(
+            [(update.id, update.status) for update in batch.updates]
+        )
+    except InvalidStatusError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return {"updated": len(updated_ids), "ids": updated_ids}
+
+@router.get("/messages", response_model=List[MessageResponse])
 async def get_messages(
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    before: Optional[str] = None,
+    after: Optional[str] = None,
     db: AsyncSession = Depends(get_db),
     auth: Union[str, dict] = Depends(verify_auth)
 ):
-    """Get all messages. Accepts both API key and JWT token authentication."""
+    """Get messages newest first, one cursor page at a time. Accepts both API key and JWT token authentication."""
     service = MessageService(db)
-    return await service.get_messages()
\ No newline at end of file
+    try:
+        page = await service.get_messages(limit=limit, before=before, after=after)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return _paginated(response, page)
\ No newline at end of file
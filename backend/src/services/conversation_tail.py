@@ -0,0 +1,198 @@
+from bisect import insort
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+import time
+from ..core import codec
+from ..models.message import conversation_key
+from .pagination import encode_cursor
+
+# (created_at, id, status, serialized message); ordered by the first two like the index
+TailEntry = Tuple[datetime, int, str, bytes]
+
+# Loads the newest ``count`` messages of a conversation, newest first, as dicts
+# shaped like MessageResponse, plus whether that is the whole conversation
+TailLoader = Callable[[str, int], Awaitable[Tuple[List[Dict[str, Any]], bool]]]
+
+# Approximate bytes per entry besides the body: tuple, datetime, int, list and index slots
+ENTRY_OVERHEAD = 240
+TAIL_OVERHEAD = 400
+
+class _Tail:
+    __slots__ = ("entries", "complete", "loaded_at", "size")
+
+    def __init__(self, complete: bool, loaded_at: float):
+        self.entries: List[TailEntry] = []  # oldest first
+        self.complete = complete  # no older messages exist beyond ``entries``
+        self.loaded_at = loaded_at
+        self.size = TAIL_OVERHEAD
+
+class ConversationTailCache:
+    """The newest ``size`` messages of recently read conversations.
+
+    A conversation enters on a first-page read that misses: its newest
+    ``size`` messages are loaded once, and from then on created messages are
+    inserted and status changes applied in place (forward-only by
+    ``ranks``), so first pages of up to ``size`` items are served from
+    memory. Conversations are evicted least recently used first to keep the
+    total under ``max_bytes``, and reloaded after ``ttl`` seconds.
+
+    Each worker keeps its own tails. With several workers, writes made by
+    the others arrive through ``add`` / ``update_statuses`` from the event
+    bus (see services/message.py); when the bus reports a lost envelope
+    everything is ``clear``ed, since the lost write could be in any tail.
+    """
+
+    def __init__(self, size: int, max_bytes: int, ttl: float, ranks: Dict[str, int]):
+        self.size = size
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.ranks = ranks
+        self._tails: "OrderedDict[str, _Tail]" = OrderedDict()
+        self._by_id: Dict[int, str] = {}
+        # Writes that land while a tail is loading, applied to what it loads
+        self._loading: Dict[str, List[Dict[str, Any]]] = {}
+        self._floors: Dict[int, str] = {}
+        # Bumped by clear(); a load that started before it is not kept
+        self._generation = 0
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _rank(self, status: Optional[str]) -> int:
+        return self.ranks.get(status, -1)
+
+    def _get(self, key: str) -> Optional[_Tail]:
+        tail = self._tails.get(key)
+        if tail is not None and time.monotonic() - tail.loaded_at >= self.ttl:
+            self._drop(key)
+            return None
+        return tail
+
+    def _drop(self, key: str):
+        tail = self._tails.pop(key)
+        self.bytes -= tail.size
+        for entry in tail.entries:
+            self._by_id.pop(entry[1], None)
+
+    def _insert(self, key: str, tail: _Tail, message: Dict[str, Any]):
+        message_id = message["id"]
+        if message_id in self._by_id:
+            self._set_status(tail, message_id, message["status"])
+            return
+        body = codec.dumps_compact(message)
+        insort(tail.entries, (datetime.fromisoformat(message["created_at"]), message_id, message["status"], body))
+        self._by_id[message_id] = key
+        tail.size += ENTRY_OVERHEAD + len(body)
+        self.bytes += ENTRY_OVERHEAD + len(body)
+        if len(tail.entries) > self.size:
+            oldest = tail.entries.pop(0)
+            del self._by_id[oldest[1]]
+            tail.size -= ENTRY_OVERHEAD + len(oldest[3])
+            self.bytes -= ENTRY_OVERHEAD + len(oldest[3])
+            tail.complete = False
+
+    def _set_status(self, tail: _Tail, message_id: int, status: str):
+        # Receipts are mostly for recent messages, so search from the newest end
+        for index in range(len(tail.entries) - 1, -1, -1):
+            created_at, entry_id, current, body = tail.entries[index]
+            if entry_id != message_id:
+                continue
+            if self._rank(status) > self._rank(current):
+                message = codec.loads(body)
+                message["status"] = status
+                new_body = codec.dumps_compact(message)
+                tail.entries[index] = (created_at, entry_id, status, new_body)
+                tail.size += len(new_body) - len(body)
+                self.bytes += len(new_body) - len(body)
+            return
+
+    def _evict(self):
+        while self.bytes > self.max_bytes and self._tails:
+            self._drop(next(iter(self._tails)))
+            self.evictions += 1
+
+    def _page(self, tail: _Tail, limit: int) -> Optional[Tuple[List[bytes], Optional[str]]]:
+        entries = tail.entries
+        if len(entries) < limit and not tail.complete:
+            return None
+        newest = entries[-limit:][::-1]
+        has_more = len(entries) > limit or not tail.complete
+        next_cursor = encode_cursor(newest[-1][0], newest[-1][1]) if newest and has_more else None
+        return [entry[3] for entry in newest], next_cursor
+
+    async def first_page(self, key: str, limit: int, load: TailLoader) -> Optional[Tuple[List[bytes], Optional[str]]]:
+        """Newest-first bodies and the next cursor, or None to read the page from the database"""
+        if limit > self.size:
+            return None
+        tail = self._get(key)
+        if tail is not None:
+            self.hits += 1
+            self._tails.move_to_end(key)
+            return self._page(tail, limit)
+        self.misses += 1
+        if key in self._loading:
+            return None
+        self._loading[key] = []
+        generation = self._generation
+        try:
+            messages, complete = await load(key, self.size)
+        finally:
+            added = self._loading.pop(key)
+            floors = self._floors
+            if not self._loading:
+                self._floors = {}
+        if generation != self._generation:
+            return None
+
+        tail = self._tails[key] = _Tail(complete, time.monotonic())
+        self.bytes += tail.size
+        for message in messages + added:
+            floor = floors.get(message["id"])
+            if floor is not None and self._rank(floor) > self._rank(message["status"]):
+                message["status"] = floor
+            self._insert(key, tail, message)
+        page = self._page(tail, limit)
+        self._evict()
+        return page
+
+    def add(self, messages: List[Dict[str, Any]]):
+        """Insert created messages into the tails of their conversations"""
+        for message in messages:
+            key = conversation_key(message["sender_id"], message["receiver_id"])
+            tail = self._get(key)
+            if tail is not None:
+                self._insert(key, tail, message)
+            elif key in self._loading:
+                self._loading[key].append(message)
+        self._evict()
+
+    def update_statuses(self, statuses: Dict[int, str]):
+        for message_id, status in statuses.items():
+            key = self._by_id.get(message_id)
+            if key is not None:
+                self._set_status(self._tails[key], message_id, status)
+            elif self._loading:
+                floor = self._floors.get(message_id)
+                if floor is None or self._rank(status) > self._rank(floor):
+                    self._floors[message_id] = status
+        self._evict()
+
+    def clear(self):
+        """Forget every tail; each is reloaded by its next first-page read"""
+        self._tails.clear()
+        self._by_id.clear()
+        self._floors.clear()
+        self._generation += 1
+        self.bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "conversations": len(self._tails),
+            "messages": len(self._by_id),
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
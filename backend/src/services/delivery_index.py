@@ -0,0 +1,54 @@
+from typing import Dict, Iterable, Optional, Set
+
+class DeliveryIndex:
+    """Maps recipient ids and conversation keys to connected client ids.
+
+    Lets EventManager resolve the sockets a message is meant for without
+    scanning every active connection.
+    """
+
+    def __init__(self):
+        self.by_recipient: Dict[str, Set[str]] = {}
+        self.by_conversation: Dict[str, Set[str]] = {}
+        # Reverse mappings so a disconnect only touches its own entries
+        self._client_recipients: Dict[str, Set[str]] = {}
+        self._client_conversations: Dict[str, Set[str]] = {}
+
+    def add_recipient(self, client_id: str, recipient_id: str):
+        self.by_recipient.setdefault(recipient_id, set()).add(client_id)
+        self._client_recipients.setdefault(client_id, set()).add(recipient_id)
+
+    def subscribe(self, client_id: str, conversation_key: str):
+        self.by_conversation.setdefault(conversation_key, set()).add(client_id)
+        self._client_conversations.setdefault(client_id, set()).add(conversation_key)
+
+    def unsubscribe(self, client_id: str, conversation_key: str):
+        self._discard(self.by_conversation, conversation_key, client_id)
+        self._discard(self._client_conversations, client_id, conversation_key)
+
+    def remove_client(self, client_id: str):
+        for recipient_id in self._client_recipients.pop(client_id, ()):
+            self._discard(self.by_recipient, recipient_id, client_id)
+        for conversation_key in self._client_conversations.pop(client_id, ()):
+            self._discard(self.by_conversation, conversation_key, client_id)
+
+    def resolve(self, recipients: Iterable[str] = (), conversation_key: Optional[str] = None) -> Set[str]:
+        """Return the client ids that should receive a message"""
+        client_ids: Set[str] = set()
+        for recipient_id in recipients:
+            client_ids.update(self.by_recipient.get(recipient_id, ()))
+        if conversation_key is not None:
+            client_ids.update(self.by_conversation.get(conversation_key, ()))
+        return client_ids
+
+    def is_online(self, recipient_id: str) -> bool:
+        return bool(self.by_recipient.get(recipient_id))
+
+    @staticmethod
+    def _discard(mapping: Dict[str, Set[str]], key: str, value: str):
+        values = mapping.get(key)
+        if values is None:
+            return
+        values.discard(value)
+        if not values:
+            del mapping[key]
@@ -0,0 +1,298 @@
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+import asyncio
+import os
+import socket
+import time
+from ..core import codec
+from ..core.config import Settings
+from ..core.logging_config import get_logger
+from ..core.queue import RedisQueue
+
+logger = get_logger(__name__)
+
+# Largest envelope a Unix datagram carries; bigger events fail to send
+MAX_DATAGRAM = 256 * 1024
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+class WorkerRegistry:
+    """Which worker holds each connected client, across every worker.
+
+    Every worker keeps its own copy, built from the register / unregister /
+    leave envelopes peers send over the bus and corrected by the periodic
+    snapshots that replace everything known for a worker, so a lost
+    envelope is only wrong until the next snapshot. A worker that has sent
+    nothing for a while is expired. It answers "is this recipient connected
+    anywhere" for webhook fallback and "where is this client".
+    """
+
+    def __init__(self):
+        self.clients: Dict[str, Tuple[str, Tuple[str, ...]]] = {}  # client -> (worker, recipients)
+        self.by_recipient: Dict[str, Set[str]] = {}
+        self.by_worker: Dict[str, Set[str]] = {}
+        self.last_seen: Dict[str, float] = {}  # worker -> monotonic time of its last envelope
+
+    def add(self, worker_id: str, client_id: str, recipient_ids: Iterable[str]):
+        self.remove(client_id)
+        recipient_ids = tuple(recipient_ids)
+        self.clients[client_id] = (worker_id, recipient_ids)
+        self.by_worker.setdefault(worker_id, set()).add(client_id)
+        for recipient_id in recipient_ids:
+            self.by_recipient.setdefault(recipient_id, set()).add(client_id)
+
+    def remove(self, client_id: str, worker_id: Optional[str] = None):
+        entry = self.clients.get(client_id)
+        if entry is None or (worker_id is not None and entry[0] != worker_id):
+            # A reconnect may already have moved the client to another worker
+            return
+        del self.clients[client_id]
+        self._discard(self.by_worker, entry[0], client_id)
+        for recipient_id in entry[1]:
+            self._discard(self.by_recipient, recipient_id, client_id)
+
+    def replace_worker(self, worker_id: str, clients: Dict[str, Iterable[str]]):
+        """Make ``clients`` the complete set held by ``worker_id``"""
+        for client_id in list(self.by_worker.get(worker_id, ())):
+            if client_id not in clients:
+                self.remove(client_id)
+        for client_id, recipient_ids in clients.items():
+            self.add(worker_id, client_id, recipient_ids)
+
+    def drop_worker(self, worker_id: str):
+        self.last_seen.pop(worker_id, None)
+        for client_id in list(self.by_worker.get(worker_id, ())):
+            self.remove(client_id)
+
+    def touch(self, worker_id: str):
+        self.last_seen[worker_id] = time.monotonic()
+
+    def expire(self, cutoff: float) -> List[str]:
+        """Drop every worker not heard from since ``cutoff``; returns their ids"""
+        expired = [worker_id for worker_id, seen in self.last_seen.items() if seen < cutoff]
+        for worker_id in expired:
+            self.drop_worker(worker_id)
+        return expired
+
+    def worker_of(self, client_id: str) -> Optional[str]:
+        entry = self.clients.get(client_id)
+        return entry[0] if entry is not None else None
+
+    def is_online(self, recipient_id: str) -> bool:
+        return bool(self.by_recipient.get(recipient_id))
+
+    def stats(self) -> Dict[str, int]:
+        return {"clients": len(self.clients), "workers": len(self.by_worker)}
+
+    @staticmethod
+    def _discard(mapping: Dict[str, Set[str]], key: str, value: str):
+        values = mapping.get(key)
+        if values is None:
+            return
+        values.discard(value)
+        if not values:
+            del mapping[key]
+
+class EventBus(ABC):
+    """Pub/sub between the worker processes of one deployment.
+
+    ``publish`` hands an envelope (a dict with at least ``kind``) to every
+    other worker, stamped with the sender's ``origin`` and a per-sender
+    ``seq`` so receivers can tell when one was lost; ``start`` registers
+    the handler envelopes from peers are passed to. Envelopes never come
+    back to the worker that sent them.
+    """
+
+    def __init__(self, worker_id: str):
+        self.worker_id = worker_id
+        self.sent = 0
+        self.received = 0
+        self.dropped = 0
+        self._seq = 0
+
+    def _stamp(self, envelope: Dict[str, Any], **extra) -> Dict[str, Any]:
+        self._seq += 1
+        return dict(envelope, origin=self.worker_id, seq=self._seq, **extra)
+
+    @abstractmethod
+    async def start(self, handler: Callable[[Dict[str, Any]], None]) -> None:
+        pass
+
+    @abstractmethod
+    async def publish(self, envelope: Dict[str, Any]) -> None:
+        pass
+
+    @abstractmethod
+    async def close(self) -> None:
+        pass
+
+    async def forget(self, worker_id: str) -> None:
+        """Release what the bus keeps for a peer that went away without closing"""
+        pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {"worker": self.worker_id, "sent": self.sent, "received": self.received, "dropped": self.dropped}
+
+class UnixSocketBus(EventBus):
+    """Same-host bus: one Unix datagram socket per worker in a shared directory.
+
+    Publishing encodes the envelope once and sends it to every ``*.sock``
+    in the directory without blocking; a peer whose receive buffer is full
+    drops the envelope (counted in ``dropped``). A socket file nobody is
+    bound to belongs to a dead worker: it is removed and the worker's
+    clients are dropped from the registry via a synthetic ``leave``.
+    """
+
+    def __init__(self, directory: str, worker_id: str, peer_refresh_interval: float = 1.0):
+        super().__init__(worker_id)
+        self.directory = Path(directory)
+        self.path = self.directory / f"{worker_id}.sock"
+        self.peer_refresh_interval = peer_refresh_interval
+        self._sock: Optional[socket.socket] = None
+        self._handler: Optional[Callable[[Dict[str, Any]], None]] = None
+        self._peers: List[str] = []
+        self._peers_checked_at = 0.0
+
+    async def start(self, handler: Callable[[Dict[str, Any]], None]) -> None:
+        self._handler = handler
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.path.unlink(missing_ok=True)
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._sock.setblocking(False)
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 * 1024 * 1024)
+        self._sock.bind(str(self.path))
+        asyncio.get_running_loop().add_reader(self._sock.fileno(), self._on_readable)
+
+    def _on_readable(self):
+        while True:
+            try:
+                data = self._sock.recv(MAX_DATAGRAM)
+            except (BlockingIOError, InterruptedError):
+                return
+            self.received += 1
+            try:
+                envelope = codec.loads(data)
+                peer = str(self.directory / f"{envelope.get('origin')}.sock")
+                if peer not in self._peers:
+                    # A worker that just started; answer it without waiting for a rescan
+                    self._peers.append(peer)
+                self._handler(envelope)
+            except Exception as e:
+                logger.error(f"Error handling event bus envelope: {str(e)}")
+
+    def _refresh_peers(self):
+        now = time.monotonic()
+        if now - self._peers_checked_at < self.peer_refresh_interval:
+            return
+        self._peers_checked_at = now
+        own = self.path.name
+        self._peers = [
+            entry.path for entry in os.scandir(self.directory)
+            if entry.name.endswith(".sock") and entry.name != own
+        ]
+
+    async def publish(self, envelope: Dict[str, Any]) -> None:
+        if self._sock is None:
+            return
+        self._refresh_peers()
+        data = codec.dumps_bytes(self._stamp(envelope))
+        for peer in list(self._peers):
+            try:
+                self._sock.sendto(data, peer)
+                self.sent += 1
+            except (BlockingIOError, InterruptedError):
+                self.dropped += 1
+            except (ConnectionRefusedError, FileNotFoundError):
+                self._remove_peer(peer)
+            except OSError as e:
+                self.dropped += 1
+                logger.error(f"Event bus send to {peer} failed: {str(e)}")
+
+    def _remove_peer(self, peer: str):
+        if peer in self._peers:
+            self._peers.remove(peer)
+        try:
+            os.unlink(peer)
+        except FileNotFoundError:
+            pass
+        worker_id = Path(peer).stem
+        logger.warning(f"Event bus peer {worker_id} is gone, dropping its clients")
+        if self._handler is not None:
+            self._handler({"kind": "leave", "origin": worker_id})
+
+    async def close(self) -> None:
+        if self._sock is None:
+            return
+        asyncio.get_running_loop().remove_reader(self._sock.fileno())
+        self._sock.close()
+        self._sock = None
+        self.path.unlink(missing_ok=True)
+
+class QueueEventBus(EventBus):
+    """Bus over a Redis stream, for workers on different hosts.
+
+    Every worker publishes to one ``topic`` and consumes it through its own
+    consumer group, ``<group_prefix>.<worker_id>``, so each envelope reaches
+    every worker. The group is ephemeral (see RedisQueue): it starts at the
+    end of the stream and is destroyed on close, and peers destroy the
+    group of a worker that went silent. The stream is trimmed to
+    EVENT_BUS_MAX_LEN entries. Envelopes older than this worker, which a
+    group left behind by a previous run with the same worker id would
+    replay, are skipped.
+    """
+
+    def __init__(self, queue: RedisQueue, topic: str, worker_id: str, group_prefix: str):
+        super().__init__(worker_id)
+        self.queue = queue
+        self.topic = topic
+        self.group_prefix = group_prefix
+        self._started_at = 0.0
+        self._handler: Optional[Callable[[Dict[str, Any]], None]] = None
+
+    async def start(self, handler: Callable[[Dict[str, Any]], None]) -> None:
+        self._handler = handler
+        self._started_at = time.time()
+        await self.queue.connect()
+        await self.queue.subscribe(self.topic, self._on_message)
+
+    def _on_message(self, envelope: Dict[str, Any]):
+        if envelope.get("origin") == self.worker_id or envelope.get("sent_at", 0) < self._started_at:
+            return
+        self.received += 1
+        self._handler(envelope)
+
+    async def publish(self, envelope: Dict[str, Any]) -> None:
+        envelope = self._stamp(envelope, sent_at=time.time())
+        await self.queue.publish(self.topic, envelope)
+        self.sent += 1
+
+    async def close(self) -> None:
+        await self.queue.disconnect()
+
+    async def forget(self, worker_id: str) -> None:
+        await self.queue.destroy_group(self.topic, f"{self.group_prefix}.{worker_id}")
+
+def create_event_bus(settings: Settings) -> Optional[EventBus]:
+    """Build the bus selected by EVENT_BUS, or None for a single process"""
+    kind = settings.EVENT_BUS.lower()
+    worker_id = settings.EVENT_BUS_WORKER_ID or default_worker_id()
+    if kind == "none":
+        return None
+    if kind == "unix":
+        return UnixSocketBus(settings.EVENT_BUS_DIR, worker_id)
+    if kind == "queue":
+        if settings.QUEUE_TYPE.lower() != "redis":
+            # A RabbitMQ subscription is a shared work queue, not a fan-out, and
+            # LocalQueue segments have a single writing process
+            raise ValueError("EVENT_BUS=queue needs QUEUE_TYPE=redis")
+        queue_settings = settings.copy(update={
+            "QUEUE_CONSUMER_GROUP": f"{settings.QUEUE_CONSUMER_GROUP}.{worker_id}",
+            "QUEUE_MAX_LEN": settings.EVENT_BUS_MAX_LEN,
+        })
+        return QueueEventBus(
+            RedisQueue(queue_settings, ephemeral_group=True), settings.EVENT_BUS_TOPIC, worker_id,
+            settings.QUEUE_CONSUMER_GROUP
+        )
+    raise ValueError(f"Unsupported event bus: {settings.EVENT_BUS}")
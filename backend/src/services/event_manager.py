@@ -1,120 +1,590 @@
-from typing import Dict, Optional, List, Callable, Any
+from typing import Dict, Optional, List, Callable, Awaitable, Any, Set
 from fastapi import WebSocket, BackgroundTasks
 import asyncio
-import json
 import logging
 import aiohttp
+from time import monotonic, perf_counter
 from datetime import datetime, UTC  # Add UTC import here
-from ..models.message import Message
+from ..models.message import Message, conversation_key
+from ..core.codec import EncodedMessage, dumps
+from ..core.config import Settings, get_settings
 from ..core.logging_config import get_logger
+from ..core.metrics import fanout_duration, fanout_recipients, registry, webhook_duration, webhook_errors
+from .delivery_index import DeliveryIndex
+from .event_bus import EventBus, WorkerRegistry
+from .outbound import OutboundBuffer
 
 logger = logging.getLogger(__name__)
 
+# Clients per snapshot envelope, so each part fits in one bus datagram
+SNAPSHOT_PART_SIZE = 2000
+
+class EventQueueFullError(Exception):
+    """Raised when the dispatch queue stays at its high-water mark past the publish timeout"""
+    pass
+
+class WebhookBatcher:
+    """Buffers webhook events for one client and POSTs them as a JSON array.
+
+    A batch is flushed once ``max_size`` events are buffered or ``max_delay``
+    seconds after its first event, whichever comes first. Batches are sent one
+    at a time so the subscriber sees events in the order they were added.
+    """
+
+    def __init__(self, send: Callable[[List[Dict[str, Any]]], Awaitable[None]], max_size: int, max_delay: float):
+        self._send = send
+        self.max_size = max(1, max_size)
+        self.max_delay = max_delay
+        self._buffer: List[Dict[str, Any]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._lock = asyncio.Lock()
+        self._flushes: Set[asyncio.Task] = set()
+
+    @property
+    def pending(self) -> int:
+        return len(self._buffer)
+
+    def add(self, event: Dict[str, Any]):
+        self._buffer.append(event)
+        if len(self._buffer) >= self.max_size:
+            self._start_flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.max_delay, self._start_flush)
+
+    def _start_flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._buffer:
+            return
+        batch, self._buffer = self._buffer, []
+        task = asyncio.create_task(self._flush(batch))
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+
+    async def _flush(self, batch: List[Dict[str, Any]]):
+        async with self._lock:
+            await self._send(batch)
+
+    async def close(self):
+        """Flush whatever is buffered and wait for in-flight batches"""
+        self._start_flush()
+        if self._flushes:
+            await asyncio.gather(*self._flushes, return_exceptions=True)
+
 class EventManager:
-    def __init__(self):
+    def __init__(self, settings: Optional[Settings] = None):
+        self.settings = settings or get_settings()
         self.active_connections: Dict[str, WebSocket] = {}
+        self.outbound: Dict[str, OutboundBuffer] = {}
         self.webhook_urls: Dict[str, str] = {}
-        self.message_queue: asyncio.Queue = asyncio.Queue()
+        self.webhook_batchers: Dict[str, WebhookBatcher] = {}
+        self.delivery_index = DeliveryIndex()
+        # Cross-worker pub/sub and the client -> worker map it maintains (see attach_bus)
+        self.bus: Optional[EventBus] = None
+        self.registry = WorkerRegistry()
+        self.worker_id = "local"
+        self._bus_tasks: Set[asyncio.Task] = set()
+        # Keeps register / unregister envelopes from interleaving with a snapshot's parts
+        self._bus_lock = asyncio.Lock()
+        self._snapshot_seq = 0
+        self._snapshots: Dict[str, Any] = {}  # worker -> (seq, parts received, clients) being assembled
+        self._peer_seqs: Dict[str, int] = {}
+        # Envelope kinds other services exchange over the bus, and who to tell when one was lost
+        self._bus_handlers: Dict[str, Callable[[Dict[str, Any]], None]] = {}
+        self._gap_handlers: List[Callable[[str], None]] = []
+        # Bounded dispatch queue of (message, recipients, conversation, broadcast) jobs
+        self.message_queue: asyncio.Queue = asyncio.Queue(maxsize=self.settings.EVENT_QUEUE_MAX_SIZE)
         self.background_tasks: BackgroundTasks = BackgroundTasks()
-        self._queue_task: Optional[asyncio.Task] = None
+        self._workers: List[asyncio.Task] = []
+        self.rejected_events = 0
+        # Shared webhook HTTP client, opened in start_background_tasks
+        self._http_session: Optional[aiohttp.ClientSession] = None
+        self._webhook_slots = asyncio.Semaphore(self.settings.WEBHOOK_MAX_CONCURRENCY)
+        # Unbatched POSTs in flight or waiting for a slot; dispatch workers do not wait on them
+        self._webhook_tasks: Set[asyncio.Task] = set()
+        self._json_headers = {"Content-Type": "application/json"}
 
-    async def register_websocket(self, client_id: str, websocket: WebSocket):
+    def _get_http_session(self) -> aiohttp.ClientSession:
+        """Return the shared webhook session, creating it on first use"""
+        if self._http_session is None or self._http_session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.settings.WEBHOOK_MAX_CONCURRENCY,
+                limit_per_host=self.settings.WEBHOOK_CONNECTIONS_PER_HOST,
+                ttl_dns_cache=self.settings.WEBHOOK_DNS_CACHE_TTL,
+            )
+            timeout = aiohttp.ClientTimeout(
+                total=self.settings.WEBHOOK_TOTAL_TIMEOUT,
+                connect=self.settings.WEBHOOK_CONNECT_TIMEOUT,
+            )
+            self._http_session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+        return self._http_session
+
+    async def _close_http_session(self):
+        if self._http_session is not None and not self._http_session.closed:
+            await self._http_session.close()
+        self._http_session = None
+
+    async def register_websocket(
+        self,
+        client_id: str,
+        websocket: WebSocket,
+        user_id: Optional[str] = None,
+        policy: Optional[str] = None
+    ):
         try:
             await websocket.accept()
             if client_id in self.active_connections:
                 # Close existing connection if any
+                await self._close_outbound(client_id)
                 try:
                     await self.active_connections[client_id].close()
                 except:
                     pass
+                self.delivery_index.remove_client(client_id)
             self.active_connections[client_id] = websocket
+            self.outbound[client_id] = OutboundBuffer(
+                client_id,
+                websocket,
+                max_size=self.settings.WS_SEND_BUFFER_SIZE,
+                policy=policy or self.settings.WS_SLOW_CONSUMER_POLICY,
+                on_failed=self._handle_send_failure,
+                on_overflow=self.cleanup_connection,
+            )
+            # Clients receive messages addressed to their user id (or client id)
+            self.delivery_index.add_recipient(client_id, user_id or client_id)
+            await self._track_client(client_id, user_id or client_id)
             logger.info(f"Client {client_id} connected via WebSocket")
         except Exception as e:
             logger.error(f"Error registering WebSocket for client {client_id}: {str(e)}")
             raise
 
-    def register_webhook(self, client_id: str, webhook_url: str):
+    async def register_webhook(
+        self,
+        client_id: str,
+        webhook_url: str,
+        batched: bool = False,
+        batch_size: Optional[int] = None,
+        batch_interval_ms: Optional[int] = None
+    ):
         self.webhook_urls[client_id] = webhook_url
-        logger.info(f"Client {client_id} registered webhook at {webhook_url}")
+        previous = self.webhook_batchers.pop(client_id, None)
 
-    async def broadcast_message(self, message: Dict[str, Any]):
-        # Add message to queue for processing
-        await self.message_queue.put(message)
-        
-        # Process WebSocket delivery
-        websocket_tasks = []
-        for client_id, ws in self.active_connections.items():
-            task = asyncio.create_task(self._send_ws_message(client_id, ws, message))
-            websocket_tasks.append(task)
-        
-        # Process webhook delivery for clients without active WebSocket
-        webhook_tasks = []
-        for client_id, url in self.webhook_urls.items():
-            if client_id not in self.active_connections:
-                task = asyncio.create_task(self._send_webhook(client_id, url, message))
-                webhook_tasks.append(task)
-        
-        # Wait for all deliveries to complete
-        await asyncio.gather(*websocket_tasks, *webhook_tasks)
-
-    async def _send_ws_message(self, client_id: str, websocket: WebSocket, message: Dict[str, Any]):
+        if batched:
+            self.webhook_batchers[client_id] = WebhookBatcher(
+                lambda batch: self._send_webhook(client_id, self.webhook_urls[client_id], batch),
+                max_size=batch_size or self.settings.WEBHOOK_BATCH_SIZE,
+                max_delay=(batch_interval_ms or self.settings.WEBHOOK_BATCH_INTERVAL_MS) / 1000,
+            )
+            logger.info(f"Client {client_id} registered batched webhook at {webhook_url}")
+        else:
+            logger.info(f"Client {client_id} registered webhook at {webhook_url}")
+
+        if previous is not None:
+            # Events the replaced batcher still holds go out before this returns
+            await previous.close()
+
+    async def publish(
+        self,
+        message: Dict[str, Any],
+        recipients: Optional[List[str]] = None,
+        conversation: Optional[str] = None,
+        broadcast: bool = False,
+        timeout: Optional[float] = None
+    ):
+        """Hand a message to the dispatch workers.
+
+        Waits up to ``timeout`` (default ``EVENT_PUBLISH_TIMEOUT``) for room in
+        the queue, then raises EventQueueFullError.
+        """
+        job = (message, recipients, conversation, broadcast)
+        try:
+            self.message_queue.put_nowait(job)
+            await self._forward(message, recipients, conversation, broadcast)
+            return
+        except asyncio.QueueFull:
+            pass
+
+        wait = self.settings.EVENT_PUBLISH_TIMEOUT if timeout is None else timeout
+        if wait > 0:
+            try:
+                await asyncio.wait_for(self.message_queue.put(job), timeout=wait)
+                await self._forward(message, recipients, conversation, broadcast)
+                return
+            except asyncio.TimeoutError:
+                pass
+        self.rejected_events += 1
+        raise EventQueueFullError(
+            f"Dispatch queue full ({self.message_queue.maxsize} pending events)"
+        )
+
+    def queue_stats(self) -> Dict[str, int]:
+        return {
+            "depth": self.message_queue.qsize(),
+            "max_size": self.message_queue.maxsize,
+            "workers": sum(1 for worker in self._workers if not worker.done()),
+            "rejected": self.rejected_events,
+        }
+
+    def bus_stats(self) -> Dict[str, Any]:
+        """Registry size plus envelopes sent, received and dropped by the bus"""
+        stats = {"worker": self.worker_id, **self.registry.stats()}
+        if self.bus is not None:
+            stats.update(self.bus.stats())
+        return stats
+
+    async def attach_bus(self, bus: EventBus):
+        """Share events and client locations with the other workers over ``bus``.
+
+        Every event published here is also sent to the peers, and each worker
+        delivers it only to the sockets it holds itself. Webhook fallback then
+        only fires for recipients that are not connected to any worker. Every
+        EVENT_BUS_SNAPSHOT_INTERVAL seconds the full list of this worker's
+        clients is sent, which repairs registries that missed an envelope.
+        """
+        self.bus = bus
+        previous, self.worker_id = self.worker_id, bus.worker_id
+        for client_id in list(self.registry.by_worker.get(previous, ())):
+            self.registry.add(self.worker_id, client_id, self.registry.clients[client_id][1])
+        await bus.start(self._on_bus_envelope)
+        # Ask the peers for their clients and tell them about ours
+        await bus.publish({"kind": "hello"})
+        await self._publish_snapshot()
+        self._spawn(self._snapshot_loop())
+
+    def on_bus_envelope(self, kind: str, handler: Callable[[Dict[str, Any]], None]):
+        """Pass envelopes of ``kind`` sent with ``share`` by other workers to ``handler``"""
+        self._bus_handlers[kind] = handler
+
+    def on_bus_gap(self, handler: Callable[[str], None]):
+        """Call ``handler(worker_id)`` when an envelope from that worker was lost"""
+        self._gap_handlers.append(handler)
+
+    async def share(self, envelope: Dict[str, Any]):
+        """Send ``envelope`` to the other workers, if there is a bus"""
+        if self.bus is None:
+            return
         try:
-            await websocket.send_text(json.dumps(message))
-            logger.info(f"Message sent to client {client_id} via WebSocket")
+            await self.bus.publish(envelope)
         except Exception as e:
-            logger.error(f"WebSocket delivery failed for client {client_id}: {str(e)}")
-            # Remove failed connection and try webhook fallback
-            if client_id in self.active_connections:
-                del self.active_connections[client_id]
-            if client_id in self.webhook_urls:
-                await self._send_webhook(client_id, self.webhook_urls[client_id], message)
+            logger.error(f"Error sending {envelope.get('kind')} to other workers: {str(e)}")
+
+    def _check_seq(self, worker_id: str, seq: Optional[int]):
+        if seq is None:
+            return
+        previous = self._peer_seqs.get(worker_id)
+        self._peer_seqs[worker_id] = seq
+        if previous is not None and seq != previous + 1:
+            logger.warning(f"Lost {max(seq - previous - 1, 0)} envelopes from worker {worker_id}")
+            for handler in self._gap_handlers:
+                handler(worker_id)
+
+    def _spawn(self, coroutine):
+        task = asyncio.create_task(coroutine)
+        self._bus_tasks.add(task)
+        task.add_done_callback(self._bus_tasks.discard)
+
+    async def _forward(self, message: Dict[str, Any], recipients, conversation, broadcast: bool):
+        if self.bus is None:
+            return
+        try:
+            await self.bus.publish({
+                "kind": "event",
+                "message": message,
+                "recipients": recipients,
+                "conversation": conversation,
+                "broadcast": broadcast,
+            })
+        except Exception as e:
+            logger.error(f"Error forwarding event to other workers: {str(e)}")
+
+    def _on_bus_envelope(self, envelope: Dict[str, Any]):
+        kind = envelope.get("kind")
+        worker_id = envelope.get("origin")
+        if kind != "leave":
+            self.registry.touch(worker_id)
+            self._check_seq(worker_id, envelope.get("seq"))
+        if kind == "event":
+            job = (envelope["message"], envelope.get("recipients"), envelope.get("conversation"), envelope.get("broadcast", False))
+            try:
+                self.message_queue.put_nowait(job)
+            except asyncio.QueueFull:
+                self.rejected_events += 1
+                logger.warning(f"Dispatch queue full, dropping event from worker {worker_id}")
+        elif kind == "register":
+            for client_id, recipient_ids in envelope["clients"].items():
+                self.registry.add(worker_id, client_id, recipient_ids)
+        elif kind == "unregister":
+            self.registry.remove(envelope["client_id"], worker_id)
+        elif kind == "snapshot":
+            self._on_snapshot(worker_id, envelope)
+        elif kind == "hello":
+            self._spawn(self._publish_snapshot())
+        elif kind == "leave":
+            self._snapshots.pop(worker_id, None)
+            self._peer_seqs.pop(worker_id, None)
+            self.registry.drop_worker(worker_id)
+        elif kind in self._bus_handlers:
+            self._bus_handlers[kind](envelope)
+
+    def _on_snapshot(self, worker_id: str, envelope: Dict[str, Any]):
+        """Collect a snapshot's parts; once all arrived they replace the worker's clients"""
+        pending = self._snapshots.get(worker_id)
+        if pending is None or pending[0] != envelope["seq"]:
+            # A part of a newer snapshot; one with missing parts is abandoned
+            pending = self._snapshots[worker_id] = (envelope["seq"], set(), {})
+        pending[1].add(envelope["part"])
+        pending[2].update(envelope["clients"])
+        if len(pending[1]) == envelope["parts"]:
+            del self._snapshots[worker_id]
+            self.registry.replace_worker(worker_id, pending[2])
+
+    async def _publish_snapshot(self):
+        if self.bus is None:
+            return
+        async with self._bus_lock:
+            self._snapshot_seq += 1
+            client_ids = list(self.registry.by_worker.get(self.worker_id, ()))
+            parts = [client_ids[n:n + SNAPSHOT_PART_SIZE] for n in range(0, len(client_ids), SNAPSHOT_PART_SIZE)] or [[]]
+            envelopes = [
+                {
+                    "kind": "snapshot",
+                    "seq": self._snapshot_seq,
+                    "part": index,
+                    "parts": len(parts),
+                    "clients": {client_id: list(self.registry.clients[client_id][1]) for client_id in part},
+                }
+                for index, part in enumerate(parts)
+            ]
+            for envelope in envelopes:
+                await self.bus.publish(envelope)
+
+    async def _snapshot_loop(self):
+        interval = self.settings.EVENT_BUS_SNAPSHOT_INTERVAL
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self._publish_snapshot()
+                self.registry.touch(self.worker_id)
+                for worker_id in self.registry.expire(monotonic() - 3 * interval):
+                    logger.warning(f"Event bus peer {worker_id} went silent, dropping its clients")
+                    await self.bus.forget(worker_id)
+            except Exception as e:
+                logger.error(f"Error sending event bus snapshot: {str(e)}")
+
+    async def _track_client(self, client_id: str, recipient_id: str):
+        self.registry.add(self.worker_id, client_id, (recipient_id,))
+        if self.bus is not None:
+            try:
+                async with self._bus_lock:
+                    await self.bus.publish({"kind": "register", "clients": {client_id: [recipient_id]}})
+            except Exception as e:
+                logger.error(f"Error announcing client {client_id}: {str(e)}")
+
+    async def _untrack_client(self, client_id: str):
+        self.delivery_index.remove_client(client_id)
+        if self.registry.worker_of(client_id) != self.worker_id:
+            return
+        self.registry.remove(client_id)
+        if self.bus is not None:
+            try:
+                async with self._bus_lock:
+                    await self.bus.publish({"kind": "unregister", "client_id": client_id})
+            except Exception as e:
+                logger.error(f"Error announcing disconnect of {client_id}: {str(e)}")
+
+    async def broadcast_message(self, message: Dict[str, Any]):
+        # Every socket, plus webhooks for clients without an active WebSocket
+        offline_webhooks = [
+            client_id for client_id in self.webhook_urls
+            if client_id not in self.active_connections and self.registry.worker_of(client_id) is None
+        ]
+        await self._fan_out(message, list(self.active_connections), offline_webhooks)
+
+    async def deliver_message(
+        self,
+        message: Dict[str, Any],
+        recipients: Optional[List[str]] = None,
+        conversation: Optional[str] = None
+    ):
+        """Deliver only to sockets indexed under the recipients or conversation.
+
+        Recipients with no connected socket get the message by webhook instead.
+        """
+        recipients = recipients or []
+        client_ids = self.delivery_index.resolve(recipients, conversation)
+        offline_webhooks = [
+            recipient_id for recipient_id in recipients
+            if recipient_id in self.webhook_urls and not self.registry.is_online(recipient_id)
+        ]
+        await self._fan_out(message, client_ids, offline_webhooks)
+
+    async def _fan_out(self, message: Dict[str, Any], client_ids, webhook_client_ids):
+        start = perf_counter()
+        # Serialized at most once and shared by every socket and webhook
+        encoded = EncodedMessage(message)
+
+        # WebSocket delivery only enqueues; each connection's writer does the send
+        for client_id in client_ids:
+            buffer = self.outbound.get(client_id)
+            if buffer is not None:
+                buffer.push(encoded)
+
+        for client_id in webhook_client_ids:
+            self._start_webhook(client_id, encoded)
+        fanout_recipients.observe(len(client_ids) + len(webhook_client_ids))
+        fanout_duration.observe(perf_counter() - start)
+
+    async def _handle_send_failure(self, client_id: str, message: EncodedMessage):
+        """Drop a broken connection and fall back to webhook for what it didn't send"""
+        buffer = self.outbound.pop(client_id, None)
+        unsent = [message] + (buffer.take_pending() if buffer is not None else [])
+        if client_id in self.active_connections:
+            del self.active_connections[client_id]
+            await self._untrack_client(client_id)
+        if client_id in self.webhook_urls:
+            for pending in unsent:
+                await self._deliver_webhook(client_id, self.webhook_urls[client_id], pending)
+
+    async def _close_outbound(self, client_id: str):
+        buffer = self.outbound.pop(client_id, None)
+        if buffer is not None:
+            await buffer.close()
+
+    async def flush_outbound(self, timeout: Optional[float] = None):
+        """Wait until every connection has written what is queued for it"""
+        buffers = list(self.outbound.values())
+        if buffers:
+            await asyncio.gather(*(buffer.drain(timeout) for buffer in buffers), return_exceptions=True)
+
+    def connection_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-connection buffer depth, drops and send lag"""
+        return {client_id: buffer.stats() for client_id, buffer in self.outbound.items()}
 
-    async def _send_webhook(self, client_id: str, webhook_url: str, message: Dict[str, Any]):
+    def _start_webhook(self, client_id: str, message: EncodedMessage):
+        """Batch or POST in the background, up to WEBHOOK_MAX_PENDING unbatched POSTs"""
+        batcher = self.webhook_batchers.get(client_id)
+        if batcher is not None:
+            batcher.add(message.message)
+            return
+        if len(self._webhook_tasks) >= self.settings.WEBHOOK_MAX_PENDING:
+            webhook_errors.inc(1, "overflow")
+            logger.error(f"Webhook delivery dropped for client {client_id}: {len(self._webhook_tasks)} already pending")
+            return
+        task = asyncio.create_task(self._send_webhook(client_id, self.webhook_urls[client_id], message))
+        self._webhook_tasks.add(task)
+        task.add_done_callback(self._webhook_tasks.discard)
+
+    async def _deliver_webhook(self, client_id: str, webhook_url: str, message: EncodedMessage):
+        batcher = self.webhook_batchers.get(client_id)
+        if batcher is not None:
+            batcher.add(message.message)
+        else:
+            await self._send_webhook(client_id, webhook_url, message)
+
+    async def _send_webhook(self, client_id: str, webhook_url: str, message: Any):
+        """POST a single event, or a list of events in batched mode"""
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(webhook_url, json=message) as response:
+            body = message.text if isinstance(message, EncodedMessage) else dumps(message)
+            async with self._webhook_slots:
+                session = self._get_http_session()
+                start = perf_counter()
+                async with session.post(webhook_url, data=body, headers=self._json_headers) as response:
+                    webhook_duration.observe(perf_counter() - start)
                     if response.status == 200:
                         logger.info(f"Message sent to client {client_id} via webhook")
                     else:
+                        webhook_errors.inc(1, "http_status")
                         logger.error(f"Webhook delivery failed for client {client_id}: HTTP {response.status}")
         except Exception as e:
+            webhook_errors.inc(1, "timeout" if isinstance(e, asyncio.TimeoutError) else "connection")
             logger.error(f"Webhook delivery failed for client {client_id}: {str(e)}")
 
     async def process_message_queue(self):
+        """Dispatch worker: take up to EVENT_DISPATCH_BATCH_SIZE jobs per wakeup"""
+        batch_size = self.settings.EVENT_DISPATCH_BATCH_SIZE
         while True:
-            try:
-                message = await self.message_queue.get()
-                await self.broadcast_message(message)
-                self.message_queue.task_done()
-            except Exception as e:
-                logger.error(f"Error processing message queue: {str(e)}")
-            await asyncio.sleep(0.1)  # Prevent CPU overload
+            batch = [await self.message_queue.get()]
+            while len(batch) < batch_size:
+                try:
+                    batch.append(self.message_queue.get_nowait())
+                except asyncio.QueueEmpty:
+                    break
+
+            for message, recipients, conversation, broadcast in batch:
+                try:
+                    if broadcast:
+                        await self.broadcast_message(message)
+                    else:
+                        await self.deliver_message(message, recipients, conversation)
+                except Exception as e:
+                    logger.error(f"Error processing message queue: {str(e)}")
+                finally:
+                    self.message_queue.task_done()
 
     def start_background_tasks(self):
-        if self._queue_task is None or self._queue_task.done():
-            self._queue_task = asyncio.create_task(self.process_message_queue())
+        self._get_http_session()
+        self._workers = [worker for worker in self._workers if not worker.done()]
+        while len(self._workers) < self.settings.EVENT_DISPATCH_WORKERS:
+            self._workers.append(asyncio.create_task(self.process_message_queue()))
 
     async def cleanup_connection(self, client_id: str):
+        await self._close_outbound(client_id)
         if client_id in self.active_connections:
             try:
                 await self.active_connections[client_id].close()
             except:
                 pass
             del self.active_connections[client_id]
+            await self._untrack_client(client_id)
             logger.info(f"Cleaned up connection for client {client_id}")
 
-    async def close_all_connections(self):
+    async def close_all_connections(self, drain_timeout: float = 5.0):
+        # Give the workers a chance to deliver what is already queued
+        if self._workers and not self.message_queue.empty():
+            try:
+                await asyncio.wait_for(self.message_queue.join(), timeout=drain_timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"Dropping {self.message_queue.qsize()} undelivered events on shutdown")
+        await self.flush_outbound(drain_timeout)
         for client_id in list(self.active_connections.keys()):
             await self.cleanup_connection(client_id)
-        if self._queue_task and not self._queue_task.done():
-            self._queue_task.cancel()
+        for worker in self._workers:
+            worker.cancel()
+        for worker in self._workers:
             try:
-                await self._queue_task
+                await worker
             except asyncio.CancelledError:
                 pass
+        self._workers = []
+        if self._webhook_tasks:
+            await asyncio.wait(list(self._webhook_tasks), timeout=drain_timeout)
+        for batcher in self.webhook_batchers.values():
+            await batcher.close()
+        await self._close_http_session()
+        for task in list(self._bus_tasks):
+            task.cancel()
+        if self._bus_tasks:
+            await asyncio.gather(*self._bus_tasks, return_exceptions=True)
+        if self.bus is not None:
+            try:
+                await self.bus.publish({"kind": "leave"})
+                await self.bus.close()
+            except Exception as e:
+                logger.error(f"Error closing event bus: {str(e)}")
+            self.bus = None
 
     async def handle_client_message(self, client_id: str, message: Dict[str, Any]):
         try:
+            # Conversation subscription frames only update the delivery index
+            frame_type = message.get("type")
+            if frame_type in ("subscribe", "unsubscribe") and message.get("conversation_key"):
+                if frame_type == "subscribe":
+                    self.delivery_index.subscribe(client_id, message["conversation_key"])
+                else:
+                    self.delivery_index.unsubscribe(client_id, message["conversation_key"])
+                return True
+
             # Enhance message with metadata
             enhanced_message = {
                 "type": "message",
@@ -122,11 +592,26 @@ class EventManager:
                 "content": message,
                 "timestamp": datetime.now(UTC).isoformat()
             }
-            
-            # Broadcast to all clients
-            await self.broadcast_message(enhanced_message)
-            
+
+            receiver_id = message.get("receiver_id")
+            conversation = message.get("conversation_key")
+            if receiver_id is None and conversation is None:
+                # Untargeted frames keep the legacy broadcast behaviour
+                await self.publish(enhanced_message, broadcast=True)
+            else:
+                if conversation is None:
+                    conversation = conversation_key(client_id, receiver_id)
+                recipients = [receiver_id] if receiver_id is not None else []
+                await self.publish(enhanced_message, recipients, conversation)
+
             return True
+        except EventQueueFullError:
+            # Tell the sender its frame was not delivered rather than queueing without bound
+            logger.warning(f"Dispatch queue full, rejecting frame from client {client_id}")
+            buffer = self.outbound.get(client_id)
+            if buffer is not None:
+                buffer.push(EncodedMessage({"type": "error", "error": "queue_full"}))
+            return False
         except Exception as e:
             logger.error(f"Error handling message from client {client_id}: {str(e)}")
             return False
@@ -151,4 +636,7 @@ class EventManager:
             await self.cleanup_connection("default")
 
 # Create a singleton instance
-event_manager = EventManager()
\ No newline at end of file
+event_manager = EventManager()
+
+registry.gauge("event_queue_depth", "Events waiting for a dispatch worker", lambda: event_manager.message_queue.qsize())
+registry.gauge("websocket_active_connections", "Connected WebSocket clients", lambda: len(event_manager.active_connections))
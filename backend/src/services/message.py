@@ -1,8 +1,9 @@
-from typing import List, Optional, Dict
+from typing import Any, List, Optional, Dict, Tuple
 from datetime import datetime
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, or_, and_
-from ..models.message import Message
+from sqlalchemy import Integer, String, bindparam, case, column, func, insert, select, update
+from sqlalchemy.dialects.postgresql import ARRAY
+from ..models.message import Message, conversation_key
 from pydantic import BaseModel
 
 class MessageResponse(BaseModel):
@@ -29,25 +30,194 @@ class MessageResponse(BaseModel):
         )
 
 from datetime import datetime, UTC
-import websockets
-import json
+import asyncio
+from ..core import codec
 from ..core.logging_config import get_logger
 from ..core.config import get_settings
+from ..core.database import AsyncSessionLocal
+from ..core.metrics import registry
+from .event_manager import EventManager, event_manager
+from .middleware_client import MiddlewareClient, middleware_client
+from .pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, Page, keyset_page
+from .write_coalescer import GroupCommitWriter
+from .status_buffer import StatusBuffer
+from .message_cache import MessageCache, create_message_cache
+from .conversation_tail import ConversationTailCache
 
 logger = get_logger(__name__)
 settings = get_settings()
 
+def build_message_row(
+    content: str,
+    sender_id: str,
+    receiver_id: str,
+    message_type: str = "text",
+    now: Optional[datetime] = None
+) -> Dict[str, Any]:
+    now = now or datetime.now(UTC)
+    return {
+        "content": content,
+        "sender_id": sender_id,
+        "receiver_id": receiver_id,
+        "conversation_key": conversation_key(sender_id, receiver_id),
+        "message_type": message_type or "text",
+        "status": "sent",
+        "created_at": now,
+        "updated_at": now,
+    }
+
+async def insert_message_rows(db: AsyncSession, rows: List[Dict[str, Any]]) -> List[Any]:
+    """Multi-row ``INSERT ... RETURNING id, created_at``, in input order"""
+    statement = insert(Message).returning(Message.id, Message.created_at, sort_by_parameter_order=True)
+    result = await db.execute(statement, rows)
+    return result.all()
+
+def _response_from_row(row: Dict[str, Any], message_id: int, created_at: datetime, metadata: Optional[Dict]) -> MessageResponse:
+    return MessageResponse(
+        id=message_id,
+        content=row["content"],
+        sender_id=row["sender_id"],
+        receiver_id=row["receiver_id"],
+        message_type=row["message_type"],
+        status=row["status"],
+        metadata=metadata or {},
+        created_at=created_at.isoformat()
+    )
+
+# Delivery receipts only move forward: a late "delivered" never overwrites "read"
+STATUS_RANKS = {"pending": 0, "sent": 1, "failed": 2, "delivered": 2, "read": 3}
+
+class InvalidStatusError(ValueError):
+    pass
+
+def _status_rank(status_column):
+    return case(STATUS_RANKS, value=status_column, else_=-1)
+
+def _validate_status(status: str):
+    if status not in STATUS_RANKS:
+        raise InvalidStatusError(f"Unknown message status: {status}")
+
+async def apply_status_updates(db: AsyncSession, latest: Dict[int, str]) -> List[int]:
+    """One ``UPDATE ... FROM unnest(ids, statuses)``, forward-only; returns changed ids"""
+    receipts = func.unnest(
+        bindparam("ids", list(latest.keys()), type_=ARRAY(Integer)),
+        bindparam("statuses", list(latest.values()), type_=ARRAY(String))
+    ).table_valued(column("id", Integer), column("status", String)).render_derived(name="receipts")
+    statement = (
+        update(Message)
+        .where(
+            Message.id == receipts.c.id,
+            _status_rank(Message.status) < _status_rank(receipts.c.status)
+        )
+        .values(status=receipts.c.status, updated_at=datetime.now(UTC))
+        .returning(Message.id)
+    )
+    result = await db.execute(statement)
+    return list(result.scalars().all())
+
+# Opt-in group commit for create_message (MESSAGE_GROUP_COMMIT)
+message_writer = GroupCommitWriter(
+    AsyncSessionLocal,
+    insert_message_rows,
+    max_delay=settings.MESSAGE_GROUP_COMMIT_WINDOW_MS / 1000,
+    max_batch=settings.MESSAGE_GROUP_COMMIT_MAX_ROWS
+)
+
+# Opt-in coalescing of status transitions (MESSAGE_STATUS_BUFFER)
+status_buffer = StatusBuffer(
+    AsyncSessionLocal,
+    apply_status_updates,
+    STATUS_RANKS,
+    interval=settings.MESSAGE_STATUS_FLUSH_INTERVAL_MS / 1000
+)
+
+# Opt-in read-through cache for single-message reads (MESSAGE_CACHE)
+message_cache = create_message_cache(settings, STATUS_RANKS)
+
+if message_cache is not None:
+    registry.gauge("message_cache_hits", "Single-message reads served from the cache", lambda: message_cache.hits)
+    registry.gauge("message_cache_misses", "Single-message reads that went to the database", lambda: message_cache.misses)
+
+# Opt-in in-memory first pages of conversations (CONVERSATION_TAIL)
+conversation_tails = ConversationTailCache(
+    min(settings.CONVERSATION_TAIL_SIZE, MAX_PAGE_SIZE),
+    settings.CONVERSATION_TAIL_MEMORY_BYTES,
+    settings.CONVERSATION_TAIL_TTL,
+    STATUS_RANKS
+) if settings.CONVERSATION_TAIL else None
+
+def share_tails(tails: ConversationTailCache, events: EventManager):
+    """Apply writes made on other workers, sent by MessageService, to ``tails``"""
+    events.on_bus_envelope("tail_messages", lambda envelope: tails.add(envelope["messages"]))
+    events.on_bus_envelope("tail_statuses", lambda envelope: tails.update_statuses(
+        {int(message_id): status for message_id, status in envelope["statuses"].items()}
+    ))
+    events.on_bus_gap(lambda worker_id: tails.clear())
+
+if conversation_tails is not None:
+    share_tails(conversation_tails, event_manager)
+    registry.gauge("conversation_tail_bytes", "Approximate memory held by conversation tails", lambda: conversation_tails.bytes)
+    registry.gauge("conversation_tail_hits", "Conversation first pages served from memory", lambda: conversation_tails.hits)
+
 class MessageService:
-    def __init__(self, db):
+    def __init__(
+        self,
+        db,
+        middleware: Optional[MiddlewareClient] = None,
+        statuses: Optional[StatusBuffer] = None,
+        cache: Optional[MessageCache] = None,
+        tails: Optional[ConversationTailCache] = None,
+        events: Optional[EventManager] = None
+    ):
         self.db = db
-        # Update WebSocket URL to match middleware configuration
-        self.middleware_ws_url = "ws://localhost:8080/ws"  # Changed from 3000 to 8080
+        # App-scoped connection pool, see services/middleware_client.py
+        self.middleware = middleware or middleware_client
+        self.statuses = statuses or (status_buffer if settings.MESSAGE_STATUS_BUFFER else None)
+        self.cache = cache or message_cache
+        self.tails = tails or conversation_tails
+        self.events = events or event_manager
+
+    def _to_response(self, message: Message) -> MessageResponse:
+        response = MessageResponse.from_orm(message)
+        if self.statuses is not None:
+            # Transitions not flushed yet still show up on reads
+            response.status = self.statuses.apply(message.id, response.status)
+        return response
+
+    async def _cache_created(self, messages: List[MessageResponse]):
+        if self.cache is None and self.tails is None:
+            return
+        # Cached as a later read returns it: metadata is not stored
+        stored = [dict(message.dict(), metadata={}) for message in messages]
+        if self.tails is not None:
+            self.tails.add(stored)
+            await self.events.share({"kind": "tail_messages", "messages": stored})
+        if self.cache is not None:
+            await self.cache.put_many(stored)
+
+    async def _cache_statuses(self, statuses: Dict[int, str]):
+        if not statuses:
+            return
+        if self.tails is not None:
+            self.tails.update_statuses(statuses)
+            await self.events.share({"kind": "tail_statuses", "statuses": statuses})
+        if self.cache is not None:
+            await self.cache.update_statuses(statuses)
 
     async def create_message(self, content: str, sender_id: str, receiver_id: str, message_type: str = "text", metadata: Optional[Dict] = None) -> MessageResponse:
+        if settings.MESSAGE_GROUP_COMMIT:
+            # Written on the shared writer's own session, grouped with concurrent callers
+            row = build_message_row(content, sender_id, receiver_id, message_type)
+            message_id, created_at = await message_writer.submit(row)
+            response = _response_from_row(row, message_id, created_at, metadata)
+            await self._cache_created([response])
+            return response
+
         message = Message(
             content=content,
             sender_id=sender_id,
             receiver_id=receiver_id,
+            conversation_key=conversation_key(sender_id, receiver_id),
             message_type=message_type,
             status="sent",
             metadata=metadata or {},
@@ -57,79 +227,190 @@ class MessageService:
         self.db.add(message)
         await self.db.commit()
         await self.db.refresh(message)
-        return MessageResponse.from_orm(message)
+        response = MessageResponse.from_orm(message)
+        await self._cache_created([response])
+        return response
+
+    async def create_messages(self, messages: List[Dict[str, Any]], sender_id: str) -> List[MessageResponse]:
+        """Insert many messages in one transaction.
+
+        Each item needs ``content`` and ``receiver_id`` and may set
+        ``message_type`` and ``metadata``. Rows go out as multi-row
+        ``INSERT ... RETURNING`` statements; results keep the input order.
+        """
+        if not messages:
+            return []
+        now = datetime.now(UTC)
+        rows = [
+            build_message_row(item["content"], sender_id, item["receiver_id"], item.get("message_type"), now)
+            for item in messages
+        ]
+        inserted = await insert_message_rows(self.db, rows)
+        await self.db.commit()
+
+        responses = [
+            _response_from_row(row, message_id, created_at, item.get("metadata"))
+            for (message_id, created_at), row, item in zip(inserted, rows, messages)
+        ]
+        await self._cache_created(responses)
+        return responses
 
     async def update_message_status(self, message_id: int, status: str) -> bool:
-        query = select(Message).where(Message.id == message_id)
-        result = await self.db.execute(query)
-        message = result.scalar_one_or_none()
-        
-        if not message:
-            return False
-            
-        message.status = status
-        message.updated_at = datetime.now(UTC)  # Use UTC-aware datetime
+        """Advance a message's status with a single UPDATE ... RETURNING.
+
+        Returns False only if the message does not exist; a stale (backwards)
+        transition is a successful no-op. With the status buffer enabled the
+        receipt is buffered once the message is known to exist (see
+        _message_exists).
+        """
+        _validate_status(status)
+        if self.statuses is not None:
+            if not await self._message_exists(message_id):
+                return False
+            self.statuses.add(message_id, status)
+            await self._cache_statuses({message_id: status})
+            return True
+
+        statement = (
+            update(Message)
+            .where(Message.id == message_id, _status_rank(Message.status) < STATUS_RANKS[status])
+            .values(status=status, updated_at=datetime.now(UTC))  # Use UTC-aware datetime
+            .returning(Message.id)
+        )
+        result = await self.db.execute(statement)
+        updated = result.scalar_one_or_none()
         await self.db.commit()
-        return True
+        if updated is not None:
+            await self._cache_statuses({message_id: status})
+            return True
+
+        # Nothing changed: either already at/after this status, or no such message
+        exists = await self.db.execute(select(Message.id).where(Message.id == message_id))
+        return exists.scalar_one_or_none() is not None
+
+    async def _message_exists(self, message_id: int) -> bool:
+        """Ask the status buffer and message cache before a primary-key lookup"""
+        if self.statuses is not None and self.statuses.get(message_id) is not None:
+            return True
+        if self.cache is not None and await self.cache.get(message_id) is not None:
+            return True
+        result = await self.db.execute(select(Message.id).where(Message.id == message_id))
+        return result.scalar_one_or_none() is not None
+
+    async def update_message_statuses(self, updates: List[Tuple[int, str]]) -> List[int]:
+        """Apply many (id, status) receipts in one statement.
+
+        Forward-only per message; unknown ids and stale transitions are
+        skipped. Returns the ids that changed, or with the status buffer
+        enabled, every id accepted for the next flush.
+        """
+        latest: Dict[int, str] = {}
+        for message_id, status in updates:
+            _validate_status(status)
+            current = latest.get(message_id)
+            if current is None or STATUS_RANKS[status] > STATUS_RANKS[current]:
+                latest[message_id] = status
+        if not latest:
+            return []
+        if self.statuses is not None:
+            for message_id, status in latest.items():
+                self.statuses.add(message_id, status)
+            await self._cache_statuses(latest)
+            return list(latest.keys())
 
-    async def get_messages(self, user_id: Optional[str] = None) -> List[MessageResponse]:
+        updated_ids = await apply_status_updates(self.db, latest)
+        await self.db.commit()
+        await self._cache_statuses({message_id: latest[message_id] for message_id in updated_ids})
+        return updated_ids
+
+    async def get_messages(
+        self,
+        user_id: Optional[str] = None,
+        limit: int = DEFAULT_PAGE_SIZE,
+        before: Optional[str] = None,
+        after: Optional[str] = None
+    ) -> Page:
         query = select(Message)
         if user_id:
             query = query.where(Message.sender_id == user_id)
-        result = await self.db.execute(query)
-        messages = result.scalars().all()
-        return [MessageResponse.from_orm(msg) for msg in messages]
+        messages, next_cursor, prev_cursor = await keyset_page(self.db, query, limit, before, after)
+        return Page(
+            items=[self._to_response(msg) for msg in messages],
+            next_cursor=next_cursor,
+            prev_cursor=prev_cursor
+        )
 
-    async def get_message(self, message_id: int) -> Optional[MessageResponse]:
+    async def _load_message(self, message_id: int) -> Optional[Dict[str, Any]]:
         query = select(Message).where(Message.id == message_id)
         result = await self.db.execute(query)
         message = result.scalar_one_or_none()
-        return MessageResponse.from_orm(message) if message else None
-
-    async def get_conversation(self, user1_id: str, user2_id: str) -> List[MessageResponse]:
-        query = select(Message).where(
-            or_(
-                and_(Message.sender_id == user1_id, Message.receiver_id == user2_id),
-                and_(Message.sender_id == user2_id, Message.receiver_id == user1_id)
-            )
-        ).order_by(Message.created_at.desc())
-        
-        result = await self.db.execute(query)
-        messages = result.scalars().all()
-        return [MessageResponse.from_orm(msg) for msg in messages]
+        return self._to_response(message).dict() if message else None
 
-    async def update_message_status(self, message_id: int, status: str) -> bool:
-        query = select(Message).where(Message.id == message_id)
-        result = await self.db.execute(query)
-        message = result.scalar_one_or_none()
-        
-        if not message:
-            return False
-            
-        message.status = status
-        await self.db.commit()
-        return True
+    async def get_message_json(self, message_id: int) -> Optional[bytes]:
+        """The serialized message, straight from the cache on a hit"""
+        if self.cache is not None:
+            return await self.cache.get_or_load(message_id, self._load_message)
+        message = await self._load_message(message_id)
+        return codec.dumps_bytes(message) if message is not None else None
+
+    async def get_message(self, message_id: int) -> Optional[MessageResponse]:
+        if self.cache is not None:
+            body = await self.cache.get_or_load(message_id, self._load_message)
+            return MessageResponse(**codec.loads(body)) if body is not None else None
+        message = await self._load_message(message_id)
+        return MessageResponse(**message) if message is not None else None
+
+    async def _load_tail(self, key: str, count: int) -> Tuple[List[Dict[str, Any]], bool]:
+        query = select(Message).where(Message.conversation_key == key)
+        messages, next_cursor, _ = await keyset_page(self.db, query, count)
+        return [self._to_response(message).dict() for message in messages], next_cursor is None
+
+    async def get_conversation(
+        self,
+        user1_id: str,
+        user2_id: str,
+        limit: int = DEFAULT_PAGE_SIZE,
+        before: Optional[str] = None,
+        after: Optional[str] = None
+    ) -> Page:
+        key = conversation_key(user1_id, user2_id)
+        if self.tails is not None and before is None and after is None:
+            tail = await self.tails.first_page(key, limit, self._load_tail)
+            if tail is not None:
+                bodies, next_cursor = tail
+                return Page(items=[MessageResponse(**codec.loads(body)) for body in bodies], next_cursor=next_cursor)
+
+        # Served by ix_messages_conversation_key_created_at
+        query = select(Message).where(Message.conversation_key == key)
+        messages, next_cursor, prev_cursor = await keyset_page(self.db, query, limit, before, after)
+        return Page(
+            items=[self._to_response(msg) for msg in messages],
+            next_cursor=next_cursor,
+            prev_cursor=prev_cursor
+        )
+
+    async def send_many_to_middleware(self, messages: List[MessageResponse]):
+        """Send a batch concurrently; the middleware pool bounds what is in flight"""
+        await asyncio.gather(*(self.send_to_middleware(message) for message in messages))
 
     async def send_to_middleware(self, message):
-        """Send message to middleware via WebSocket"""
+        """Send message to middleware over the shared connection pool"""
         try:
-            async with websockets.connect(self.middleware_ws_url) as websocket:
-                metadata = message.metadata or {}
-                message_data = {
-                    "content": message.content,
-                    "to": f"{message.receiver_id}@s.whatsapp.net",  # Number should already include country code
-                    "type": "text",  # Baileys expects "text" for text messages
-                    "metadata": {
-                        "id": str(message.id),
-                        "sender_id": message.sender_id,
-                        "original_type": message.message_type,
-                        **metadata
-                    }
+            metadata = message.metadata or {}
+            message_data = {
+                "content": message.content,
+                "to": f"{message.receiver_id}@s.whatsapp.net",  # Number should already include country code
+                "type": "text",  # Baileys expects "text" for text messages
+                "metadata": {
+                    "id": str(message.id),
+                    "sender_id": message.sender_id,
+                    "original_type": message.message_type,
+                    **metadata
                 }
-                await websocket.send(json.dumps(message_data))
-                response = await websocket.recv()
-                logger.info(f"Middleware response: {response}")
-                
+            }
+            response = await self.middleware.send(str(message.id), message_data)
+            logger.info(f"Middleware response: {response}")
+
         except Exception as e:
             logger.error(f"Error sending message to middleware: {str(e)}", exc_info=True)
             # Don't raise the exception - this is a background task
\ No newline at end of file
@@ -0,0 +1,276 @@
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+import time
+from ..core import codec
+from ..core.config import Settings
+from ..core.logging_config import get_logger
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # pragma: no cover - optional dependency
+    aioredis = None
+
+logger = get_logger(__name__)
+
+# Loads a message as the dict GET /api/messages/{id} returns, None if it does not exist
+Loader = Callable[[int], Awaitable[Optional[Dict[str, Any]]]]
+
+class MessageCache(ABC):
+    """Serialized single-message responses, keyed by message id.
+
+    Entries hold the JSON body ``GET /api/messages/{id}`` returns, so a hit
+    costs neither a query nor a serialization. Writers keep entries current:
+    created messages are put as they are written and status changes are
+    applied in place, forward-only by ``ranks`` like the column itself. A
+    status change that lands while a miss is loading the row is applied to
+    the loaded body before it is cached.
+    """
+
+    def __init__(self, ranks: Dict[str, int]):
+        self.ranks = ranks
+        self.hits = 0
+        self.misses = 0
+
+    def _rank(self, status: Optional[str]) -> int:
+        return self.ranks.get(status, -1)
+
+    @abstractmethod
+    async def get(self, message_id: int) -> Optional[bytes]:
+        pass
+
+    @abstractmethod
+    async def get_or_load(self, message_id: int, load: Loader) -> Optional[bytes]:
+        """The cached body, or ``load`` the message and cache it"""
+        pass
+
+    @abstractmethod
+    async def put_many(self, messages: List[Dict[str, Any]]) -> None:
+        pass
+
+    @abstractmethod
+    async def update_statuses(self, statuses: Dict[int, str]) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {"hits": self.hits, "misses": self.misses}
+
+class LocalMessageCache(MessageCache):
+    """Bounded LRU with a TTL, private to this worker.
+
+    With several workers a status change only reaches the cache of the
+    worker that handled it; others may serve the older status for up to
+    ``ttl`` seconds. Use RedisMessageCache there.
+    """
+
+    def __init__(self, max_size: int, ttl: float, ranks: Dict[str, int]):
+        super().__init__(ranks)
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[int, Tuple[float, str, bytes]]" = OrderedDict()  # (expires at, status, body)
+        self._loading: Dict[int, int] = {}
+        # Status changes seen while the message was loading, applied to the fill
+        self._floors: Dict[int, str] = {}
+        self.evictions = 0
+
+    def _get(self, message_id: int) -> Optional[bytes]:
+        entry = self._entries.get(message_id)
+        if entry is not None:
+            if time.monotonic() < entry[0]:
+                self._entries.move_to_end(message_id)
+                self.hits += 1
+                return entry[2]
+            del self._entries[message_id]
+        self.misses += 1
+        return None
+
+    def _put(self, message: Dict[str, Any]) -> bytes:
+        body = codec.dumps_compact(message)
+        if self.max_size <= 0:
+            return body
+        message_id = message["id"]
+        self._entries[message_id] = (time.monotonic() + self.ttl, message["status"], body)
+        self._entries.move_to_end(message_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        return body
+
+    async def get(self, message_id: int) -> Optional[bytes]:
+        return self._get(message_id)
+
+    async def get_or_load(self, message_id: int, load: Loader) -> Optional[bytes]:
+        body = self._get(message_id)
+        if body is not None:
+            return body
+        self._loading[message_id] = self._loading.get(message_id, 0) + 1
+        try:
+            message = await load(message_id)
+        finally:
+            remaining = self._loading.pop(message_id) - 1
+            if remaining:
+                self._loading[message_id] = remaining
+                floor = self._floors.get(message_id)
+            else:
+                floor = self._floors.pop(message_id, None)
+        if message is None:
+            return None
+        if floor is not None and self._rank(floor) > self._rank(message["status"]):
+            message["status"] = floor
+        return self._put(message)
+
+    async def put_many(self, messages: List[Dict[str, Any]]) -> None:
+        for message in messages:
+            self._put(message)
+
+    async def update_statuses(self, statuses: Dict[int, str]) -> None:
+        for message_id, status in statuses.items():
+            entry = self._entries.get(message_id)
+            if entry is not None:
+                expires_at, current, body = entry
+                if self._rank(status) > self._rank(current):
+                    message = codec.loads(body)
+                    message["status"] = status
+                    self._entries[message_id] = (expires_at, status, codec.dumps_compact(message))
+            elif message_id in self._loading:
+                floor = self._floors.get(message_id)
+                if floor is None or self._rank(status) > self._rank(floor):
+                    self._floors[message_id] = status
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(super().stats(), backend="local", size=len(self._entries), evictions=self.evictions)
+
+# KEYS: body, floor. ARGV: body, status, ttl ms, ranks. Applies a status change
+# that raced the load, then stores the body.
+_FILL_SCRIPT = """
+local body = ARGV[1]
+local floor = redis.call('GET', KEYS[2])
+if floor then
+    local ranks = cjson.decode(ARGV[4])
+    if (ranks[floor] or -1) > (ranks[ARGV[2]] or -1) then
+        local message = cjson.decode(body)
+        message.status = floor
+        body = cjson.encode(message)
+    end
+end
+redis.call('SET', KEYS[1], body, 'PX', ARGV[3])
+return body
+"""
+
+# KEYS: body, floor. ARGV: status, floor ttl ms, ranks. Forward-only; with no
+# cached body, leaves a short-lived floor for a load that may be in flight.
+_UPDATE_SCRIPT = """
+local ranks = cjson.decode(ARGV[3])
+local rank = ranks[ARGV[1]] or -1
+local body = redis.call('GET', KEYS[1])
+if not body then
+    local floor = redis.call('GET', KEYS[2])
+    if not floor or (ranks[floor] or -1) < rank then
+        redis.call('SET', KEYS[2], ARGV[1], 'PX', ARGV[2])
+    end
+    return 0
+end
+local message = cjson.decode(body)
+if (ranks[message.status] or -1) >= rank then
+    return 0
+end
+message.status = ARGV[1]
+redis.call('SET', KEYS[1], cjson.encode(message), 'KEEPTTL')
+return 1
+"""
+
+class RedisMessageCache(MessageCache):
+    """Cache shared by every worker, kept in Redis.
+
+    Status changes are applied by a server-side script, so concurrent
+    writers on different workers cannot move a cached status backwards.
+    Size and eviction are left to Redis (``maxmemory-policy allkeys-lru``);
+    every entry expires after ``ttl`` seconds. Redis errors are logged and
+    reads fall through to the database.
+    """
+
+    # Long enough to cover any single-row load
+    FLOOR_TTL_MS = 5000
+
+    def __init__(self, url: str, ttl: float, ranks: Dict[str, int], prefix: str = "message"):
+        if aioredis is None:
+            raise RuntimeError("MESSAGE_CACHE=redis requires the 'redis' package")
+        super().__init__(ranks)
+        self.connection = aioredis.from_url(url)
+        self.ttl_ms = int(ttl * 1000)
+        self.prefix = prefix
+        self._ranks = codec.dumps(ranks)
+        self._fill = self.connection.register_script(_FILL_SCRIPT)
+        self._update = self.connection.register_script(_UPDATE_SCRIPT)
+        self.errors = 0
+
+    def _keys(self, message_id: int) -> List[str]:
+        return [f"{self.prefix}:{message_id}", f"{self.prefix}:{message_id}:status"]
+
+    async def get(self, message_id: int) -> Optional[bytes]:
+        try:
+            body = await self.connection.get(self._keys(message_id)[0])
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"Message cache read failed: {str(e)}")
+            body = None
+        if body is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return body
+
+    async def get_or_load(self, message_id: int, load: Loader) -> Optional[bytes]:
+        body = await self.get(message_id)
+        if body is not None:
+            return body
+        message = await load(message_id)
+        if message is None:
+            return None
+        body = codec.dumps_bytes(message)
+        try:
+            return await self._fill(keys=self._keys(message_id), args=[body, message["status"], self.ttl_ms, self._ranks])
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"Message cache fill failed: {str(e)}")
+            return body
+
+    async def put_many(self, messages: List[Dict[str, Any]]) -> None:
+        try:
+            async with self.connection.pipeline(transaction=False) as pipe:
+                for message in messages:
+                    pipe.set(self._keys(message["id"])[0], codec.dumps_bytes(message), px=self.ttl_ms)
+                await pipe.execute()
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"Message cache write of {len(messages)} messages failed: {str(e)}")
+
+    async def update_statuses(self, statuses: Dict[int, str]) -> None:
+        try:
+            async with self.connection.pipeline(transaction=False) as pipe:
+                for message_id, status in statuses.items():
+                    await self._update(keys=self._keys(message_id), args=[status, self.FLOOR_TTL_MS, self._ranks], client=pipe)
+                await pipe.execute()
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"Message cache status update of {len(statuses)} messages failed: {str(e)}")
+
+    async def close(self) -> None:
+        await self.connection.aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(super().stats(), backend="redis", errors=self.errors)
+
+def create_message_cache(settings: Settings, ranks: Dict[str, int]) -> Optional[MessageCache]:
+    """Build the cache selected by MESSAGE_CACHE, or None when it is off"""
+    kind = settings.MESSAGE_CACHE.lower()
+    if kind == "none":
+        return None
+    if kind == "local":
+        return LocalMessageCache(settings.MESSAGE_CACHE_SIZE, settings.MESSAGE_CACHE_TTL, ranks)
+    if kind == "redis":
+        return RedisMessageCache(settings.MESSAGE_CACHE_REDIS_URL, settings.MESSAGE_CACHE_TTL, ranks)
+    raise ValueError(f"Unsupported message cache: {settings.MESSAGE_CACHE}")
@@ -0,0 +1,189 @@
+from typing import Dict, List, Optional, Any, Set
+import asyncio
+import itertools
+import websockets
+from time import perf_counter
+from websockets.exceptions import ConnectionClosed
+from ..core import codec
+from ..core.config import Settings, get_settings
+from ..core.logging_config import get_logger
+from ..core.metrics import middleware_send_duration
+
+logger = get_logger(__name__)
+
+class MiddlewareBusyError(Exception):
+    """Raised when no send slot frees up within the acquire timeout"""
+    pass
+
+class MiddlewareClient:
+    """Long-lived pool of WebSocket connections to the WhatsApp middleware.
+
+    Sends are pipelined over a few persistent connections and matched to the
+    middleware's ``{"type": "ack", "id": ...}`` frames by message id. The
+    number of unacknowledged sends is capped; callers wait for a free slot
+    (backpressure) and get ``MiddlewareBusyError`` if none frees up in time.
+    When a connection drops, sends still waiting for an ack on it fail with
+    ``ConnectionError`` straight away; they are not resent, since the
+    middleware may have processed them.
+    """
+
+    def __init__(self, settings: Settings):
+        self.url = settings.MIDDLEWARE_WS_URL
+        self.pool_size = max(1, settings.MIDDLEWARE_POOL_SIZE)
+        self.max_in_flight = settings.MIDDLEWARE_MAX_IN_FLIGHT
+        self.ack_timeout = settings.MIDDLEWARE_ACK_TIMEOUT
+        self.acquire_timeout = settings.MIDDLEWARE_ACQUIRE_TIMEOUT
+        self.reconnect_delay = settings.MIDDLEWARE_RECONNECT_DELAY
+        self.max_reconnect_delay = settings.MIDDLEWARE_MAX_RECONNECT_DELAY
+
+        self._connections: List[Optional[Any]] = [None] * self.pool_size
+        self._tasks: List[asyncio.Task] = []
+        self._pending: Dict[str, asyncio.Future] = {}
+        # Ids awaiting an ack, per connection they were written to
+        self._unacked: List[Set[str]] = [set() for _ in range(self.pool_size)]
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._ready: Optional[asyncio.Event] = None
+        self._round_robin = itertools.count()
+        self._closing = False
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._pending)
+
+    @property
+    def started(self) -> bool:
+        return bool(self._tasks)
+
+    async def start(self):
+        """Open the connection pool. Reconnection is handled in the background."""
+        if self.started:
+            return
+        self._closing = False
+        self._slots = asyncio.Semaphore(self.max_in_flight)
+        self._ready = asyncio.Event()
+        self._tasks = [
+            asyncio.create_task(self._run_connection(index))
+            for index in range(self.pool_size)
+        ]
+        logger.info(f"Middleware client started with {self.pool_size} connections to {self.url}")
+
+    async def close(self):
+        self._closing = True
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+        self._connections = [None] * self.pool_size
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(ConnectionError("Middleware client closed"))
+        self._pending.clear()
+        logger.info("Middleware client closed")
+
+    async def send(self, message_id: str, payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Send a payload and wait for its ack.
+
+        Returns the ack frame, or None if the middleware did not ack within
+        ``ack_timeout``. Raises ConnectionError if the connection the payload
+        went out on closes before the ack.
+        """
+        if not self.started:
+            await self.start()
+
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=self.acquire_timeout)
+        except asyncio.TimeoutError:
+            raise MiddlewareBusyError(
+                f"Middleware send pool saturated ({self.max_in_flight} in flight)"
+            )
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending[message_id] = future
+        start = perf_counter()
+        outcome = "error"
+        index = None
+        try:
+            index, websocket = await self._acquire_connection()
+            self._unacked[index].add(message_id)
+            await websocket.send(codec.dumps(payload))
+            ack = await asyncio.wait_for(asyncio.shield(future), timeout=self.ack_timeout)
+            outcome = "failed" if isinstance(ack, dict) and ack.get("status") == "failed" else "acked"
+            return ack
+        except asyncio.TimeoutError:
+            outcome = "timeout"
+            logger.warning(f"No middleware ack for message {message_id} after {self.ack_timeout}s")
+            return None
+        finally:
+            middleware_send_duration.observe(perf_counter() - start, outcome)
+            self._pending.pop(message_id, None)
+            if index is not None:
+                self._unacked[index].discard(message_id)
+            self._slots.release()
+
+    async def _acquire_connection(self):
+        """Pick an open connection round-robin, waiting for a reconnect if none is up"""
+        while True:
+            start = next(self._round_robin)
+            for offset in range(self.pool_size):
+                index = (start + offset) % self.pool_size
+                websocket = self._connections[index]
+                if websocket is not None and websocket.open:
+                    return index, websocket
+            self._ready.clear()
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout=self.acquire_timeout)
+            except asyncio.TimeoutError:
+                raise ConnectionError(f"No middleware connection available at {self.url}")
+
+    async def _run_connection(self, index: int):
+        delay = self.reconnect_delay
+        while not self._closing:
+            try:
+                async with websockets.connect(self.url) as websocket:
+                    self._connections[index] = websocket
+                    self._ready.set()
+                    delay = self.reconnect_delay
+                    logger.info(f"Middleware connection {index} established")
+                    async for frame in websocket:
+                        self._handle_frame(frame)
+            except asyncio.CancelledError:
+                raise
+            except (ConnectionClosed, OSError) as e:
+                logger.warning(f"Middleware connection {index} lost: {str(e)}")
+            except Exception as e:
+                logger.error(f"Middleware connection {index} error: {str(e)}", exc_info=True)
+            finally:
+                self._connections[index] = None
+                self._fail_unacked(index)
+
+            if self._closing:
+                break
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_reconnect_delay)
+
+    def _fail_unacked(self, index: int):
+        unacked, self._unacked[index] = self._unacked[index], set()
+        for message_id in unacked:
+            future = self._pending.get(message_id)
+            if future is not None and not future.done():
+                future.set_exception(ConnectionError(f"Middleware connection {index} closed before the ack"))
+
+    def _handle_frame(self, frame):
+        try:
+            data = codec.loads(frame)
+        except (TypeError, ValueError):
+            logger.debug("Ignoring non-JSON frame from middleware")
+            return
+        if not isinstance(data, dict) or data.get("type") != "ack":
+            return
+
+        future = self._pending.get(str(data.get("id")))
+        if future is not None and not future.done():
+            future.set_result(data)
+
+# Create a singleton instance
+middleware_client = MiddlewareClient(get_settings())
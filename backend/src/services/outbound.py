@@ -0,0 +1,136 @@
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Set, Tuple
+from collections import deque
+import asyncio
+import logging
+from ..core.codec import EncodedMessage
+
+logger = logging.getLogger(__name__)
+
+# Slow-consumer policies applied when a connection's buffer is full
+DROP_OLDEST = "drop_oldest"
+DROP_NEWEST = "drop_newest"
+DISCONNECT = "disconnect"
+POLICIES = (DROP_OLDEST, DROP_NEWEST, DISCONNECT)
+
+# Overflow callbacks still running; held here so they are not collected mid-flight
+_overflow_tasks: Set[asyncio.Task] = set()
+
+def _overflow_done(task: asyncio.Task):
+    _overflow_tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.error(f"Slow-consumer disconnect failed: {str(task.exception())}")
+
+class OutboundBuffer:
+    """Bounded send buffer with its own writer task for one WebSocket.
+
+    ``push`` never awaits the network: it enqueues and returns, applying the
+    overflow policy when the buffer is full. The writer drains the buffer in
+    order; if a send fails it hands the failed message to ``on_failed`` and
+    stops.
+    """
+
+    def __init__(
+        self,
+        client_id: str,
+        websocket,
+        max_size: int,
+        policy: str,
+        on_failed: Callable[[str, EncodedMessage], Awaitable[None]],
+        on_overflow: Callable[[str], Awaitable[None]]
+    ):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown slow-consumer policy: {policy}")
+        self.client_id = client_id
+        self.websocket = websocket
+        self.max_size = max(1, max_size)
+        self.policy = policy
+        self._on_failed = on_failed
+        self._on_overflow = on_overflow
+
+        self._loop = asyncio.get_running_loop()
+        self._queue: Deque[Tuple[float, EncodedMessage]] = deque()
+        self._wakeup = asyncio.Event()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self.closed = False
+
+        self.sent = 0
+        self.dropped = 0
+        self.last_send_lag = 0.0
+        self._task = asyncio.create_task(self._writer())
+
+    def push(self, message: EncodedMessage) -> bool:
+        """Queue a message for sending. Returns False if it was not queued."""
+        if self.closed:
+            return False
+        if len(self._queue) >= self.max_size:
+            self.dropped += 1
+            if self.policy == DROP_NEWEST:
+                return False
+            if self.policy == DROP_OLDEST:
+                self._queue.popleft()
+            else:
+                self.closed = True
+                logger.warning(f"Disconnecting slow consumer {self.client_id}: {len(self._queue)} messages queued")
+                task = asyncio.create_task(self._on_overflow(self.client_id))
+                _overflow_tasks.add(task)
+                task.add_done_callback(_overflow_done)
+                return False
+
+        self._queue.append((self._loop.time(), message))
+        self._idle.clear()
+        self._wakeup.set()
+        return True
+
+    async def _writer(self):
+        while True:
+            if not self._queue:
+                self._idle.set()
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            enqueued_at, message = self._queue.popleft()
+            try:
+                await self.websocket.send_text(message.text)
+            except Exception as e:
+                logger.error(f"WebSocket delivery failed for client {self.client_id}: {str(e)}")
+                self.closed = True
+                self._idle.set()
+                await self._on_failed(self.client_id, message)
+                return
+            self.sent += 1
+            self.last_send_lag = self._loop.time() - enqueued_at
+            logger.info(f"Message sent to client {self.client_id} via WebSocket")
+
+    def take_pending(self):
+        """Remove and return the messages that were never sent"""
+        pending = [message for _, message in self._queue]
+        self._queue.clear()
+        return pending
+
+    async def drain(self, timeout: Optional[float] = None):
+        """Wait until everything queued so far has been written"""
+        await asyncio.wait_for(self._idle.wait(), timeout=timeout)
+
+    async def close(self):
+        self.closed = True
+        if self._task is not asyncio.current_task():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._idle.set()
+
+    def stats(self) -> Dict[str, Any]:
+        oldest_age = self._loop.time() - self._queue[0][0] if self._queue else 0.0
+        return {
+            "queued": len(self._queue),
+            "max_size": self.max_size,
+            "policy": self.policy,
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "lag_seconds": round(oldest_age, 6),
+            "last_send_lag_seconds": round(self.last_send_lag, 6),
+        }
@@ -0,0 +1,72 @@
+from typing import Any, List, Optional, Tuple
+from datetime import datetime
+import base64
+from pydantic import BaseModel
+from sqlalchemy import Select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..models.message import Message
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+class InvalidCursorError(ValueError):
+    pass
+
+class Page(BaseModel):
+    items: List[Any]
+    next_cursor: Optional[str] = None  # pass as ``before`` for older rows
+    prev_cursor: Optional[str] = None  # pass as ``after`` for newer rows
+
+def encode_cursor(created_at: datetime, message_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{message_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, message_id = base64.urlsafe_b64decode(padded).decode().split("|")
+        return datetime.fromisoformat(created_at), int(message_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise InvalidCursorError(f"Invalid cursor: {cursor}") from e
+
+async def keyset_page(
+    db: AsyncSession,
+    query: Select,
+    limit: int = DEFAULT_PAGE_SIZE,
+    before: Optional[str] = None,
+    after: Optional[str] = None
+) -> Tuple[List[Message], Optional[str], Optional[str]]:
+    """Fetch one newest-first page of messages keyed on (created_at, id).
+
+    Every page is a bounded index range scan, whatever its depth. Returns the
+    rows plus the cursors for the next (older) and previous (newer) pages.
+    """
+    if before and after:
+        raise InvalidCursorError("Use either 'before' or 'after', not both")
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    key = tuple_(Message.created_at, Message.id)
+
+    if after:
+        # Walk forward from the cursor, then flip back to newest-first
+        query = query.where(key > tuple_(*decode_cursor(after)))
+        query = query.order_by(Message.created_at.asc(), Message.id.asc())
+    else:
+        if before:
+            query = query.where(key < tuple_(*decode_cursor(before)))
+        query = query.order_by(Message.created_at.desc(), Message.id.desc())
+
+    result = await db.execute(query.limit(limit + 1))
+    rows = list(result.scalars().all())
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if after:
+        rows.reverse()
+
+    if not rows:
+        return rows, None, None
+    # Going backwards there is always an older page (the cursor row itself)
+    older = has_more if not after else True
+    newer = bool(before) or (bool(after) and has_more)
+    next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id) if older else None
+    prev_cursor = encode_cursor(rows[0].created_at, rows[0].id) if newer else None
+    return rows, next_cursor, prev_cursor
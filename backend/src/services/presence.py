@@ -0,0 +1,265 @@
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+from datetime import datetime, UTC
+import asyncio
+import time
+from sqlalchemy import DateTime, String, bindparam, column, func, literal, or_, select
+from sqlalchemy.dialects.postgresql import ARRAY, insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..core.config import get_settings
+from ..core.database import AsyncSessionLocal
+from ..core.logging_config import get_logger
+from ..core.metrics import registry
+from ..models.session import Session
+
+logger = get_logger(__name__)
+
+ONLINE, AWAY, OFFLINE = 0, 1, 2
+STATES = ("online", "away", "offline")
+
+# (session id, user id, state name, last seen)
+SessionRow = Tuple[str, str, str, datetime]
+
+class _Entry:
+    # One per tracked client; __slots__ keeps it to a small fixed-size object
+    __slots__ = ("user_id", "state", "last_seen")
+
+    def __init__(self, user_id: str, state: int, last_seen: float):
+        self.user_id = user_id
+        self.state = state
+        self.last_seen = last_seen
+
+class _Shard:
+    __slots__ = ("entries", "dirty")
+
+    def __init__(self):
+        self.entries: Dict[str, _Entry] = {}
+        self.dirty: Set[str] = set()
+
+async def upsert_sessions(db: AsyncSession, rows: List[SessionRow]):
+    """One ``INSERT ... SELECT FROM unnest(...) ON CONFLICT DO UPDATE`` for every row.
+
+    A row only overwrites a stored session whose last activity is not newer,
+    so flushes from several workers cannot move a session back in time.
+    """
+    ids, user_ids, states, seen = (list(values) for values in zip(*rows))
+    incoming = func.unnest(
+        bindparam("ids", ids, type_=ARRAY(String)),
+        bindparam("user_ids", user_ids, type_=ARRAY(String)),
+        bindparam("states", states, type_=ARRAY(String)),
+        bindparam("seen", seen, type_=ARRAY(DateTime))
+    ).table_valued(
+        column("id", String), column("user_id", String), column("presence", String), column("last_activity", DateTime)
+    ).render_derived(name="incoming")
+    now = datetime.now(UTC).replace(tzinfo=None)
+    statement = pg_insert(Session).from_select(
+        ["id", "user_id", "presence", "connection_status", "last_activity", "created_at", "updated_at"],
+        select(
+            incoming.c.id,
+            incoming.c.user_id,
+            incoming.c.presence,
+            incoming.c.presence != STATES[OFFLINE],
+            incoming.c.last_activity,
+            literal(now, DateTime),
+            literal(now, DateTime)
+        )
+    )
+    statement = statement.on_conflict_do_update(
+        index_elements=[Session.id],
+        set_={
+            "user_id": statement.excluded.user_id,
+            "presence": statement.excluded.presence,
+            "connection_status": statement.excluded.connection_status,
+            "last_activity": statement.excluded.last_activity,
+            "updated_at": statement.excluded.updated_at,
+        },
+        where=or_(Session.last_activity.is_(None), Session.last_activity <= statement.excluded.last_activity)
+    )
+    await db.execute(statement)
+
+class PresenceRegistry:
+    """Online / away / offline state and last-seen time for every connected client.
+
+    Entries live in ``shards`` dicts keyed by session (client) id and sharded
+    by user id, so one user's sessions are found by scanning a single shard.
+    Activity only touches memory: a changed entry is marked dirty and every
+    ``flush_interval`` seconds all dirty entries are written with one bulk
+    upsert, after online clients idle for ``away_after`` seconds turn away.
+    Offline entries are dropped from memory once written.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], AsyncSession],
+        write_rows: Callable[[AsyncSession, List[SessionRow]], Awaitable[None]],
+        shards: int = 64,
+        flush_interval: float = 5.0,
+        away_after: float = 60.0
+    ):
+        self._session_factory = session_factory
+        self._write_rows = write_rows
+        self.shards = [_Shard() for _ in range(max(1, shards))]
+        self.flush_interval = flush_interval
+        self.away_after = away_after
+        self.counts = [0, 0, 0]
+        self._task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+        self.flushed = 0
+        self.flush_errors = 0
+
+    def _shard(self, user_id: str) -> _Shard:
+        return self.shards[hash(user_id) % len(self.shards)]
+
+    def _set(self, client_id: str, user_id: str, state: int):
+        shard = self._shard(user_id)
+        entry = shard.entries.get(client_id)
+        if entry is None:
+            shard.entries[client_id] = _Entry(user_id, state, time.time())
+            self.counts[state] += 1
+        else:
+            entry.last_seen = time.time()
+            if entry.state != state:
+                self.counts[entry.state] -= 1
+                self.counts[state] += 1
+                entry.state = state
+        shard.dirty.add(client_id)
+
+    def connect(self, client_id: str, user_id: str):
+        self._set(client_id, user_id, ONLINE)
+
+    def touch(self, client_id: str, user_id: str):
+        """Record activity; called for every frame, so it never does I/O"""
+        self._set(client_id, user_id, ONLINE)
+
+    def disconnect(self, client_id: str, user_id: str):
+        self._set(client_id, user_id, OFFLINE)
+
+    def get(self, client_id: str, user_id: str) -> Optional[Dict[str, object]]:
+        entry = self._shard(user_id).entries.get(client_id)
+        return self._describe(client_id, entry) if entry is not None else None
+
+    def active(self, user_id: Optional[str] = None, limit: int = 100) -> List[Dict[str, object]]:
+        """Online and away sessions, for one user or for everyone"""
+        shards = [self._shard(user_id)] if user_id is not None else self.shards
+        sessions = []
+        for shard in shards:
+            for client_id, entry in shard.entries.items():
+                if entry.state != OFFLINE and (user_id is None or entry.user_id == user_id):
+                    sessions.append(self._describe(client_id, entry))
+                    if len(sessions) >= limit:
+                        return sessions
+        return sessions
+
+    @staticmethod
+    def _describe(client_id: str, entry: _Entry) -> Dict[str, object]:
+        return {
+            "id": client_id,
+            "user_id": entry.user_id,
+            "status": STATES[entry.state],
+            "last_activity": datetime.fromtimestamp(entry.last_seen, UTC),
+        }
+
+    def sweep(self, now: Optional[float] = None):
+        """Mark online clients idle for ``away_after`` seconds as away"""
+        cutoff = (now or time.time()) - self.away_after
+        for shard in self.shards:
+            self._sweep_shard(shard, cutoff)
+
+    def _sweep_shard(self, shard: _Shard, cutoff: float):
+        for client_id, entry in shard.entries.items():
+            if entry.state == ONLINE and entry.last_seen < cutoff:
+                entry.state = AWAY
+                self.counts[ONLINE] -= 1
+                self.counts[AWAY] += 1
+                shard.dirty.add(client_id)
+
+    async def flush(self):
+        """Write every dirty entry in one statement"""
+        async with self._lock:
+            taken: List[Tuple[_Shard, Set[str]]] = []
+            rows: List[SessionRow] = []
+            for shard in self.shards:
+                if not shard.dirty:
+                    continue
+                dirty, shard.dirty = shard.dirty, set()
+                taken.append((shard, dirty))
+                for client_id in dirty:
+                    entry = shard.entries.get(client_id)
+                    if entry is not None:
+                        rows.append((
+                            client_id,
+                            entry.user_id,
+                            STATES[entry.state],
+                            datetime.fromtimestamp(entry.last_seen, UTC).replace(tzinfo=None)
+                        ))
+            if not rows:
+                return
+            try:
+                async with self._session_factory() as session:
+                    await self._write_rows(session, rows)
+                    await session.commit()
+            except Exception as e:
+                self.flush_errors += 1
+                logger.error(f"Presence flush of {len(rows)} sessions failed, will retry: {str(e)}")
+                for shard, dirty in taken:
+                    shard.dirty |= dirty
+                return
+            self.flushed += len(rows)
+            # Offline sessions are in the table now; stop holding them unless they came back
+            for shard, dirty in taken:
+                for client_id in dirty:
+                    entry = shard.entries.get(client_id)
+                    if entry is not None and entry.state == OFFLINE and client_id not in shard.dirty:
+                        del shard.entries[client_id]
+                        self.counts[OFFLINE] -= 1
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                # One shard at a time, so a large registry never stalls the loop for long
+                cutoff = time.time() - self.away_after
+                for shard in self.shards:
+                    self._sweep_shard(shard, cutoff)
+                    await asyncio.sleep(0)
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Presence flush loop error: {str(e)}")
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        """Stop the flush loop and write what is still dirty; called on shutdown"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "online": self.counts[ONLINE],
+            "away": self.counts[AWAY],
+            "offline": self.counts[OFFLINE],
+            "tracked": sum(len(shard.entries) for shard in self.shards),
+            "dirty": sum(len(shard.dirty) for shard in self.shards),
+            "flushed": self.flushed,
+            "flush_errors": self.flush_errors,
+        }
+
+settings = get_settings()
+
+presence = PresenceRegistry(
+    AsyncSessionLocal,
+    upsert_sessions,
+    shards=settings.PRESENCE_SHARDS,
+    flush_interval=settings.PRESENCE_FLUSH_INTERVAL,
+    away_after=settings.PRESENCE_AWAY_AFTER
+)
+
+registry.gauge("presence_online_sessions", "Sessions currently online", lambda: presence.counts[ONLINE])
+registry.gauge("presence_away_sessions", "Sessions connected but idle", lambda: presence.counts[AWAY])
@@ -0,0 +1,23 @@
+from typing import Any, Dict, List, Optional
+from .event_manager import EventManager, event_manager
+from .presence import PresenceRegistry, presence
+
+class SessionService:
+    """Session queries answered from the in-memory presence registry"""
+
+    def __init__(self, registry: Optional[PresenceRegistry] = None, events: Optional[EventManager] = None):
+        self.presence = registry or presence
+        self.events = events or event_manager
+
+    async def get_active_sessions(self, user_id: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        return self.presence.active(user_id, limit)
+
+    async def terminate_session(self, session_id: str) -> bool:
+        """Close the session's WebSocket; False if it is not connected here"""
+        if session_id not in self.events.active_connections:
+            return False
+        await self.events.cleanup_connection(session_id)
+        return True
+
+    async def get_session_statistics(self) -> Dict[str, int]:
+        return self.presence.stats()
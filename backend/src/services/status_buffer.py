@@ -0,0 +1,116 @@
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+import asyncio
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..core.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+class StatusBuffer:
+    """Coalesces status transitions in memory and writes them periodically.
+
+    Only the most advanced status per message id is kept (by ``ranks``), so a
+    message that goes sent -> delivered -> read between two flushes costs a
+    single row update. Flushes run every ``interval`` seconds once something
+    is buffered; a failed flush puts its updates back for the next one.
+    Ids the flush did not change (already further along, or unknown when
+    added by the bulk path, which does not check) are counted in ``skipped``.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], AsyncSession],
+        apply_updates: Callable[[AsyncSession, Dict[int, str]], Awaitable[List[int]]],
+        ranks: Dict[str, int],
+        interval: float
+    ):
+        self._session_factory = session_factory
+        self._apply_updates = apply_updates
+        self._ranks = ranks
+        self.interval = interval
+        self._pending: Dict[int, str] = {}
+        # Taken by a flush so reads still see its updates until they are committed
+        self._in_flight: Dict[int, str] = {}
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._flushes: Set[asyncio.Task] = set()
+        self._lock = asyncio.Lock()
+        self.buffered = 0
+        self.written = 0
+        self.skipped = 0
+
+    def _merge(self, target: Dict[int, str], message_id: int, status: str):
+        current = target.get(message_id)
+        if current is None or self._ranks[status] > self._ranks[current]:
+            target[message_id] = status
+
+    def add(self, message_id: int, status: str):
+        self._merge(self._pending, message_id, status)
+        self.buffered += 1
+        self._schedule()
+
+    def get(self, message_id: int) -> Optional[str]:
+        """Status not yet written for this message, if any"""
+        status = self._pending.get(message_id)
+        in_flight = self._in_flight.get(message_id)
+        if status is None or (in_flight is not None and self._ranks[in_flight] > self._ranks[status]):
+            return in_flight
+        return status
+
+    def apply(self, message_id: int, status: str) -> str:
+        """Return whichever of ``status`` and the buffered status is further along"""
+        buffered = self.get(message_id)
+        if buffered is not None and self._ranks[buffered] > self._ranks.get(status, -1):
+            return buffered
+        return status
+
+    def _start_flush(self):
+        self._timer = None
+        task = asyncio.create_task(self.flush())
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+
+    def _schedule(self):
+        if self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.interval, self._start_flush)
+
+    async def flush(self):
+        """Write everything buffered so far in one statement"""
+        async with self._lock:
+            if not self._pending:
+                return
+            self._in_flight, self._pending = self._pending, {}
+            try:
+                async with self._session_factory() as session:
+                    changed = await self._apply_updates(session, self._in_flight)
+                    await session.commit()
+                self.written += len(changed)
+                self.skipped += len(self._in_flight) - len(changed)
+                if len(changed) < len(self._in_flight):
+                    logger.debug(f"Status flush skipped {len(self._in_flight) - len(changed)} unknown or stale messages")
+            except Exception as e:
+                logger.error(f"Status flush of {len(self._in_flight)} messages failed, will retry: {str(e)}")
+                for message_id, status in self._in_flight.items():
+                    self._merge(self._pending, message_id, status)
+                self._schedule()
+            finally:
+                self._in_flight = {}
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "pending": len(self._pending),
+            "buffered": self.buffered,
+            "written": self.written,
+            "skipped": self.skipped,
+        }
+
+    async def close(self):
+        """Flush whatever is buffered; called on shutdown"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._flushes:
+            await asyncio.gather(*self._flushes, return_exceptions=True)
+        await self.flush()
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+            logger.error(f"{len(self._pending)} buffered status updates were not written")
@@ -0,0 +1,102 @@
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+import asyncio
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..core.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+class GroupCommitWriter:
+    """Coalesces single-row inserts from concurrent callers into one transaction.
+
+    Rows submitted within ``max_delay`` seconds (or until ``max_batch`` rows are
+    waiting) are written with one ``insert_rows`` call and one commit, and each
+    caller gets back its own result. If the group fails, its rows are retried
+    one savepoint at a time so a bad row only fails its own caller.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], AsyncSession],
+        insert_rows: Callable[[AsyncSession, List[Dict[str, Any]]], Awaitable[List[Any]]],
+        max_delay: float,
+        max_batch: int
+    ):
+        self._session_factory = session_factory
+        self._insert_rows = insert_rows
+        self.max_delay = max_delay
+        self.max_batch = max(1, max_batch)
+        self._pending: List[Tuple[Dict[str, Any], asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._flushes: Set[asyncio.Task] = set()
+
+    async def submit(self, row: Dict[str, Any]) -> Any:
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((row, future))
+        if len(self._pending) >= self.max_batch:
+            self._start_flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.max_delay, self._start_flush)
+        return await future
+
+    def _start_flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, []
+        task = asyncio.create_task(self._flush(batch))
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+
+    async def _flush(self, batch: List[Tuple[Dict[str, Any], asyncio.Future]]):
+        try:
+            async with self._session_factory() as session:
+                results = await self._insert_rows(session, [row for row, _ in batch])
+                await session.commit()
+        except Exception as e:
+            if len(batch) == 1:
+                self._resolve(batch[0][1], error=e)
+                return
+            logger.warning(f"Group commit of {len(batch)} rows failed, retrying individually: {str(e)}")
+            await self._flush_individually(batch)
+            return
+
+        for (_, future), result in zip(batch, results):
+            self._resolve(future, result)
+
+    async def _flush_individually(self, batch: List[Tuple[Dict[str, Any], asyncio.Future]]):
+        written: List[Tuple[asyncio.Future, Any]] = []
+        try:
+            async with self._session_factory() as session:
+                for row, future in batch:
+                    try:
+                        async with session.begin_nested():
+                            [result] = await self._insert_rows(session, [row])
+                        written.append((future, result))
+                    except Exception as e:
+                        self._resolve(future, error=e)
+                await session.commit()
+        except Exception as e:
+            for future, _ in written:
+                self._resolve(future, error=e)
+            return
+
+        for future, result in written:
+            self._resolve(future, result)
+
+    @staticmethod
+    def _resolve(future: asyncio.Future, result: Any = None, error: Optional[Exception] = None):
+        # The caller may have been cancelled while its row was in flight
+        if future.done():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    async def close(self):
+        """Write whatever is pending and wait for in-flight groups"""
+        self._start_flush()
+        if self._flushes:
+            await asyncio.gather(*self._flushes, return_exceptions=True)
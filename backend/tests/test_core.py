@@ -32,4 +32,214 @@ def test_token_auth(test_client, test_user_token):
     """Test JWT token authentication"""
     headers = {"Authorization": f"Bearer {test_user_token}"}  # Add Bearer prefix back
     response = test_client.get("/api/messages", headers=headers)
-    assert response.status_code in [200, 404]
\ No newline at end of file
+    assert response.status_code in [200, 404]
+
+def test_codec_round_trip_and_encode_once():
+    """Test the JSON codec and that EncodedMessage serializes a single time"""
+    from src.core import codec
+    message = {"content": "hola", "metadata": {"n": 1}}
+    encoded = codec.EncodedMessage(message)
+    assert codec.loads(encoded.text) == message
+    assert encoded.text is encoded.text
+    with pytest.raises(ValueError):
+        codec.loads("{not json")
+
+@pytest.mark.asyncio
+async def test_verified_token_cache(test_user_token):
+    """Test that verified tokens are served from the cache and bad or expired ones are not"""
+    import time
+    from src.core.auth import token_cache, verify_token
+    from src.core.token_cache import VerifiedTokenCache
+
+    token_cache.clear()
+    before = token_cache.stats()
+    assert (await verify_token(test_user_token))["sub"] == "testuser"
+    assert (await verify_token(test_user_token))["sub"] == "testuser"
+    assert token_cache.stats()["hits"] == before["hits"] + 1
+    assert await verify_token(test_user_token + "x") is None
+
+    cache = VerifiedTokenCache(max_size=1, ttl=300)
+    cache.put("expired", {"exp": time.time() - 1})
+    assert cache.get("expired") is None
+    cache.put("a", {"sub": "a"})
+    cache.put("b", {"sub": "b"})
+    assert cache.get("a") is None and cache.get("b") == {"sub": "b"}
+    assert cache.stats()["evictions"] == 1
+
+def test_asgi_middleware_headers_and_error_mapping():
+    """Test X-Request-ID/X-Process-Time on responses and JSON mapping of unhandled errors"""
+    import uuid
+    from fastapi import FastAPI
+    from src.core.middleware import ErrorHandlerMiddleware, RequestLoggingMiddleware
+
+    app = FastAPI()
+
+    @app.get("/ok")
+    async def ok():
+        return {"ok": True}
+
+    @app.get("/boom")
+    async def boom():
+        raise RuntimeError("boom")
+
+    app.add_middleware(ErrorHandlerMiddleware)
+    app.add_middleware(RequestLoggingMiddleware)
+    client = TestClient(app)
+
+    response = client.get("/ok")
+    assert response.json() == {"ok": True}
+    assert uuid.UUID(response.headers["X-Request-ID"]).version == 4
+    assert float(response.headers["X-Process-Time"]) >= 0
+
+    response = client.get("/boom")
+    assert response.status_code == 500
+    assert response.json() == {"error": "Internal server error"}
+    assert "X-Request-ID" in response.headers
+
+def test_metrics_registry_and_endpoint(test_client, test_api_key):
+    """Test histogram/counter exposition and the /api/metrics endpoint"""
+    from src.core.metrics import MetricsRegistry
+
+    registry = MetricsRegistry()
+    latency = registry.histogram("test_latency_seconds", "Test latency", ("route",), buckets=(0.1, 1.0))
+    errors = registry.counter("test_errors_total", "Test errors", ("reason",))
+    registry.gauge("test_depth", "Test depth", lambda: 7)
+    latency.observe(0.05, "/a")
+    latency.observe(0.5, "/a")
+    errors.inc(2, "timeout")
+
+    text = registry.render()
+    assert 'test_latency_seconds_bucket{route="/a",le="0.1"} 1' in text
+    assert 'test_latency_seconds_bucket{route="/a",le="+Inf"} 2' in text
+    assert 'test_latency_seconds_count{route="/a"} 2' in text
+    assert 'test_errors_total{reason="timeout"} 2' in text
+    assert "test_depth 7" in text
+
+    headers = {"X-API-Key": test_api_key}
+    test_client.get("/api/health")
+    response = test_client.get("/api/metrics", headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'http_request_duration_seconds_count{method="GET",route="/api/health",status="200"}' in response.text
+    assert "# TYPE event_queue_depth gauge" in response.text
+    assert "websocket_active_connections" in response.text
+
+def test_setup_logging_writes_through_queue(tmp_path):
+    """Test that handlers run behind the queue listener and overflow is counted, not blocking"""
+    import logging
+    import queue
+    from src.core.logging_config import DroppingQueueHandler, logging_stats, setup_logging, shutdown_logging
+
+    log_file = tmp_path / "logs" / "app.log"
+    config_path = tmp_path / "logging.yaml"
+    config_path.write_text(
+        "version: 1\n"
+        "disable_existing_loggers: false\n"
+        "queue:\n  max_size: 100\n"
+        "handlers:\n"
+        f"  file:\n    class: logging.FileHandler\n    filename: {log_file}\n    level: INFO\n"
+        "loggers:\n"
+        "  queued_test:\n    handlers: [file]\n    level: INFO\n    propagate: false\n"
+    )
+    try:
+        setup_logging(config_path)
+        logger = logging.getLogger("queued_test")
+        assert all(isinstance(handler, DroppingQueueHandler) for handler in logger.handlers)
+        logger.info("through the queue")
+        logger.debug("below the level")
+        assert logging_stats()["max_size"] == 100
+    finally:
+        shutdown_logging()
+    assert log_file.read_text() == "through the queue\n"
+
+    handler = DroppingQueueHandler(queue.Queue(maxsize=1), route=0)
+    for n in range(3):
+        handler.handle(logging.makeLogRecord({"msg": f"record {n}", "levelno": logging.INFO}))
+    assert handler.dropped == 2
+
+def test_sampling_filter_samples_rate_limits_and_summarizes():
+    """Test 1-in-N sampling, token-bucket limiting and suppressed-line summaries"""
+    import logging
+    from src.core.log_sampling import SamplingFilter
+
+    class ListHandler(logging.Handler):
+        def __init__(self):
+            super().__init__()
+            self.messages = []
+
+        def emit(self, record):
+            self.messages.append(record.getMessage())
+
+    logger = logging.getLogger("sampling_test")
+    logger.propagate = False
+    level = logger.level
+    logger.setLevel(logging.INFO)
+    handler = ListHandler()
+    logger.addHandler(handler)
+    try:
+        sampler = SamplingFilter(sample_rate=10, summary_interval=3600)
+        logger.addFilter(sampler)
+        for n in range(100):
+            logger.info(f"delivered {n}")
+        logger.warning("always kept")
+        assert handler.messages[:2] == ["delivered 0", "delivered 10"]
+        assert len(handler.messages) == 11 and sampler.suppressed == 90
+
+        sampler.flush()
+        assert handler.messages[-1].startswith("Suppressed 90 similar messages")
+
+        logger.removeFilter(sampler)
+        handler.messages.clear()
+        limiter = SamplingFilter(rate=0.001, burst=2, summary_interval=0)
+        logger.addFilter(limiter)
+        for n in range(5):
+            logger.info(f"limited {n}")
+        assert handler.messages[:2] == ["limited 0", "limited 1"]
+        assert all(message.startswith("Suppressed 1 similar") for message in handler.messages[2:])
+        logger.removeFilter(limiter)
+    finally:
+        logger.removeHandler(handler)
+        logger.setLevel(level)
+
+def test_sampling_summaries_are_emitted_after_a_burst_stops():
+    """Test that the logging listener reports suppressed lines without waiting for the call site to log again"""
+    import logging
+    import queue
+    import time
+    from src.core.log_sampling import SamplingFilter
+    from src.core.logging_config import DroppingQueueHandler, RoutingQueueListener
+
+    class ListHandler(logging.Handler):
+        def __init__(self):
+            super().__init__()
+            self.messages = []
+
+        def emit(self, record):
+            self.messages.append(record.getMessage())
+
+    logger = logging.getLogger("sampling_burst_test")
+    logger.propagate = False
+    level = logger.level
+    logger.setLevel(logging.INFO)
+    handler = ListHandler()
+    log_queue = queue.Queue()
+    queue_handler = DroppingQueueHandler(log_queue, 0)
+    logger.addHandler(queue_handler)
+    listener = RoutingQueueListener(log_queue, [(handler,)])
+    listener.summary_check_interval = 0.02
+    sampler = SamplingFilter(sample_rate=10, summary_interval=0.05)
+    logger.addFilter(sampler)
+    listener.start()
+    try:
+        for n in range(20):
+            logger.info(f"burst {n}")
+        deadline = time.monotonic() + 2
+        while time.monotonic() < deadline and not any(m.startswith("Suppressed") for m in handler.messages):
+            time.sleep(0.01)
+        assert handler.messages[:2] == ["burst 0", "burst 10"]
+        assert handler.messages[-1].startswith("Suppressed 18 similar messages")
+    finally:
+        listener.stop()
+        logger.removeFilter(sampler)
+        logger.removeHandler(queue_handler)
+        logger.setLevel(level)
@@ -3,7 +3,17 @@ import pytest_asyncio
 from fastapi.testclient import TestClient
 from datetime import datetime
 from src.main import app
-from src.services.message import MessageService
+from src.services.message import (
+    STATUS_RANKS, MessageService, apply_status_updates, build_message_row, insert_message_rows
+)
+from src.services.conversation_tail import ConversationTailCache
+from src.services.message_cache import LocalMessageCache, RedisMessageCache
+from src.services.status_buffer import StatusBuffer
+from src.core import codec
+from src.services.write_coalescer import GroupCommitWriter
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+import asyncio
+import uuid
 from src.core.database import get_db
 
 # Remove any test_token fixture definition here if it exists
@@ -112,6 +122,222 @@ def test_get_messages_with_api_key(test_client, test_api_key, clean_db):
     messages = response.json()
     assert isinstance(messages, list)
 
+def test_get_conversation_pagination(test_client, test_token):
+    """Test paging through a conversation with opaque cursors"""
+    headers = {"Authorization": f"Bearer {test_token}"}
+    receiver_id = f"paged_{datetime.now().timestamp()}"
+    created = [
+        test_client.post(
+            "/api/messages",
+            json={"content": f"Page message {n}", "receiver_id": receiver_id},
+            headers=headers
+        ).json()["id"]
+        for n in range(3)
+    ]
+
+    first = test_client.get(f"/api/conversations/{receiver_id}?limit=2", headers=headers)
+    assert first.status_code == 200
+    assert [m["id"] for m in first.json()] == created[:0:-1]
+    cursor = first.headers["X-Next-Cursor"]
+
+    second = test_client.get(f"/api/conversations/{receiver_id}?limit=2&before={cursor}", headers=headers)
+    assert [m["id"] for m in second.json()] == created[:1]
+    assert "X-Next-Cursor" not in second.headers
+
+    newer = test_client.get(
+        f"/api/conversations/{receiver_id}?limit=2&after={second.headers['X-Prev-Cursor']}",
+        headers=headers
+    )
+    assert [m["id"] for m in newer.json()] == created[:0:-1]
+
+    bad = test_client.get(f"/api/conversations/{receiver_id}?before=not-a-cursor", headers=headers)
+    assert bad.status_code == 400
+
+def test_send_message_batch(test_client, test_token):
+    """Test creating several messages in one request"""
+    headers = {"Authorization": f"Bearer {test_token}"}
+    batch = {"messages": [
+        {"content": f"Batch message {n}", "receiver_id": f"batch_receiver_{n}"}
+        for n in range(3)
+    ]}
+
+    response = test_client.post("/api/messages/batch", json=batch, headers=headers)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["count"] == 3
+    assert data["ids"] == sorted(data["ids"])
+
+    last = test_client.get(f"/api/messages/{data['ids'][-1]}", headers=headers).json()
+    assert last["content"] == "Batch message 2"
+    assert last["receiver_id"] == "batch_receiver_2"
+
+@pytest.mark.asyncio
+async def test_group_commit_isolates_bad_rows(db_engine):
+    """Test that concurrent inserts share a commit and a bad row only fails its caller"""
+    session_maker = async_sessionmaker(db_engine, class_=AsyncSession, expire_on_commit=False)
+    writer = GroupCommitWriter(session_maker, insert_message_rows, max_delay=0.01, max_batch=10)
+    rows = [build_message_row(f"Grouped {n}", "test_user", "group_receiver") for n in range(4)]
+    rows[2]["created_at"] = "not a timestamp"
+
+    results = await asyncio.gather(*(writer.submit(row) for row in rows), return_exceptions=True)
+
+    assert isinstance(results[2], Exception)
+    ids = [result[0] for n, result in enumerate(results) if n != 2]
+    assert len(set(ids)) == 3
+    await writer.close()
+
+def test_bulk_status_updates_are_forward_only(test_client, test_token):
+    """Test bulk receipts and that a late 'delivered' never overwrites 'read'"""
+    headers = {"Authorization": f"Bearer {test_token}"}
+    batch = {"messages": [{"content": f"Receipt {n}", "receiver_id": "receipt_receiver"} for n in range(2)]}
+    first, second = test_client.post("/api/messages/batch", json=batch, headers=headers).json()["ids"]
+
+    response = test_client.put("/api/messages/status", json={"updates": [
+        {"id": first, "status": "read"},
+        {"id": second, "status": "delivered"},
+    ]}, headers=headers)
+    assert response.status_code == 200
+    assert sorted(response.json()["ids"]) == sorted([first, second])
+
+    late = test_client.put("/api/messages/status", json={"updates": [{"id": first, "status": "delivered"}]}, headers=headers)
+    assert late.json()["updated"] == 0
+    assert test_client.get(f"/api/messages/{first}", headers=headers).json()["status"] == "read"
+
+    single = test_client.put(f"/api/messages/{first}/status?status=delivered", headers=headers)
+    assert single.status_code == 200
+    assert test_client.get(f"/api/messages/{first}", headers=headers).json()["status"] == "read"
+
+@pytest.mark.asyncio
+async def test_status_buffer_coalesces_transitions(db_engine, test_db):
+    """Test that sent -> delivered -> read costs one write and reads see it before the flush"""
+    session_maker = async_sessionmaker(db_engine, class_=AsyncSession, expire_on_commit=False)
+    buffer = StatusBuffer(session_maker, apply_status_updates, STATUS_RANKS, interval=60)
+    service = MessageService(test_db, statuses=buffer)
+    message = await service.create_message("Buffered receipt", "test_user", "buffer_receiver")
+
+    for status in ("delivered", "read", "delivered"):
+        assert await service.update_message_status(message.id, status)
+    # Unknown ids are still refused, so the endpoint can answer 404
+    assert await service.update_message_status(-1, "read") is False
+
+    assert (await service.get_message(message.id)).status == "read"
+    assert buffer.stats()["pending"] == 1
+
+    await buffer.close()
+    assert buffer.stats() == {"pending": 0, "buffered": 3, "written": 1, "skipped": 0}
+    stored = await MessageService(test_db).get_message(message.id)
+    assert stored.status == "read"
+
+@pytest.mark.asyncio
+async def test_message_cache_serves_hits_and_follows_status_changes(test_db):
+    """Test that cached reads skip the database and status changes, even mid-load, reach the cache"""
+    cache = LocalMessageCache(2, 60, STATUS_RANKS)
+    service = MessageService(test_db, cache=cache)
+    message = await service.create_message("Cached", "test_user", "cache_receiver", metadata={"k": "v"})
+    assert await service.update_message_status(message.id, "delivered")
+
+    # No session at all: a hit must not need one
+    cached = await MessageService(None, cache=cache).get_message(message.id)
+    assert cached.status == "delivered" and cached.metadata == {}
+
+    uncached = (await MessageService(test_db).create_messages([{"content": "Later", "receiver_id": "cache_receiver"}], "test_user"))[0]
+
+    async def load_racing_a_receipt(message_id):
+        loaded = await service._load_message(message_id)
+        await service.update_message_statuses([(message_id, "read")])
+        return loaded
+
+    body = await cache.get_or_load(uncached.id, load_racing_a_receipt)
+    assert codec.loads(body)["status"] == "read"
+    assert codec.loads(await service.get_message_json(uncached.id))["status"] == "read"
+
+    await service.create_message("Evicts the first", "test_user", "cache_receiver")
+    assert cache.stats() == {"hits": 2, "misses": 1, "backend": "local", "size": 2, "evictions": 1}
+
+@pytest.mark.asyncio
+async def test_redis_message_cache_is_shared_and_forward_only(test_db):
+    """Test that two workers' caches over Redis see each other's writes and never regress a status"""
+    prefix = f"test-message-{uuid.uuid4().hex}"
+    first = RedisMessageCache("redis://localhost:6379/0", 60, STATUS_RANKS, prefix=prefix)
+    second = RedisMessageCache("redis://localhost:6379/0", 60, STATUS_RANKS, prefix=prefix)
+    try:
+        await first.connection.ping()
+    except Exception:
+        pytest.skip("Redis is not available")
+    try:
+        message = await MessageService(test_db, cache=first).create_message("Shared", "test_user", "redis_receiver")
+        await MessageService(test_db, cache=second).update_message_statuses([(message.id, "read")])
+        await first.update_statuses({message.id: "delivered"})
+        assert codec.loads(await first.get(message.id))["status"] == "read"
+
+        async def load_racing_a_receipt(message_id):
+            loaded = dict(message.dict(), id=message_id)
+            await second.update_statuses({message_id: "delivered"})
+            return loaded
+
+        body = await first.get_or_load(-message.id, load_racing_a_receipt)
+        assert codec.loads(body)["status"] == "delivered"
+        assert await second.get(-message.id) == body
+    finally:
+        keys = await first.connection.keys(f"{prefix}:*")
+        if keys:
+            await first.connection.delete(*keys)
+        await first.close()
+        await second.close()
+
+@pytest.mark.asyncio
+async def test_conversation_tail_serves_first_pages_from_memory(test_db):
+    """Test that first pages come from the tail once loaded, deeper pages from the database"""
+    tails = ConversationTailCache(3, 1024 * 1024, 60, STATUS_RANKS)
+    service = MessageService(test_db, tails=tails)
+    receiver_id = f"tail_{uuid.uuid4().hex}"
+    created = [(await service.create_message(f"Tail {n}", "test_user", receiver_id)).id for n in range(3)]
+
+    first = await service.get_conversation("test_user", receiver_id, limit=2)
+    assert [m.id for m in first.items] == created[:0:-1]
+    assert tails.stats()["misses"] == 1
+
+    newest = await service.create_message("Tail 3", "test_user", receiver_id)
+    await service.update_message_statuses([(created[2], "read")])
+    # No session: served from memory
+    cached = await MessageService(None, tails=tails).get_conversation(receiver_id, "test_user", limit=3)
+    assert [m.id for m in cached.items] == [newest.id, created[2], created[1]]
+    assert cached.items[1].status == "read"
+
+    older = await service.get_conversation("test_user", receiver_id, limit=3, before=cached.next_cursor)
+    assert [m.id for m in older.items] == [created[0]]
+    assert older.next_cursor is None
+    assert tails.stats()["messages"] == 3
+
+@pytest.mark.asyncio
+async def test_conversation_tails_follow_writes_from_other_workers(test_db, tmp_path):
+    """Test that a message created on one worker reaches another worker's tail, and a lost envelope clears it"""
+    from src.services.event_bus import UnixSocketBus
+    from src.services.event_manager import EventManager
+    from src.services.message import share_tails
+
+    first, second = EventManager(), EventManager()
+    await first.attach_bus(UnixSocketBus(str(tmp_path), "worker-1"))
+    await second.attach_bus(UnixSocketBus(str(tmp_path), "worker-2"))
+    remote = ConversationTailCache(50, 1024 * 1024, 60, STATUS_RANKS)
+    share_tails(remote, second)
+    receiver_id = f"tail_{uuid.uuid4().hex}"
+    try:
+        assert (await MessageService(test_db, tails=remote).get_conversation("test_user", receiver_id)).items == []
+
+        writer = MessageService(test_db, tails=ConversationTailCache(50, 1024 * 1024, 60, STATUS_RANKS), events=first)
+        created = await writer.create_message("From worker 1", "test_user", receiver_id)
+        await writer.update_message_statuses([(created.id, "read")])
+        await asyncio.sleep(0.05)
+        page = await MessageService(None, tails=remote).get_conversation(receiver_id, "test_user")
+        assert [(m.id, m.status) for m in page.items] == [(created.id, "read")]
+
+        second._check_seq("worker-1", second._peer_seqs["worker-1"] + 2)
+        assert remote.stats()["conversations"] == 0
+    finally:
+        await first.close_all_connections()
+        await second.close_all_connections()
+
 @pytest.fixture
 def message_service(test_db):
     """Fixture for MessageService instance"""
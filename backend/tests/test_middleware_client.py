@@ -0,0 +1,86 @@
+import pytest
+import asyncio
+import json
+import websockets
+from src.core.config import Settings
+from src.services.middleware_client import MiddlewareClient, MiddlewareBusyError
+
+async def _ack_handler(websocket, path=None):
+    async for frame in websocket:
+        data = json.loads(frame)
+        await websocket.send(json.dumps({"type": "ack", "id": data["metadata"]["id"], "status": "sent"}))
+
+async def _silent_handler(websocket, path=None):
+    async for _ in websocket:
+        pass
+
+async def _start_server(handler):
+    server = await websockets.serve(handler, "127.0.0.1", 0)
+    port = next(iter(server.sockets)).getsockname()[1]
+    return server, f"ws://127.0.0.1:{port}/ws"
+
+def _client(url: str, **overrides) -> MiddlewareClient:
+    return MiddlewareClient(Settings(MIDDLEWARE_WS_URL=url, **overrides))
+
+@pytest.mark.asyncio
+async def test_concurrent_sends_matched_by_id():
+    """Test that pipelined sends each get their own ack"""
+    server, url = await _start_server(_ack_handler)
+    client = _client(url, MIDDLEWARE_POOL_SIZE=2)
+    try:
+        acks = await asyncio.gather(*(
+            client.send(str(i), {"content": "hi", "metadata": {"id": str(i)}})
+            for i in range(50)
+        ))
+        assert [ack["id"] for ack in acks] == [str(i) for i in range(50)]
+        assert client.in_flight == 0
+    finally:
+        await client.close()
+        server.close()
+        await server.wait_closed()
+
+@pytest.mark.asyncio
+async def test_missing_ack_times_out():
+    """Test that a send without an ack returns None after the ack timeout"""
+    server, url = await _start_server(_silent_handler)
+    client = _client(url, MIDDLEWARE_ACK_TIMEOUT=0.1)
+    try:
+        assert await client.send("1", {"metadata": {"id": "1"}}) is None
+    finally:
+        await client.close()
+        server.close()
+        await server.wait_closed()
+
+@pytest.mark.asyncio
+async def test_saturated_pool_applies_backpressure():
+    """Test that senders are rejected once max in-flight is reached"""
+    server, url = await _start_server(_silent_handler)
+    client = _client(url, MIDDLEWARE_MAX_IN_FLIGHT=1, MIDDLEWARE_ACK_TIMEOUT=1.0, MIDDLEWARE_ACQUIRE_TIMEOUT=0.05)
+    try:
+        first = asyncio.create_task(client.send("1", {"metadata": {"id": "1"}}))
+        await asyncio.sleep(0.05)
+        with pytest.raises(MiddlewareBusyError):
+            await client.send("2", {"metadata": {"id": "2"}})
+        first.cancel()
+    finally:
+        await client.close()
+        server.close()
+        await server.wait_closed()
+
+async def _closing_handler(websocket, path=None):
+    async for _ in websocket:
+        await websocket.close()
+
+@pytest.mark.asyncio
+async def test_dropped_connection_fails_unacked_sends():
+    """Test that sends waiting on a connection that drops fail at once instead of timing out"""
+    server, url = await _start_server(_closing_handler)
+    client = _client(url, MIDDLEWARE_POOL_SIZE=1, MIDDLEWARE_ACK_TIMEOUT=5.0)
+    try:
+        with pytest.raises(ConnectionError):
+            await asyncio.wait_for(client.send("1", {"metadata": {"id": "1"}}), timeout=1)
+        assert client.in_flight == 0
+    finally:
+        await client.close()
+        server.close()
+        await server.wait_closed()
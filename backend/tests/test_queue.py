@@ -0,0 +1,219 @@
+import asyncio
+import uuid
+import pytest
+from src.core.config import Settings
+from src.core.queue import PublishBatcher, RabbitMQQueue, RedisQueue
+
+async def _redis_queue(**overrides) -> RedisQueue:
+    queue = RedisQueue(Settings(**overrides))
+    try:
+        await queue.connect()
+        await queue.connection.ping()
+    except Exception:
+        pytest.skip("Redis is not available")
+    return queue
+
+async def _rabbitmq_queue(**overrides) -> RabbitMQQueue:
+    queue = RabbitMQQueue(Settings(**overrides))
+    try:
+        await asyncio.wait_for(queue.connect(), 5)
+    except Exception:
+        pytest.skip("RabbitMQ is not available")
+    return queue
+
+@pytest.mark.asyncio
+async def test_publish_batcher_groups_concurrent_publishes():
+    """Test that concurrent publishes go out in one batch and all wait for it"""
+    batches = []
+
+    async def send_batch(entries):
+        batches.append(entries)
+
+    batcher = PublishBatcher(send_batch, max_batch=100, max_delay=0.01)
+    await asyncio.gather(*(batcher.publish("events", f"{n}".encode()) for n in range(5)))
+    assert len(batches) == 1 and [payload for _, payload in batches[0]] == [b"0", b"1", b"2", b"3", b"4"]
+    await batcher.close()
+
+@pytest.mark.asyncio
+async def test_redis_queue_acks_after_callback_and_recovers_pending():
+    """Test consumer-group delivery, ack-after-success, and pickup of unacked entries after a restart"""
+    queue = await _redis_queue(QUEUE_CLAIM_IDLE_MS=100, QUEUE_BLOCK_MS=50)
+    stream = f"test-stream-{uuid.uuid4().hex}"
+    try:
+        await queue._ensure_group(stream)
+        await queue.publish_many(stream, [{"n": n} for n in range(3)])
+        # A previous run of this worker read entry 0 and died before acking it
+        await queue.connection.xreadgroup(queue.group, queue.consumer, {stream: ">"}, count=1)
+
+        received = []
+        failed = set()
+
+        async def callback(message):
+            if message["n"] == 2 and 2 not in failed:
+                failed.add(2)
+                raise RuntimeError("transient")
+            received.append(message["n"])
+
+        await queue.subscribe(stream, callback)
+        await queue.publish(stream, {"n": 3})
+        for _ in range(100):
+            if len(received) == 4:
+                break
+            await asyncio.sleep(0.05)
+
+        assert sorted(received) == [0, 1, 2, 3]
+        assert received[0] == 0
+        assert (await queue.connection.xpending(stream, queue.group))["pending"] == 0
+    finally:
+        await queue.connection.delete(stream)
+        await queue.disconnect()
+
+@pytest.mark.asyncio
+async def test_queue_event_bus_groups_skip_history_and_are_destroyed():
+    """Test that each worker's bus group starts at the end of the stream and is removed on close or by peers"""
+    from src.services.event_bus import create_event_bus
+
+    queue = await _redis_queue()
+    topic = f"test-bus-{uuid.uuid4().hex}"
+    await queue.publish_many(topic, [{"kind": "old", "origin": "gone", "sent_at": 0}])
+
+    def bus(worker_id: str):
+        return create_event_bus(Settings(
+            EVENT_BUS="queue", EVENT_BUS_TOPIC=topic, EVENT_BUS_WORKER_ID=worker_id, EVENT_BUS_MAX_LEN=50,
+            QUEUE_CONSUMER_GROUP="test-bus", QUEUE_BLOCK_MS=50
+        ))
+
+    first, second, crashed = bus("w1"), bus("w2"), bus("w3")
+    received = []
+    try:
+        await first.start(lambda envelope: None)
+        await second.start(received.append)
+        await crashed.start(lambda envelope: None)
+        for n in range(100):
+            await first.publish({"kind": "event", "n": n})
+        for _ in range(100):
+            if len(received) == 100:
+                break
+            await asyncio.sleep(0.05)
+
+        assert [envelope["n"] for envelope in received] == list(range(100))
+        assert await queue.connection.xlen(topic) < 100
+
+        await second.close()
+        await first.forget("w3")
+        groups = {group["name"] for group in await queue.connection.xinfo_groups(topic)}
+        assert groups == {b"test-bus.w1"}
+    finally:
+        await first.close()
+        await crashed.close()
+        await queue.connection.delete(topic)
+        await queue.disconnect()
+
+@pytest.mark.asyncio
+async def test_rabbitmq_queue_confirms_batches_and_acks_after_callback():
+    """Test confirmed batch publishing and that a failed callback's message is redelivered, not lost"""
+    queue = await _rabbitmq_queue(QUEUE_PREFETCH_COUNT=10)
+    name = f"test-queue-{uuid.uuid4().hex}"
+    try:
+        await queue.publish_many(name, [{"n": n} for n in range(3)])
+        await asyncio.gather(*(queue.publish(name, {"n": n}) for n in range(3, 6)))
+
+        received = []
+        failed = set()
+
+        async def callback(message):
+            if message["n"] == 2 and 2 not in failed:
+                failed.add(2)
+                raise RuntimeError("transient")
+            received.append(message["n"])
+
+        await queue.subscribe(name, callback)
+        for _ in range(100):
+            if len(received) == 6:
+                break
+            await asyncio.sleep(0.05)
+
+        assert sorted(received) == list(range(6))
+        declared = await queue.channel.declare_queue(name, passive=True)
+        assert declared.declaration_result.message_count == 0
+    finally:
+        await queue.channel.queue_delete(name)
+        await queue.disconnect()
+
+@pytest.mark.asyncio
+async def test_local_queue_offsets_truncation_and_recovery(tmp_path):
+    """Test per-subscriber offsets, segment truncation and replay after reopening"""
+    from src.core.local_queue import LocalQueue
+
+    settings = Settings(QUEUE_LOCAL_DIR=str(tmp_path), QUEUE_SEGMENT_BYTES=4096, QUEUE_BATCH_SIZE=10)
+    queue = LocalQueue(settings)
+    await queue.connect()
+    await queue.publish_many("events", [{"n": n, "pad": "x" * 100} for n in range(100)])
+
+    fast, slow = [], []
+    await queue.subscribe("events", lambda message: fast.append(message["n"]), subscriber="fast")
+    for _ in range(100):
+        if len(fast) == 100:
+            break
+        await asyncio.sleep(0.01)
+    assert fast == list(range(100))
+    # No other subscriber yet, so everything before the active segment is gone
+    assert len(list((tmp_path / "events").glob("*.seg"))) == 1
+
+    async def flaky(message):
+        if message["n"] == 105 and 105 not in slow:
+            slow.append(105)
+            raise RuntimeError("transient")
+        slow.append(message["n"])
+
+    await queue.subscribe("events", flaky, subscriber="slow")
+    await queue.publish("events", {"n": 105})
+    await asyncio.sleep(0.05)
+    await queue.disconnect()
+
+    # A restart replays from the last committed offset: the failed message comes back
+    reopened = LocalQueue(settings)
+    await reopened.connect()
+    replayed = []
+    await reopened.subscribe("events", lambda message: replayed.append(message["n"]), subscriber="slow")
+    await reopened.publish("events", {"n": 106})
+    for _ in range(100):
+        if len(replayed) >= 2:
+            break
+        await asyncio.sleep(0.01)
+    assert replayed == [105, 106]
+    await reopened.disconnect()
+
+@pytest.mark.asyncio
+async def test_local_queue_keeps_segments_for_subscribers_that_have_not_committed(tmp_path):
+    """Test that a subscriber with nothing committed yet still holds back truncation"""
+    from src.core.local_queue import LocalQueue
+
+    settings = Settings(QUEUE_LOCAL_DIR=str(tmp_path), QUEUE_SEGMENT_BYTES=4096, QUEUE_BATCH_SIZE=10)
+    queue = LocalQueue(settings)
+    await queue.connect()
+    await queue.publish_many("events", [{"n": n, "pad": "x" * 100} for n in range(100)])
+
+    release = asyncio.Event()
+    fast, idle = [], []
+
+    async def blocked(message):
+        await release.wait()
+        idle.append(message["n"])
+
+    await queue.subscribe("events", blocked, subscriber="idle")
+    await queue.subscribe("events", lambda message: fast.append(message["n"]), subscriber="fast")
+    for _ in range(100):
+        if len(fast) == 100:
+            break
+        await asyncio.sleep(0.01)
+    assert fast == list(range(100))
+    assert len(list((tmp_path / "events").glob("*.seg"))) > 1
+
+    release.set()
+    for _ in range(100):
+        if len(idle) == 100:
+            break
+        await asyncio.sleep(0.01)
+    assert idle == list(range(100))
+    await queue.disconnect()
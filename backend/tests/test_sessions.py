@@ -0,0 +1,44 @@
+import time
+import uuid
+import pytest
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from src.models.session import Session
+from src.services.presence import PresenceRegistry, upsert_sessions
+
+@pytest.mark.asyncio
+async def test_presence_flushes_dirty_entries_in_bulk(db_engine, test_db):
+    """Test that activity stays in memory until a flush writes each changed session once"""
+    session_maker = async_sessionmaker(db_engine, class_=AsyncSession, expire_on_commit=False)
+    presence = PresenceRegistry(session_maker, upsert_sessions, shards=4, flush_interval=60, away_after=30)
+    prefix = uuid.uuid4().hex
+    phone, laptop, other = f"{prefix}-phone", f"{prefix}-laptop", f"{prefix}-other"
+    try:
+        presence.connect(phone, "alice")
+        presence.connect(laptop, "alice")
+        presence.connect(other, "bob")
+        for _ in range(1000):
+            presence.touch(phone, "alice")
+        assert presence.stats()["online"] == 3 and presence.stats()["dirty"] == 3
+
+        await presence.flush()
+        rows = (await test_db.execute(select(Session).where(Session.id.like(f"{prefix}%")))).scalars().all()
+        assert sorted(row.id for row in rows) == sorted([phone, laptop, other])
+        assert all(row.presence == "online" and row.connection_status for row in rows)
+        assert presence.stats()["dirty"] == 0 and presence.stats()["flushed"] == 3
+
+        presence.sweep(time.time() + 31)
+        presence.disconnect(other, "bob")
+        await presence.flush()
+        test_db.expire_all()
+        stored = {row.id: row for row in (await test_db.execute(select(Session).where(Session.id.like(f"{prefix}%")))).scalars()}
+        assert stored[phone].presence == "away"
+        assert stored[other].presence == "offline" and not stored[other].connection_status
+
+        # Offline sessions leave memory once written; active ones are served from it
+        assert presence.stats()["tracked"] == 2
+        assert sorted(session["id"] for session in presence.active("alice")) == sorted([phone, laptop])
+        assert presence.active("bob") == []
+    finally:
+        await test_db.execute(delete(Session).where(Session.id.like(f"{prefix}%")))
+        await test_db.commit()
@@ -1,8 +1,12 @@
 import pytest
+import asyncio
 import json
+import time
 from fastapi.testclient import TestClient
 from src.main import app
-from src.services.event_manager import event_manager
+from src.services.event_manager import EventManager, EventQueueFullError, WebhookBatcher, event_manager
+from src.core.config import Settings
+from src.services import outbound
 
 @pytest.fixture
 def test_client():
@@ -24,6 +28,7 @@ async def test_websocket_message_broadcast(mock_websocket_client):
     
     test_message = {"type": "message", "content": "test broadcast"}
     await event_manager.broadcast_message(test_message)
+    await event_manager.flush_outbound()
     
     assert mock_websocket_client.last_message is not None
     assert json.loads(mock_websocket_client.last_message)["content"] == "test broadcast"
@@ -53,16 +58,290 @@ async def test_websocket_reconnection(mock_websocket_client):
     assert event_manager.active_connections[client_id] == new_mock_client
     assert mock_websocket_client.accepted is False
 
+class _ClosableSocket:
+    """Socket whose reads end once the server closes it, like a replaced connection"""
+
+    def __init__(self):
+        self.closed = asyncio.Event()
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, data: str):
+        pass
+
+    async def receive_text(self) -> str:
+        await self.closed.wait()
+        raise RuntimeError("disconnected")
+
+    async def close(self):
+        self.closed.set()
+
+async def _registered(client_id: str, websocket, timeout: float = 1.0):
+    deadline = time.monotonic() + timeout
+    while event_manager.active_connections.get(client_id) is not websocket:
+        assert time.monotonic() < deadline, f"{client_id} is not registered to the expected socket"
+        await asyncio.sleep(0.001)
+
+@pytest.mark.asyncio
+async def test_reconnect_survives_old_handler_cleanup():
+    """Test that the replaced socket's handler does not unregister or mark offline the new session"""
+    from src.main import websocket_endpoint
+    from src.services.presence import presence
+
+    client_id = "reconnecting_client"
+    old, new = _ClosableSocket(), _ClosableSocket()
+    first = asyncio.create_task(websocket_endpoint(old, client_id))
+    await _registered(client_id, old)
+    second = asyncio.create_task(websocket_endpoint(new, client_id))
+    await asyncio.wait_for(first, timeout=1)
+    await _registered(client_id, new)
+
+    assert presence.get(client_id, client_id)["status"] == "online"
+    assert client_id in event_manager.outbound
+
+    await new.close()
+    await asyncio.wait_for(second, timeout=1)
+    assert client_id not in event_manager.active_connections
+    assert presence.get(client_id, client_id)["status"] == "offline"
+
 @pytest.mark.asyncio
 async def test_websocket_message_handling(mock_websocket_client):
     """Test message handling through WebSocket"""
+    manager = EventManager()
     client_id = "test_client"
-    await event_manager.register_websocket(client_id, mock_websocket_client)
+    await manager.register_websocket(client_id, mock_websocket_client)
+    manager.start_background_tasks()
     
     message = {"type": "test", "data": "hello"}
-    success = await event_manager.handle_client_message(client_id, message)
+    success = await manager.handle_client_message(client_id, message)
+    await manager.message_queue.join()
+    await manager.flush_outbound()
     
     assert success is True
     assert mock_websocket_client.last_message is not None
     received_message = json.loads(mock_websocket_client.last_message)
-    assert received_message["content"]["type"] == "test"
\ No newline at end of file
+    assert received_message["content"]["type"] == "test"
+    await manager.close_all_connections()
+
+@pytest.mark.asyncio
+async def test_webhook_session_shared_and_closed():
+    """Test that webhook delivery reuses one HTTP session until shutdown"""
+    manager = EventManager()
+    manager.start_background_tasks()
+    session = manager._get_http_session()
+    assert manager._get_http_session() is session
+
+    await manager.close_all_connections()
+    assert session.closed
+
+@pytest.mark.asyncio
+async def test_webhook_batcher_flushes_in_order():
+    """Test that batched webhooks flush on size and on the time window, in order"""
+    batches = []
+
+    async def send(batch):
+        batches.append([event["n"] for event in batch])
+
+    batcher = WebhookBatcher(send, max_size=3, max_delay=0.02)
+    for n in range(4):
+        batcher.add({"n": n})
+    await asyncio.sleep(0.05)
+
+    assert batches == [[0, 1, 2], [3]]
+    await batcher.close()
+
+@pytest.mark.asyncio
+async def test_reregistering_webhook_flushes_previous_batcher():
+    """Test that replacing a batched webhook sends what the old batcher held before returning"""
+    manager = EventManager()
+    sent = []
+
+    async def send_webhook(client_id, webhook_url, message):
+        sent.append(message)
+    manager._send_webhook = send_webhook
+
+    await manager.register_webhook("hooked", "http://webhook.invalid/a", batched=True, batch_interval_ms=60000)
+    manager.webhook_batchers["hooked"].add({"n": 1})
+    await manager.register_webhook("hooked", "http://webhook.invalid/b")
+
+    assert sent == [[{"n": 1}]]
+    assert "hooked" not in manager.webhook_batchers
+
+@pytest.mark.asyncio
+async def test_targeted_delivery(mock_websocket_client):
+    """Test that targeted messages reach only the recipient and conversation subscribers"""
+    manager = EventManager()
+    receiver = mock_websocket_client
+    subscriber = mock_websocket_client.__class__()
+    bystander = mock_websocket_client.__class__()
+    await manager.register_websocket("receiver", receiver)
+    await manager.register_websocket("subscriber", subscriber)
+    await manager.register_websocket("bystander", bystander)
+    await manager.handle_client_message("subscriber", {"type": "subscribe", "conversation_key": "receiver:sender"})
+
+    await manager.deliver_message({"content": "hi"}, recipients=["receiver"], conversation="receiver:sender")
+    await manager.flush_outbound()
+
+    assert json.loads(receiver.last_message)["content"] == "hi"
+    assert json.loads(subscriber.last_message)["content"] == "hi"
+    assert bystander.last_message is None
+
+@pytest.mark.asyncio
+async def test_dispatch_workers_deliver_once(mock_websocket_client):
+    """Test that published messages are delivered exactly once by the workers"""
+    manager = EventManager()
+    sent = []
+    mock_websocket_client.send_text = lambda data: _record(sent, data)
+    await manager.register_websocket("worker_client", mock_websocket_client)
+    manager.start_background_tasks()
+
+    for n in range(10):
+        await manager.publish({"n": n}, broadcast=True)
+    await manager.message_queue.join()
+    await manager.flush_outbound()
+
+    assert [json.loads(data)["n"] for data in sent] == list(range(10))
+    await manager.close_all_connections()
+
+async def _record(sent, data):
+    sent.append(data)
+
+@pytest.mark.asyncio
+async def test_publish_rejects_when_queue_full():
+    """Test that producers are rejected once the queue hits its high-water mark"""
+    manager = EventManager(Settings(EVENT_QUEUE_MAX_SIZE=1, EVENT_PUBLISH_TIMEOUT=0.01))
+    await manager.publish({"n": 1}, broadcast=True)
+    with pytest.raises(EventQueueFullError):
+        await manager.publish({"n": 2}, broadcast=True)
+    assert manager.queue_stats()["rejected"] == 1
+
+@pytest.mark.asyncio
+async def test_client_frames_are_rejected_when_queue_full(mock_websocket_client):
+    """Test that WebSocket frames go through the dispatch queue and the sender hears when it is full"""
+    manager = EventManager(Settings(EVENT_QUEUE_MAX_SIZE=1, EVENT_PUBLISH_TIMEOUT=0.01))
+    await manager.register_websocket("sender", mock_websocket_client)
+
+    assert await manager.handle_client_message("sender", {"receiver_id": "someone", "text": "first"}) is True
+    assert await manager.handle_client_message("sender", {"receiver_id": "someone", "text": "second"}) is False
+    await manager.flush_outbound()
+
+    assert json.loads(mock_websocket_client.last_message) == {"type": "error", "error": "queue_full"}
+    assert manager.queue_stats() == {"depth": 1, "max_size": 1, "workers": 0, "rejected": 1}
+
+@pytest.mark.asyncio
+async def test_slow_webhook_does_not_stall_dispatch(mock_websocket_client):
+    """Test that dispatch workers hand webhooks off instead of waiting for the POST"""
+    manager = EventManager(Settings(EVENT_DISPATCH_WORKERS=1))
+    release = asyncio.Event()
+
+    async def slow_webhook(client_id, webhook_url, message):
+        await release.wait()
+    manager._send_webhook = slow_webhook
+
+    await manager.register_webhook("offline", "http://webhook.invalid/events")
+    await manager.register_websocket("online", mock_websocket_client)
+    manager.start_background_tasks()
+    await manager.publish({"n": 1}, recipients=["offline"])
+    await manager.publish({"n": 2}, recipients=["online"])
+    await asyncio.wait_for(manager.message_queue.join(), timeout=1)
+    await manager.flush_outbound()
+
+    assert json.loads(mock_websocket_client.last_message)["n"] == 2
+    assert len(manager._webhook_tasks) == 1
+    release.set()
+    await manager.close_all_connections()
+    assert not manager._webhook_tasks
+
+@pytest.mark.asyncio
+async def test_slow_consumer_does_not_block_others(mock_websocket_client):
+    """Test that a stalled socket only fills its own buffer"""
+    manager = EventManager(Settings(WS_SEND_BUFFER_SIZE=2))
+    stalled = mock_websocket_client.__class__()
+    release = asyncio.Event()
+
+    async def stalled_send(data):
+        await release.wait()
+    stalled.send_text = stalled_send
+
+    await manager.register_websocket("stalled", stalled, policy="drop_oldest")
+    await manager.register_websocket("fast", mock_websocket_client)
+    for n in range(5):
+        await manager.broadcast_message({"n": n})
+    await manager.outbound["fast"].drain(timeout=1)
+
+    assert json.loads(mock_websocket_client.last_message)["n"] == 4
+    stats = manager.connection_stats()["stalled"]
+    assert stats["queued"] <= 2
+    assert stats["dropped"] == 3
+
+    release.set()
+    await manager.close_all_connections()
+
+@pytest.mark.asyncio
+async def test_slow_consumer_disconnect_policy(mock_websocket_client):
+    """Test that the disconnect policy drops a client whose buffer overflows"""
+    manager = EventManager(Settings(WS_SEND_BUFFER_SIZE=1))
+
+    async def stalled_send(data):
+        await asyncio.sleep(10)
+    mock_websocket_client.send_text = stalled_send
+
+    await manager.register_websocket("slow", mock_websocket_client, policy="disconnect")
+    for n in range(3):
+        await manager.broadcast_message({"n": n})
+    await asyncio.sleep(0.05)
+
+    assert "slow" not in manager.active_connections
+    assert not outbound._overflow_tasks
+
+@pytest.mark.asyncio
+async def test_event_bus_delivers_across_workers(mock_websocket_client, tmp_path):
+    """Test that an event published in one worker reaches a socket held by another"""
+    from src.services.event_bus import UnixSocketBus
+
+    first, second = EventManager(), EventManager()
+    await first.attach_bus(UnixSocketBus(str(tmp_path), "worker-1"))
+    await second.attach_bus(UnixSocketBus(str(tmp_path), "worker-2"))
+    first.start_background_tasks()
+    second.start_background_tasks()
+    await second.register_websocket("remote", mock_websocket_client)
+    await asyncio.sleep(0.05)
+    assert first.registry.worker_of("remote") == "worker-2"
+
+    await first.publish({"content": "hi"}, recipients=["remote"])
+    for _ in range(50):
+        if mock_websocket_client.last_message is not None:
+            break
+        await asyncio.sleep(0.01)
+    assert json.loads(mock_websocket_client.last_message)["content"] == "hi"
+
+    await second.close_all_connections()
+    await asyncio.sleep(0.05)
+    assert first.registry.worker_of("remote") is None
+    await first.close_all_connections()
+
+@pytest.mark.asyncio
+async def test_event_bus_snapshots_repair_lost_envelopes(tmp_path):
+    """Test that a snapshot undoes a lost unregister and register, and silent peers expire"""
+    from src.services.event_bus import UnixSocketBus
+
+    first, second = EventManager(), EventManager()
+    await first.attach_bus(UnixSocketBus(str(tmp_path), "worker-1"))
+    await second.attach_bus(UnixSocketBus(str(tmp_path), "worker-2"))
+    await second._track_client("gone", "gone")
+    await asyncio.sleep(0.05)
+    assert first.registry.is_online("gone")
+
+    # Both changes happen without their envelopes, as if the datagrams were dropped
+    second.registry.remove("gone")
+    second.registry.add("worker-2", "unannounced", ("unannounced",))
+    await second._publish_snapshot()
+    await asyncio.sleep(0.05)
+    assert not first.registry.is_online("gone")
+    assert first.registry.worker_of("unannounced") == "worker-2"
+
+    assert first.registry.expire(time.monotonic() + 1) == ["worker-2"]
+    assert first.registry.worker_of("unannounced") is None
+    await first.close_all_connections()
+    await second.close_all_connections()
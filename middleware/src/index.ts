@@ -63,6 +63,8 @@ async function main() {
 
     // Handle WebSocket messages and forward to WhatsApp
     wsServer.on(MessageEventType.RECEIVED, async (message: Message) => {
+      // Backend correlates acks with in-flight sends by its own message id
+      const backendId = message.metadata?.metadata?.id;
       try {
         const currentStatus = whatsapp.getStatus();
         Logger.info('Processing received message:', {
@@ -83,7 +85,17 @@ async function main() {
           message.metadata
         );
         Logger.info('Message sent successfully to WhatsApp:', response);
+        if (backendId) {
+          wsServer.sendAck(message.from, { id: String(backendId), status: 'sent' });
+        }
       } catch (error) {
+        if (backendId) {
+          wsServer.sendAck(message.from, {
+            id: String(backendId),
+            status: 'failed',
+            error: error instanceof Error ? error.message : String(error)
+          });
+        }
         Logger.error('Failed to forward message to WhatsApp:', {
           error,
           message,
@@ -241,6 +241,19 @@ export class WebSocketService extends EventEmitter implements MessagingPlatform
     return this.status;
   }
 
+  public sendAck(clientId: string, ack: { id: string; status: string; error?: string }): void {
+    const client = this.clients.get(clientId);
+    if (!client || client.readyState !== WebSocket.OPEN) {
+      Logger.warn(`Cannot ack message ${ack.id}: client ${clientId} not connected`);
+      return;
+    }
+    client.send(JSON.stringify({ type: 'ack', ...ack }), (err) => {
+      if (err) {
+        Logger.error(`Failed to send ack to client ${clientId}:`, err);
+      }
+    });
+  }
+
   public close(): void {
     this.wss.close(() => {
       Logger.info('WebSocket server closed');